@@ -0,0 +1,276 @@
+"""Command line interface for the headless Pips solver
+
+Usage:
+    python3 pips.py solve puzzles.jsonl > solutions.jsonl
+    cat puzzle.json | python3 pips.py solve
+    python3 pips.py solve --portfolio default puzzles.jsonl > solutions.jsonl
+    python3 pips.py portfolio-report solutions.jsonl
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+
+import pips_archive
+import pips_metrics
+import pips_solver
+
+
+def read_puzzles(stream):
+    """Yield puzzle dicts from a JSON document or a JSONL stream"""
+    first = None
+    for line in stream:
+        if line.strip():
+            first = line
+            break
+    if first is None:
+        return
+
+    try:
+        data = json.loads(first)
+    except json.JSONDecodeError:
+        # Not JSONL - treat the whole stream as one (pretty-printed) document
+        data = json.loads(first + stream.read())
+        if isinstance(data, list):
+            yield from data
+        else:
+            yield data
+        return
+
+    if isinstance(data, list):
+        yield from data
+    else:
+        yield data
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_inputs(paths):
+    """Yield puzzles from each path, with '-' meaning stdin
+
+    Binary archives written by pips_archive are read record by record.
+    """
+    for path in paths or ["-"]:
+        if path == "-":
+            yield from read_puzzles(sys.stdin)
+        elif pips_archive.is_archive(path):
+            with pips_archive.Archive(path) as archive:
+                yield from archive
+        else:
+            with open(path) as f:
+                yield from read_puzzles(f)
+
+
+def backend_options(args):
+    """Collect the backend-specific command line options"""
+    options = {}
+    if args.decompose:
+        options["decompose"] = True
+    if args.cube_depth:
+        options["cube_depth"] = args.cube_depth
+    if args.workers:
+        options["workers"] = args.workers
+    if args.portfolio:
+        import pips_parallel
+        names = args.portfolio.split(",")
+        options["portfolio"] = pips_parallel.DEFAULT_PORTFOLIO if names == ["default"] else names
+    if args.backend == "z3":
+        options["encoding"] = args.encoding
+        if args.encoding != "full":
+            options["symmetry"] = args.symmetry
+        if args.tactic:
+            options["tactic"] = args.tactic
+        if args.logic:
+            options["logic"] = args.logic
+        if args.param:
+            options["params"] = dict(args.param)
+        if args.no_cardinality:
+            options["cardinality"] = False
+    if args.timeout:
+        options["timeout"] = args.timeout
+    if args.memory:
+        options["memory"] = args.memory
+    return options
+
+
+def solver_param(text):
+    """Parse a KEY=VALUE solver parameter, converting numbers and booleans"""
+    key, sep, value = text.partition("=")
+    if not sep or not key:
+        raise argparse.ArgumentTypeError(f"expected KEY=VALUE, got {text!r}")
+    if value.lower() in ("true", "false"):
+        return key, value.lower() == "true"
+    for convert in (int, float):
+        try:
+            return key, convert(value)
+        except ValueError:
+            pass
+    return key, value
+
+
+def cmd_solve(args):
+    """Solve every input puzzle and stream the results as JSONL"""
+    out = open(args.output, "w") if args.output else sys.stdout
+    cache = None
+    if args.cache or args.cache_size:
+        import pips_cache
+        cache = pips_cache.SolutionCache(maxsize=args.cache_size or 4096, path=args.cache)
+    collected = []
+    if args.metrics == "json":
+        handler = logging.FileHandler(args.metrics_file) if args.metrics_file else logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        pips_metrics.logger.addHandler(handler)
+        pips_metrics.logger.setLevel(logging.INFO)
+        pips_metrics.logger.propagate = False
+    errors = 0
+    try:
+        for n, data in enumerate(iter_inputs(args.inputs)):
+            metrics = None
+            if args.metrics:
+                puzzle_id = data.get("id") if isinstance(data, dict) else None
+                metrics = pips_metrics.SolveMetrics(
+                    id=puzzle_id if puzzle_id is not None else n, backend=args.backend)
+            try:
+                result = pips_solver.solve(data, backend=args.backend, presolve=args.presolve,
+                                           cache=cache, metrics=metrics, **backend_options(args))
+            except Exception as exc:  # keep the batch going
+                result = {"id": data.get("id") if isinstance(data, dict) else None,
+                          "status": "error", "error": str(exc)}
+            if result["status"] == "error":
+                errors += 1
+            if metrics is not None:
+                metrics.labels["status"] = result["status"]
+                if args.metrics == "json":
+                    pips_metrics.log_metrics(metrics)
+                else:
+                    collected.append(metrics)
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if cache is not None:
+            cache.close()
+    if args.metrics == "prometheus":
+        text = pips_metrics.prometheus_text(collected)
+        if args.metrics_file:
+            with open(args.metrics_file, "w") as f:
+                f.write(text)
+        else:
+            sys.stderr.write(text)
+    return 1 if errors else 0
+
+
+def cmd_count(args):
+    """Count the solutions of every input puzzle (modulo identical-domino swaps)"""
+    limit = 2 if args.unique else args.limit
+    out = open(args.output, "w") if args.output else sys.stdout
+    errors = 0
+    try:
+        for data in iter_inputs(args.inputs):
+            try:
+                puzzle = pips_solver.normalize_puzzle(data)
+                start = time.perf_counter()
+                count = pips_solver.count_solutions(
+                    puzzle["cells"], puzzle["dominos"], puzzle["edges"], puzzle["regions"],
+                    limit=limit, backend=args.backend, presolve=args.presolve)
+                result = {"id": puzzle["id"], "count": count,
+                          "complete": limit is None or count < limit,
+                          "time": round(time.perf_counter() - start, 6)}
+                if limit is None or limit > 1 or count == 0:
+                    result["unique"] = count == 1
+            except Exception as exc:  # keep the batch going
+                result = {"id": data.get("id") if isinstance(data, dict) else None,
+                          "status": "error", "error": str(exc)}
+                errors += 1
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 1 if errors else 0
+
+
+def cmd_portfolio_report(args):
+    """Rank portfolio configurations by wins in earlier solve results"""
+    import pips_parallel
+    records = []
+    for path in args.inputs or ["-"]:
+        stream = sys.stdin if path == "-" else open(path)
+        try:
+            records.extend(json.loads(line) for line in stream if line.strip())
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+    for name, wins, median in pips_parallel.rank_portfolio(records):
+        median = "-" if median is None else f"{median:.4f}s"
+        print(f"{name:<16} {wins:>6} wins  median {median}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="pips", description="Headless Pips puzzle solver")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    solve_parser = subparsers.add_parser("solve", help="solve puzzles from JSON/JSONL files or stdin")
+    solve_parser.add_argument("inputs", nargs="*", help="puzzle files (default: stdin, '-' for stdin)")
+    solve_parser.add_argument("-o", "--output", help="write JSONL results here instead of stdout")
+    solve_parser.add_argument("--backend", default="z3", choices=pips_solver.BACKENDS)
+    solve_parser.add_argument("--encoding", default="full", choices=("full", "compact", "boolean"),
+                              help="Z3 encoding (compact prunes placements and identical-tile symmetry, "
+                                   "boolean is compact with one-hot cell values and PB constraints)")
+    solve_parser.add_argument("--symmetry", default="counts", choices=("counts", "lex"),
+                              help="how the compact/boolean encodings remove identical-tile symmetry")
+    solve_parser.add_argument("--tactic", help="Z3 tactic, or a comma-separated chain (e.g. qffd)")
+    solve_parser.add_argument("--logic", help="create the Z3 solver for this logic (e.g. QF_FD)")
+    solve_parser.add_argument("--param", action="append", type=solver_param, metavar="KEY=VALUE",
+                              help="Z3 solver parameter, may be repeated")
+    solve_parser.add_argument("--no-cardinality", action="store_true",
+                              help="leave out the global pip-count constraints in the Z3 encoding")
+    solve_parser.add_argument("--timeout", type=float, metavar="SECONDS",
+                              help="give up on a puzzle after this long (status unknown)")
+    solve_parser.add_argument("--memory", type=int, metavar="MB",
+                              help="Z3 memory budget per puzzle (status unknown when exceeded)")
+    solve_parser.add_argument("--presolve", action="store_true",
+                              help="reduce each puzzle by propagation before calling the backend")
+    solve_parser.add_argument("--decompose", action="store_true",
+                              help="solve disconnected islands separately in a process pool")
+    solve_parser.add_argument("--cube-depth", type=int, default=0,
+                              help="split one hard board into cubes this many placements deep")
+    solve_parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    solve_parser.add_argument("--portfolio", metavar="NAMES",
+                              help="race these comma-separated configurations (or 'default') "
+                                   "in separate processes and keep the first answer")
+    solve_parser.add_argument("--cache", metavar="PATH",
+                              help="sqlite file that persists solutions of equivalent puzzles")
+    solve_parser.add_argument("--cache-size", type=int,
+                              help="entries kept in the in-memory LRU (enables caching)")
+    solve_parser.add_argument("--metrics", choices=("json", "prometheus"),
+                              help="record per-phase timings, problem sizes and Z3 statistics")
+    solve_parser.add_argument("--metrics-file", metavar="PATH",
+                              help="write metrics here instead of stderr")
+    solve_parser.set_defaults(func=cmd_solve)
+
+    count_parser = subparsers.add_parser("count", help="count solutions / check uniqueness")
+    count_parser.add_argument("inputs", nargs="*", help="puzzle files (default: stdin, '-' for stdin)")
+    count_parser.add_argument("-o", "--output", help="write JSONL results here instead of stdout")
+    count_parser.add_argument("--backend", default="z3", choices=pips_solver.BACKENDS)
+    count_parser.add_argument("--presolve", action="store_true")
+    count_parser.add_argument("--limit", type=int, help="stop counting after this many solutions")
+    count_parser.add_argument("--unique", action="store_true",
+                              help="only decide uniqueness (same as --limit 2)")
+    count_parser.set_defaults(func=cmd_count)
+
+    report_parser = subparsers.add_parser("portfolio-report",
+                                          help="rank portfolio configurations by wins")
+    report_parser.add_argument("inputs", nargs="*", help="solve results (JSONL, default: stdin)")
+    report_parser.set_defaults(func=cmd_portfolio_report)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
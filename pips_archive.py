@@ -0,0 +1,415 @@
+"""Compact binary archive of puzzles and solutions
+
+A corpus of millions of puzzles does not fit comfortably in JSONL, and
+looking one up means scanning the file. An archive stores each puzzle as a
+small binary record and is read through mmap, so opening it costs nothing
+and any record can be decoded on its own:
+
+    header   magic, version, record count, where the tables start
+    records  one per puzzle, each prefixed with its length:
+             id (utf-8), board rows and cols, the cell mask bit-packed in
+             row-major order, the dominos one byte each (7 * a + b, in
+             puzzle order), the regions (ops, targets, sizes and member
+             cells, each packed as one column) and, optionally, the
+             solution as one (edge << 1 | orientation) code per domino
+    offsets  the start of every record, for access by position
+    index    an open-addressing hash table from puzzle id to record, for
+             O(1) lookup by id
+
+Cells are numbered row-major on the stored mask, as in the rest of the
+solver; puzzles numbered differently are renumbered when they are written
+(edge numbering and hence solutions are not affected). Archive iterates
+over puzzle dicts that pips_solver.solve() takes directly, and batches()
+yields the (puzzles, solutions) lists pips_verify.verify_batch() checks.
+
+Usage:
+    python3 pips_archive.py pack puzzles.jsonl -o corpus.pips --solutions solutions.jsonl
+    python3 pips_archive.py unpack corpus.pips > puzzles.jsonl
+    python3 pips_archive.py get corpus.pips nyt-easy-example
+    python3 pips_archive.py info corpus.pips
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import mmap
+import struct
+import sys
+
+import pips_solver
+
+MAGIC = b"PIPSARC\0"
+VERSION = 1
+OPS = pips_solver.REGION_OPS
+_OP_CODE = {op: i for i, op in enumerate(OPS)}
+
+_HEADER = struct.Struct("<8sHHIQQ")  # magic, version, flags, count, offsets, index
+_SLOT = struct.Struct("<QQ")  # id hash, record number + 1 (0: empty)
+_NO_ID = 0xFFFF
+
+
+def id_hash(puzzle_id):
+    """Stable 64-bit hash of a puzzle id (Python's hash() changes per process)"""
+    digest = hashlib.blake2b(str(puzzle_id).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def _canonical(data, solution):
+    """Return (rows, cols, mask, dominos, regions, codes) for one puzzle
+
+    Cells are renumbered row-major and the solution becomes one edge code
+    per domino, or None.
+    """
+    puzzle = pips_solver.normalize_puzzle(data)
+    map_structure = puzzle["map"]
+    rows = len(map_structure)
+    cols = max(len(row) for row in map_structure)
+    renumber = {}
+    mask = 0
+    for r, row in enumerate(map_structure):
+        for c, cell in enumerate(row):
+            if cell >= 0:
+                renumber[cell] = len(renumber)
+                mask |= 1 << (r * cols + c)
+
+    dominos = [7 * a + b for a, b in puzzle["dominos"]]
+    regions = [(_OP_CODE[op], 0 if target is None else target, [renumber[c] for c in cells_R])
+               for cells_R, op, target in puzzle["regions"]]
+
+    placements = solution.get("placements") if isinstance(solution, dict) else solution
+    if placements is None:
+        return rows, cols, mask, dominos, regions, None
+    edges = puzzle["edges"]
+    stored = solution.get("edges") if isinstance(solution, dict) else None
+    if stored is not None and [tuple(e) for e in stored] != list(edges):
+        # Map the solution's edge numbering onto the map's own
+        edge_index = {edge: i for i, edge in enumerate(edges)}
+        remapped = []
+        for d, e, o in placements:
+            c1, c2 = stored[e]
+            if (c1, c2) in edge_index:
+                remapped.append((d, edge_index[c1, c2], o))
+            else:
+                remapped.append((d, edge_index[c2, c1], 1 - o))
+        placements = remapped
+    codes = [None] * len(dominos)
+    for d, e, o in placements:
+        if not 0 <= d < len(dominos) or codes[d] is not None:
+            raise ValueError(f"solution places domino {d} more than once or out of range")
+        codes[d] = (int(e) << 1) | int(o)
+    if None in codes:
+        raise ValueError("solution does not place every domino")
+    return rows, cols, mask, dominos, regions, codes
+
+
+def encode_record(data, solution=None):
+    """Binary record (without its length prefix) for a puzzle and optional solution"""
+    rows, cols, mask, dominos, regions, codes = _canonical(data, solution)
+    puzzle_id = data.get("id")
+    name = b"" if puzzle_id is None else str(puzzle_id).encode()
+    if len(name) >= _NO_ID:
+        raise ValueError("puzzle id is too long")
+    wide = bin(mask).count("1") > 256
+    cell_format = "H" if wide else "B"
+
+    parts = [struct.pack("<H", _NO_ID if puzzle_id is None else len(name)), name,
+             struct.pack("<HH", rows, cols), mask.to_bytes((rows * cols + 7) // 8, "little"),
+             struct.pack("<H", len(dominos)), bytes(dominos), struct.pack("<H", len(regions))]
+    # Ops, targets and sizes as columns, then every member cell, so a
+    # record's regions unpack in two calls
+    members = [c for _, _, cells_R in regions for c in cells_R]
+    r = len(regions)
+    parts.append(struct.pack(f"<{r}B{r}h{r}H{len(members)}{cell_format}",
+                             *(op for op, _, _ in regions), *(target for _, target, _ in regions),
+                             *(len(cells_R) for _, _, cells_R in regions), *members))
+    if codes is None:
+        parts.append(b"\0")
+    else:
+        parts.append(struct.pack(f"<B{len(codes)}H", 1, *codes))
+    return b"".join(parts)
+
+
+def decode_record(buf, pos=0):
+    """Return (puzzle dict, placements or None) for the record starting at pos"""
+    (name_len,) = struct.unpack_from("<H", buf, pos)
+    pos += 2
+    if name_len == _NO_ID:
+        puzzle_id = None
+    else:
+        puzzle_id = bytes(buf[pos:pos + name_len]).decode()
+        pos += name_len
+    rows, cols = struct.unpack_from("<HH", buf, pos)
+    pos += 4
+    size = (rows * cols + 7) // 8
+    mask = int.from_bytes(buf[pos:pos + size], "little")
+    pos += size
+
+    flags = format(mask, f"0{rows * cols}b")[::-1]  # one '0'/'1' per position
+    number = itertools.count()
+    map_structure = [[next(number) if flag == "1" else -1 for flag in flags[r * cols:(r + 1) * cols]]
+                     for r in range(rows)]
+    cells = flags.count("1")
+    cell_format = "H" if cells > 256 else "B"
+    cell_size = struct.calcsize(cell_format)
+
+    (count,) = struct.unpack_from("<H", buf, pos)
+    pos += 2
+    dominos = [[code // 7, code % 7] for code in buf[pos:pos + count]]
+    pos += count
+
+    (r,) = struct.unpack_from("<H", buf, pos)
+    pos += 2
+    header = struct.unpack_from(f"<{r}B{r}h{r}H", buf, pos)
+    pos += 5 * r
+    sizes = header[2 * r:]
+    members = struct.unpack_from(f"<{sum(sizes)}{cell_format}", buf, pos)
+    pos += len(members) * cell_size
+    regions = []
+    start = 0
+    for op, target, k in zip(header[:r], header[r:2 * r], sizes):
+        op = OPS[op]
+        if op in ("all_eq", "all_diff"):
+            target = None
+        regions.append([list(members[start:start + k]), op, target])
+        start += k
+
+    placements = None
+    if buf[pos]:
+        codes = struct.unpack_from(f"<{count}H", buf, pos + 1)
+        placements = [[d, code >> 1, code & 1] for d, code in enumerate(codes)]
+    puzzle = {"id": puzzle_id, "map": map_structure, "dominos": dominos, "regions": regions}
+    return puzzle, placements
+
+
+class ArchiveWriter:
+    """Streams records to an archive file; the tables are written on close()"""
+
+    def __init__(self, path):
+        self.file = open(path, "wb")
+        self.file.write(_HEADER.pack(MAGIC, VERSION, 0, 0, 0, 0))
+        self.offsets = []
+        self.hashes = []  # (id hash, record number) for records with an id
+
+    def add(self, data, solution=None):
+        """Append a puzzle dict and optionally its solution (a solve() result or placements)"""
+        record = encode_record(data, solution)
+        if data.get("id") is not None:
+            self.hashes.append((id_hash(data["id"]), len(self.offsets)))
+        self.offsets.append(self.file.tell())
+        self.file.write(struct.pack("<I", len(record)))
+        self.file.write(record)
+
+    def close(self):
+        if self.file.closed:
+            return
+        offsets_pos = self.file.tell()
+        self.file.write(struct.pack(f"<{len(self.offsets)}Q", *self.offsets))
+
+        # Power-of-two table at most half full, probed linearly
+        slots = 1
+        while slots < 2 * len(self.hashes):
+            slots *= 2
+        table = [(0, 0)] * slots
+        for h, n in self.hashes:
+            i = h & (slots - 1)
+            while table[i][1]:
+                i = (i + 1) & (slots - 1)
+            table[i] = (h, n + 1)
+        index_pos = self.file.tell()
+        self.file.write(struct.pack("<Q", slots))
+        for h, n in table:
+            self.file.write(_SLOT.pack(h, n))
+
+        self.file.seek(0)
+        self.file.write(_HEADER.pack(MAGIC, VERSION, 0, len(self.offsets), offsets_pos, index_pos))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_archive(path, puzzles, solutions=None):
+    """Write puzzles (and solutions, matched by position) to an archive; returns the count"""
+    with ArchiveWriter(path) as writer:
+        for i, data in enumerate(puzzles):
+            writer.add(data, None if solutions is None else solutions[i])
+    return len(writer.offsets)
+
+
+class Archive:
+    """Read-only, memory-mapped view of an archive file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.buf = None
+        try:
+            self.buf = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, _, self.count, self.offsets_pos, self.index_pos = \
+                _HEADER.unpack_from(self.buf, 0)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a Pips archive")
+            if version != VERSION:
+                raise ValueError(f"{path} has archive version {version}, expected {VERSION}")
+            (self.slots,) = struct.unpack_from("<Q", self.buf, self.index_pos)
+        except Exception:
+            self.close()
+            raise
+
+    def __len__(self):
+        return self.count
+
+    def _offset(self, n):
+        if n < 0:
+            n += self.count
+        if not 0 <= n < self.count:
+            raise IndexError(f"record {n} out of range")
+        return struct.unpack_from("<Q", self.buf, self.offsets_pos + 8 * n)[0]
+
+    def record(self, n):
+        """(puzzle dict, placements or None) of the n-th record"""
+        return decode_record(self.buf, self._offset(n) + 4)
+
+    def __getitem__(self, n):
+        return self.record(n)[0]
+
+    def find(self, puzzle_id):
+        """Record number of a puzzle id, or None (the first record wins on duplicates)"""
+        if not self.slots:
+            return None
+        h = id_hash(puzzle_id)
+        name = str(puzzle_id).encode()
+        i = h & (self.slots - 1)
+        base = self.index_pos + 8
+        while True:
+            slot_hash, n = _SLOT.unpack_from(self.buf, base + _SLOT.size * i)
+            if not n:
+                return None
+            if slot_hash == h:
+                pos = self._offset(n - 1) + 4
+                (name_len,) = struct.unpack_from("<H", self.buf, pos)
+                if name_len != _NO_ID and self.buf[pos + 2:pos + 2 + name_len] == name:
+                    return n - 1
+            i = (i + 1) & (self.slots - 1)
+
+    def get(self, puzzle_id, default=None):
+        """Puzzle dict for an id, or default"""
+        n = self.find(puzzle_id)
+        return default if n is None else self[n]
+
+    def solution(self, puzzle_id):
+        """Stored placements for an id, or None"""
+        n = self.find(puzzle_id)
+        return None if n is None else self.record(n)[1]
+
+    def items(self):
+        """Stream (puzzle dict, placements or None) for every record in order"""
+        pos = _HEADER.size
+        for _ in range(self.count):
+            (length,) = struct.unpack_from("<I", self.buf, pos)
+            yield decode_record(self.buf, pos + 4)
+            pos += 4 + length
+
+    def __iter__(self):
+        for puzzle, _ in self.items():
+            yield puzzle
+
+    def batches(self, size=10000):
+        """Stream (puzzles, solutions) lists of up to size records for pips_verify"""
+        puzzles, solutions = [], []
+        for puzzle, placements in self.items():
+            puzzles.append(puzzle)
+            solutions.append(placements)
+            if len(puzzles) == size:
+                yield puzzles, solutions
+                puzzles, solutions = [], []
+        if puzzles:
+            yield puzzles, solutions
+
+    def close(self):
+        if self.buf is not None:
+            self.buf.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def is_archive(path):
+    """True if the file starts with the archive magic"""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def main(argv=None):
+    import pips
+
+    parser = argparse.ArgumentParser(prog="pips_archive", description="Binary Pips puzzle archives")
+    sub = parser.add_subparsers(dest="command", required=True)
+    pack = sub.add_parser("pack", help="write puzzles (JSON/JSONL) to an archive")
+    pack.add_argument("inputs", nargs="*", help="puzzle files (default: stdin)")
+    pack.add_argument("-o", "--output", required=True, help="archive path")
+    pack.add_argument("--solutions", help="solve results (JSONL) to store, matched by id")
+    unpack = sub.add_parser("unpack", help="print an archive as JSONL")
+    unpack.add_argument("archive")
+    unpack.add_argument("--solutions", action="store_true",
+                        help="print the stored placements as a 'placements' field")
+    get = sub.add_parser("get", help="print one puzzle by id")
+    get.add_argument("archive")
+    get.add_argument("id")
+    info = sub.add_parser("info", help="print the record count and size")
+    info.add_argument("archive")
+    args = parser.parse_args(argv)
+
+    if args.command == "pack":
+        solutions = {}
+        if args.solutions:
+            with open(args.solutions) as f:
+                solutions = {result.get("id"): result for result in pips.read_puzzles(f)}
+        errors = 0
+        with ArchiveWriter(args.output) as writer:
+            for n, data in enumerate(pips.iter_inputs(args.inputs)):
+                if isinstance(data, dict) and "map" not in data:
+                    # Not a puzzle, e.g. the corpus header line
+                    sys.stderr.write(f"warning: skipped input {n}: not a puzzle\n")
+                    continue
+                try:
+                    solution = solutions.get(data.get("id"))
+                    writer.add(data, solution if solution and solution.get("placements") else None)
+                except Exception as exc:  # keep the batch going
+                    errors += 1
+                    sys.stderr.write(f"skipped input {n}: {exc}\n")
+        sys.stderr.write(f"packed {len(writer.offsets)} puzzles into {args.output}\n")
+        return 1 if errors else 0
+
+    with Archive(args.archive) as archive:
+        if args.command == "unpack":
+            for puzzle, placements in archive.items():
+                if args.solutions and placements is not None:
+                    puzzle["placements"] = placements
+                sys.stdout.write(json.dumps(puzzle, separators=(",", ":")) + "\n")
+        elif args.command == "get":
+            puzzle = archive.get(args.id)
+            if puzzle is None:
+                sys.stderr.write(f"no puzzle with id {args.id!r}\n")
+                return 1
+            sys.stdout.write(json.dumps(puzzle) + "\n")
+        else:
+            size = len(archive.buf)
+            print(json.dumps({"records": len(archive), "bytes": size,
+                              "bytes_per_record": round(size / len(archive), 1) if len(archive) else 0,
+                              "index_slots": archive.slots}))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
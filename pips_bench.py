@@ -0,0 +1,526 @@
+"""Benchmark harness for the Pips solver backends
+
+The corpus is a seeded, versioned set of puzzles at increasing board sizes
+and region densities, with unsatisfiable variants made by perturbing region
+targets. It lives in examples/bench_corpus.jsonl so results stay comparable
+between releases; --regenerate rebuilds it from CORPUS_SEED.
+
+Every puzzle is solved by every selected configuration --repeat times. The
+report records the feasibility, presolve and encode time (building the Z3
+solver or the DLX matrix), solve time, peak Python heap and process RSS, variable/constraint counts
+and backend statistics, and is written as JSON. Each measurement runs in
+its own process and is abandoned after --timeout seconds. The run exits
+with status 1 on wrong answers, errors or timeouts; --baseline also
+compares against an earlier report and fails on slowdowns.
+
+--startup measures the editor instead: importing pips_solver_interface and
+the time to its first drawn frame, each in a fresh interpreter, and fails
+if z3, matplotlib or pygame get loaded at import time.
+
+Usage:
+    python3 pips_bench.py -o bench.json
+    python3 pips_bench.py --configs dlx,z3-compact --max-cells 40 --baseline old.json
+    python3 pips_bench.py --startup -o startup.json --baseline old-startup.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import pips_metrics
+import pips_solver
+
+CORPUS_VERSION = 1
+CORPUS_SEED = 20240601
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "examples",
+                           "bench_corpus.jsonl")
+
+# (rows, cols) of the board, smallest first
+BOARD_SIZES = ((2, 4), (3, 4), (4, 4), (4, 6), (6, 6), (6, 8), (8, 8))
+# Fraction of cells covered by regions
+DENSITIES = (0.3, 0.6, 1.0)
+PUZZLES_PER_TIER = 2
+
+CONFIGS = {
+    "z3": ("z3", {}),
+    "z3-compact": ("z3", {"encoding": "compact"}),
+    "z3-compact-nocard": ("z3", {"encoding": "compact", "cardinality": False}),
+    "z3-lex": ("z3", {"encoding": "compact", "symmetry": "lex"}),
+    "z3-bool": ("z3", {"encoding": "boolean"}),
+    "z3-bool-nocard": ("z3", {"encoding": "boolean", "cardinality": False}),
+    "z3-bool-fd": ("z3", {"encoding": "boolean", "logic": "QF_FD"}),
+    "z3-bool-qffd": ("z3", {"encoding": "boolean", "tactic": "qffd"}),
+    "dlx": ("dlx", {}),
+}
+
+
+def _neighbours(r, c):
+    return ((r + 1, c), (r - 1, c), (r, c + 1), (r, c - 1))
+
+
+def random_tiling(rng, rows, cols, holes=0.15):
+    """Cover a random subset of a rows x cols grid with dominos
+
+    Returns (map_structure, [(cell, cell), ...]) with cells numbered
+    row-major like the interface does.
+    """
+    free = {(r, c) for r in range(rows) for c in range(cols) if rng.random() >= holes}
+    pairs = []
+    while free:
+        # Pair the most constrained cell first so few cells are left stranded
+        p = min(sorted(free), key=lambda p: (sum(q in free for q in _neighbours(*p)),
+                                             rng.random()))
+        free.discard(p)
+        options = [q for q in _neighbours(*p) if q in free]
+        if options:
+            q = rng.choice(sorted(options))
+            free.discard(q)
+            pairs.append((p, q))
+
+    used = sorted(x for pair in pairs for x in pair)
+    min_r = min(r for r, c in used)
+    min_c = min(c for r, c in used)
+    max_r = max(r for r, c in used)
+    max_c = max(c for r, c in used)
+    number = {p: i for i, p in enumerate(used)}
+    map_structure = [[-1] * (max_c - min_c + 1) for _ in range(max_r - min_r + 1)]
+    for (r, c), i in number.items():
+        map_structure[r - min_r][c - min_c] = i
+    return map_structure, [(number[p], number[q]) for p, q in pairs]
+
+
+def random_regions(rng, map_structure, values, density):
+    """Group cells into small connected regions consistent with values"""
+    node_pos = pips_solver.node_positions(map_structure)
+    at = {pos: c for c, pos in node_pos.items()}
+    order = sorted(node_pos)
+    rng.shuffle(order)
+    taken = set()
+    regions = []
+    for start in order:
+        if len(taken) >= density * len(node_pos):
+            break
+        if start in taken:
+            continue
+        group = grow_region(rng, start, node_pos, at, taken)
+        taken.update(group)
+        regions.append(region_for(rng, group, [values[c] for c in group]))
+    return regions
+
+
+def grow_region(rng, cell, node_pos, at, taken, max_size=4):
+    """A random connected group of up to max_size cells around cell, avoiding taken"""
+    group = [cell]
+    size = rng.randint(1, max_size)
+    while len(group) < size:
+        frontier = sorted({at[q] for c in group for q in _neighbours(*node_pos[c])
+                           if q in at and at[q] not in taken and at[q] not in group})
+        if not frontier:
+            break
+        group.append(rng.choice(frontier))
+    return sorted(group)
+
+
+def region_for(rng, group, vals):
+    """A random [cells, op, target] region that the pips vals on group satisfy"""
+    total = sum(vals)
+    if len(group) > 1 and len(set(vals)) == 1 and rng.random() < 0.7:
+        return [group, "all_eq", None]
+    if len(group) > 1 and len(set(vals)) == len(vals) and rng.random() < 0.4:
+        return [group, "all_diff", None]
+    pick = rng.random()
+    if pick < 0.2:
+        return [group, "sum_lt", total + rng.randint(1, 3)]
+    if pick < 0.4 and total > 0:
+        return [group, "sum_gt", max(0, total - rng.randint(1, 3))]
+    return [group, "sum_eq", total]
+
+
+def random_puzzle(rng, rows, cols, density):
+    """A satisfiable puzzle built around a hidden random solution"""
+    map_structure, pairs = random_tiling(rng, rows, cols)
+    tiles = [(a, b) for a in range(7) for b in range(a, 7)]
+    rng.shuffle(tiles)
+    while len(tiles) < len(pairs):
+        tiles.append(tuple(sorted((rng.randint(0, 6), rng.randint(0, 6)))))
+    values = {}
+    dominos = []
+    for (c1, c2), (a, b) in zip(pairs, tiles):
+        if rng.random() < 0.5:
+            a, b = b, a
+        values[c1], values[c2] = a, b
+        dominos.append([a, b] if rng.random() < 0.5 else [b, a])
+    rng.shuffle(dominos)
+    regions = random_regions(rng, map_structure, values, density)
+    return {"map": map_structure, "dominos": dominos, "regions": regions}
+
+
+def _status(puzzle):
+    p = pips_solver.normalize_puzzle(puzzle)
+    found = pips_solver.run_solver(p["cells"], p["dominos"], p["edges"], p["regions"],
+                                   backend="z3", presolve=True, encoding="compact")
+    return "unsat" if found is None else "sat"
+
+
+def make_unsat(rng, puzzle, attempts=20):
+    """Perturb sum targets until the puzzle has no solution (or give up)"""
+    sums = [i for i, (_, op, _) in enumerate(puzzle["regions"]) if op.startswith("sum")]
+    for _ in range(attempts):
+        if not sums:
+            return None
+        regions = [list(region) for region in puzzle["regions"]]
+        for i in rng.sample(sums, min(len(sums), 2)):
+            regions[i][2] = max(0, regions[i][2] + rng.choice((-2, -1, 1, 2)))
+        candidate = dict(puzzle, regions=regions)
+        if _status(candidate) == "unsat":
+            return candidate
+    return None
+
+
+def generate_corpus(seed=CORPUS_SEED):
+    """Build the benchmark corpus as a list of puzzle dicts"""
+    rng = random.Random(seed)
+    corpus = []
+    for rows, cols in BOARD_SIZES:
+        for density in DENSITIES:
+            for k in range(PUZZLES_PER_TIER):
+                name = f"b{rows}x{cols}-d{int(density * 100)}-{k}"
+                puzzle = random_puzzle(rng, rows, cols, density)
+                tags = {"rows": rows, "cols": cols, "density": density,
+                        "cells": sum(v >= 0 for row in puzzle["map"] for v in row),
+                        "dominos": len(puzzle["dominos"])}
+                corpus.append(dict(id=name, expected="sat", tags=tags, **puzzle))
+                unsat = make_unsat(rng, puzzle)
+                if unsat is not None:
+                    corpus.append(dict(id=name + "-unsat", expected="unsat", tags=tags, **unsat))
+    return corpus
+
+
+def write_corpus(corpus, path=CORPUS_PATH):
+    with open(path, "w") as f:
+        f.write(json.dumps({"corpus_version": CORPUS_VERSION, "seed": CORPUS_SEED}) + "\n")
+        for puzzle in corpus:
+            f.write(json.dumps(puzzle, separators=(",", ":")) + "\n")
+
+
+def read_corpus(path=CORPUS_PATH):
+    """Return (header, puzzles) from a corpus file"""
+    with open(path) as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    return lines[0], lines[1:]
+
+
+def run_once(problem, config, presolve=False):
+    """Solve once with a named configuration and return the raw measurement
+
+    The solve goes through pips_solver.run_solver, feasibility checks and
+    all, so the timings are those of a real run; the phases come from a
+    pips_metrics.SolveMetrics.
+    """
+    backend, options = CONFIGS[config]
+    metrics = pips_metrics.SolveMetrics()
+    placements = pips_solver.run_solver(*problem, backend=backend, presolve=presolve,
+                                        metrics=metrics, **options)
+    phases, counters = metrics.phases, metrics.counters
+    result = {"status": "unsat" if placements is None else "sat",
+              "feasibility_time": phases.get("feasibility", 0.0),
+              "presolve_time": phases.get("presolve", 0.0),
+              "encode_time": phases.get("encode", 0.0),
+              "solve_time": sum(phases.get(name, 0.0) for name in ("check", "decode", "search"))}
+    if "placement_vars" in counters:
+        result["variables"] = counters["placement_vars"]
+        result["constraints"] = counters["assertions"]
+        result["stats"] = {key: metrics.stats[key] for key in ("conflicts", "decisions", "max_memory")
+                           if key in metrics.stats}
+    elif "rows" in counters:
+        cells, dominos, edges, regions = problem
+        result["variables"] = counters["rows"]
+        result["constraints"] = len(dominos) + len(cells) + len(regions)
+        result["stats"] = {"nodes": counters["nodes"]}
+    return result
+
+
+def bench_puzzle(puzzle, config, repeat=3, presolve=False):
+    """Time one puzzle/configuration pair; returns a report entry"""
+    p = pips_solver.normalize_puzzle(puzzle)
+    problem = (p["cells"], p["dominos"], p["edges"], p["regions"])
+    runs = [run_once(problem, config, presolve) for _ in range(repeat)]
+
+    # Peak memory is measured on a separate run because tracemalloc slows Python down
+    tracemalloc.start()
+    try:
+        run_once(problem, config, presolve)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    entry = {"id": puzzle.get("id"), "config": config, "presolve": presolve,
+             "expected": puzzle.get("expected"), "status": runs[0]["status"]}
+    entry["ok"] = entry["expected"] is None or entry["status"] == entry["expected"]
+    for phase in ("feasibility_time", "presolve_time", "encode_time", "solve_time"):
+        times = [run[phase] for run in runs]
+        entry[phase] = {"min": round(min(times), 6), "median": round(statistics.median(times), 6)}
+    totals = [run["feasibility_time"] + run["presolve_time"] + run["encode_time"] + run["solve_time"]
+              for run in runs]
+    entry["total_time"] = {"min": round(min(totals), 6), "median": round(statistics.median(totals), 6)}
+    entry["peak_python_kb"] = round(peak / 1024, 1)
+    for key in ("variables", "constraints", "stats"):
+        if key in runs[0]:
+            entry[key] = runs[0][key]
+    return entry
+
+
+def compare(results, baseline, threshold=1.5, min_time=0.01):
+    """List regressions of results against a baseline report"""
+    before = {(e["id"], e["config"], e["presolve"]): e for e in baseline["results"]}
+    regressions = []
+    for entry in results:
+        old = before.get((entry["id"], entry["config"], entry["presolve"]))
+        if old is None or "total_time" not in old:
+            continue
+        if "total_time" not in entry:
+            regressions.append({"id": entry["id"], "config": entry["config"],
+                                "before": old["total_time"]["median"], "after": entry["status"]})
+            continue
+        new_t, old_t = entry["total_time"]["median"], old["total_time"]["median"]
+        if new_t > min_time and new_t > threshold * max(old_t, min_time):
+            regressions.append({"id": entry["id"], "config": entry["config"],
+                                "before": old_t, "after": new_t,
+                                "ratio": round(new_t / max(old_t, 1e-9), 2)})
+    return regressions
+
+
+def _bench_in_child(conn, puzzle, config, repeat, presolve):
+    try:
+        entry = bench_puzzle(puzzle, config, repeat=repeat, presolve=presolve)
+        try:
+            import resource
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            entry["peak_rss_kb"] = rss // 1024 if sys.platform == "darwin" else rss
+        except ImportError:
+            pass
+        conn.send(("done", entry))
+    except Exception as exc:
+        conn.send(("error", f"{type(exc).__name__}: {exc}"))
+    finally:
+        conn.close()
+
+
+def bench_isolated(puzzle, config, repeat=3, presolve=False, timeout=60.0):
+    """Run bench_puzzle in a fresh process, giving up after timeout seconds
+
+    A fresh process per measurement keeps peak RSS (which includes Z3's
+    native memory) attributable to one puzzle and lets a runaway search be
+    killed.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    parent, child = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=_bench_in_child, args=(child, puzzle, config, repeat, presolve),
+                          daemon=True)
+    process.start()
+    child.close()
+    try:
+        if parent.poll(timeout):
+            kind, payload = parent.recv()
+        else:
+            kind, payload = "timeout", None
+    except EOFError:
+        kind, payload = "error", "benchmark process died"
+    finally:
+        parent.close()
+        process.terminate()
+        process.join()
+    if kind == "done":
+        return payload
+    entry = {"id": puzzle.get("id"), "config": config, "presolve": presolve,
+             "expected": puzzle.get("expected"), "status": kind, "ok": False}
+    if kind == "timeout":
+        entry["timeout"] = timeout
+    else:
+        entry["error"] = payload
+    return entry
+
+
+def run_benchmark(puzzles, configs, repeat=3, presolve=False, timeout=60.0, log=None):
+    results = []
+    for puzzle in puzzles:
+        for config in configs:
+            if timeout:
+                entry = bench_isolated(puzzle, config, repeat=repeat, presolve=presolve,
+                                       timeout=timeout)
+            else:
+                entry = bench_puzzle(puzzle, config, repeat=repeat, presolve=presolve)
+            results.append(entry)
+            if log is not None:
+                flag = "" if entry["ok"] or entry["status"] in ("error", "timeout") else "  WRONG"
+                if "total_time" in entry:
+                    log.write(f"{entry['id']:<24} {config:<11} {entry['status']:<6} "
+                              f"encode {entry['encode_time']['median']:8.4f}s "
+                              f"solve {entry['solve_time']['median']:8.4f}s{flag}\n")
+                else:
+                    log.write(f"{entry['id']:<24} {config:<11} {entry['status']}{flag}\n")
+                log.flush()
+    return results
+
+
+def summarize(results):
+    summary = {}
+    for entry in results:
+        s = summary.setdefault(entry["config"], {"puzzles": 0, "wrong": 0, "timeouts": 0,
+                                                 "errors": 0, "total_time": 0.0})
+        s["puzzles"] += 1
+        s["wrong"] += not entry["ok"] and entry["status"] not in ("error", "timeout")
+        s["timeouts"] += entry["status"] == "timeout"
+        s["errors"] += entry["status"] == "error"
+        if "total_time" in entry:
+            s["total_time"] = round(s["total_time"] + entry["total_time"]["median"], 6)
+    return summary
+
+
+# Modules the editor must not load until they are needed
+LAZY_MODULES = ("z3", "matplotlib", "pygame")
+
+_STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import pips_solver_interface as gui
+imported = time.perf_counter()
+loaded = [m for m in %r if m in sys.modules]
+app = gui.DominoPuzzleBuilder()
+app.draw()
+gui.pygame.display.flip()
+frame = time.perf_counter()
+app.background.shutdown()
+print(json.dumps({"import": imported - start, "first_frame": frame - start,
+                  "loaded_at_import": loaded}))
+""" % (LAZY_MODULES,)
+
+
+def bench_startup(repeat=5):
+    """Time importing the editor and its first frame in fresh interpreters
+
+    The window uses SDL's dummy video driver so runs are comparable with
+    and without a display. "process" also counts interpreter start-up.
+    """
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", PYGAME_HIDE_SUPPORT_PROMPT="1")
+    here = os.path.dirname(os.path.abspath(__file__))
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = subprocess.run([sys.executable, "-c", _STARTUP_SCRIPT], cwd=here, env=env,
+                             capture_output=True, text=True, check=True).stdout
+        run = json.loads(out.strip().splitlines()[-1])
+        run["process"] = time.perf_counter() - start
+        runs.append(run)
+    entry = {}
+    for key in ("import", "first_frame", "process"):
+        times = [run[key] for run in runs]
+        entry[key] = {"min": round(min(times), 6), "median": round(statistics.median(times), 6)}
+    entry["loaded_at_import"] = sorted({m for run in runs for m in run["loaded_at_import"]})
+    return entry
+
+
+def compare_startup(startup, baseline, threshold=1.5, min_time=0.05):
+    """List startup regressions against the startup section of a baseline"""
+    regressions = [{"metric": "loaded_at_import", "before": [], "after": startup["loaded_at_import"]}
+                   ] if startup["loaded_at_import"] else []
+    for key in ("import", "first_frame"):
+        if key not in baseline:
+            continue
+        new_t, old_t = startup[key]["median"], baseline[key]["median"]
+        if new_t > min_time and new_t > threshold * max(old_t, min_time):
+            regressions.append({"metric": key, "before": old_t, "after": new_t,
+                                "ratio": round(new_t / max(old_t, 1e-9), 2)})
+    return regressions
+
+
+def environment():
+    info = {"python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count()}
+    try:
+        import z3
+        info["z3"] = z3.get_version_string()
+    except ImportError:
+        pass
+    return info
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="pips_bench", description="Benchmark the Pips solver backends")
+    parser.add_argument("--corpus", default=CORPUS_PATH, help="corpus JSONL file")
+    parser.add_argument("--regenerate", action="store_true",
+                        help="rebuild the corpus from the seed before benchmarking")
+    parser.add_argument("--configs", default="z3,z3-compact,dlx",
+                        help=f"comma-separated configurations from {', '.join(CONFIGS)}")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per puzzle")
+    parser.add_argument("--presolve", action="store_true", help="presolve before each backend")
+    parser.add_argument("--timeout", type=float, default=60.0,
+                        help="seconds allowed per puzzle and configuration (0 runs in-process)")
+    parser.add_argument("--max-cells", type=int, help="skip puzzles with more cells than this")
+    parser.add_argument("-o", "--output", default="pips-bench.json", help="JSON report path")
+    parser.add_argument("--baseline", help="earlier report to check for regressions")
+    parser.add_argument("--threshold", type=float, default=1.5,
+                        help="slowdown ratio that counts as a regression")
+    parser.add_argument("--startup", action="store_true",
+                        help="benchmark editor import and first-frame time instead of solving")
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        startup = bench_startup(repeat=args.repeat)
+        report = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "environment": environment(),
+                  "repeat": args.repeat, "startup": startup}
+        sys.stderr.write(f"import {startup['import']['median']:.4f}s  "
+                         f"first frame {startup['first_frame']['median']:.4f}s  "
+                         f"process {startup['process']['median']:.4f}s\n")
+        baseline = {}
+        if args.baseline:
+            with open(args.baseline) as f:
+                baseline = json.load(f).get("startup", {})
+        report["regressions"] = compare_startup(startup, baseline, threshold=args.threshold)
+        for r in report["regressions"]:
+            sys.stderr.write(f"regression: {r['metric']} {r['before']} -> {r['after']}\n")
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+        return 1 if report["regressions"] else 0
+
+    configs = args.configs.split(",")
+    for config in configs:
+        if config not in CONFIGS:
+            parser.error(f"unknown configuration {config!r}")
+
+    if args.regenerate:
+        write_corpus(generate_corpus(), args.corpus)
+    header, puzzles = read_corpus(args.corpus)
+    if args.max_cells is not None:
+        puzzles = [p for p in puzzles if p["tags"]["cells"] <= args.max_cells]
+
+    results = run_benchmark(puzzles, configs, repeat=args.repeat, presolve=args.presolve,
+                            timeout=args.timeout, log=sys.stderr)
+    report = {"corpus_version": header["corpus_version"], "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "environment": environment(), "repeat": args.repeat, "timeout": args.timeout,
+              "summary": summarize(results), "results": results}
+    failed = any(not entry["ok"] for entry in results)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("corpus_version") != header["corpus_version"]:
+            sys.stderr.write("warning: baseline was run on a different corpus version\n")
+        report["regressions"] = compare(results, baseline, threshold=args.threshold)
+        for r in report["regressions"]:
+            sys.stderr.write(f"regression: {r['id']} {r['config']} {r['before']} -> {r['after']}\n")
+        failed = failed or bool(report["regressions"])
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=1)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""Incremental board model shared by the editor and the solver backends
+
+A Board is the set of active (row, col) cells. Cells are numbered in
+row-major order, as in the notebook, and edges come in the order of
+pips_solver.list_edges_from_grid: row by row, horizontal edges first, then
+vertical edges down to the next row.
+
+Adding or removing a cell updates the sorted cell list, the sorted edge
+keys, the neighbor sets and the per-row/column counts that give the
+bounding box; nothing is rescanned. Numbered views (cell_map, edges, the
+dense map) are derived from those on first use after an edit and then
+returned as-is, so repeated reads cost O(1).
+"""
+import bisect
+
+_NEIGHBORS = ((0, 1), (1, 0), (0, -1), (-1, 0))
+
+
+def _edge_key(p, q):
+    """Sort key of the edge between adjacent cells p and q
+
+    (row, 0, col) is the horizontal edge (row, col)-(row, col + 1) and
+    (row, 1, col) the vertical edge (row, col)-(row + 1, col).
+    """
+    (r1, c1), (r2, c2) = sorted((p, q))
+    return (r1, 0, c1) if r1 == r2 else (r1, 1, c1)
+
+
+def _edge_cells(key):
+    r, kind, c = key
+    return ((r, c), (r, c + 1)) if kind == 0 else ((r, c), (r + 1, c))
+
+
+class Board:
+    """Active cells of a Pips board with numbering, edges and neighbors"""
+
+    def __init__(self, positions=()):
+        self.positions = sorted(set(positions))  # row-major (row, col) list
+        active = set(self.positions)
+        self.neighbors = {p: set() for p in self.positions}
+        self.edge_keys = []
+        for p in self.positions:
+            for dr, dc in _NEIGHBORS:
+                q = (p[0] + dr, p[1] + dc)
+                if q in active:
+                    self.neighbors[p].add(q)
+                    if q > p:
+                        self.edge_keys.append(_edge_key(p, q))
+        self.edge_keys.sort()
+        self.row_counts = {}
+        self.col_counts = {}
+        for r, c in self.positions:
+            self.row_counts[r] = self.row_counts.get(r, 0) + 1
+            self.col_counts[c] = self.col_counts.get(c, 0) + 1
+        self.version = 0
+        self._changed()
+
+    @classmethod
+    def from_map(cls, map_structure):
+        """Board of the non-hole cells of a map (numbering must be row-major)"""
+        return cls((r, c) for r, row in enumerate(map_structure)
+                   for c, val in enumerate(row) if val != -1)
+
+    def _changed(self):
+        self.version += 1
+        self._cell_map = None
+        self._edges = None
+        self._map = None
+        self._bbox = None
+
+    def __contains__(self, pos):
+        return pos in self.neighbors
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __iter__(self):
+        return iter(self.positions)
+
+    def add(self, pos):
+        """Activate a cell; returns False if it was already active"""
+        if pos in self.neighbors:
+            return False
+        bisect.insort(self.positions, pos)
+        self.neighbors[pos] = set()
+        for dr, dc in _NEIGHBORS:
+            q = (pos[0] + dr, pos[1] + dc)
+            if q in self.neighbors:
+                self.neighbors[pos].add(q)
+                self.neighbors[q].add(pos)
+                bisect.insort(self.edge_keys, _edge_key(pos, q))
+        r, c = pos
+        self.row_counts[r] = self.row_counts.get(r, 0) + 1
+        self.col_counts[c] = self.col_counts.get(c, 0) + 1
+        self._changed()
+        return True
+
+    def remove(self, pos):
+        """Deactivate a cell; returns False if it was not active"""
+        if pos not in self.neighbors:
+            return False
+        del self.positions[bisect.bisect_left(self.positions, pos)]
+        for q in self.neighbors.pop(pos):
+            self.neighbors[q].discard(pos)
+            key = _edge_key(pos, q)
+            del self.edge_keys[bisect.bisect_left(self.edge_keys, key)]
+        r, c = pos
+        for counts, k in ((self.row_counts, r), (self.col_counts, c)):
+            counts[k] -= 1
+            if not counts[k]:
+                del counts[k]
+        self._changed()
+        return True
+
+    def toggle(self, pos):
+        """Add the cell if it is inactive, otherwise remove it"""
+        if not self.add(pos):
+            self.remove(pos)
+
+    def clear(self):
+        """Deactivate every cell; version keeps counting up so stale caches miss"""
+        version = self.version
+        self.__init__()
+        self.version = version + 1
+
+    @property
+    def cell_map(self):
+        """{(row, col): cell number}"""
+        if self._cell_map is None:
+            self._cell_map = {p: i for i, p in enumerate(self.positions)}
+        return self._cell_map
+
+    def number(self, pos):
+        return self.cell_map[pos]
+
+    @property
+    def cells(self):
+        return list(range(len(self.positions)))
+
+    @property
+    def node_pos(self):
+        """{cell number: (row, col)}"""
+        return dict(enumerate(self.positions))
+
+    @property
+    def edges(self):
+        """[(cell, cell), ...] in list_edges_from_grid order"""
+        if self._edges is None:
+            number = self.cell_map
+            self._edges = []
+            for key in self.edge_keys:
+                p, q = _edge_cells(key)
+                self._edges.append((number[p], number[q]))
+        return self._edges
+
+    @property
+    def bbox(self):
+        """(min_row, min_col, max_row, max_col), or None for an empty board"""
+        if self._bbox is None and self.positions:
+            self._bbox = (min(self.row_counts), min(self.col_counts),
+                          max(self.row_counts), max(self.col_counts))
+        return self._bbox
+
+    def map_structure(self):
+        """Dense map of the bounding box with -1 for holes"""
+        if self._map is None:
+            self._map = []
+            if self.positions:
+                min_r, min_c, max_r, max_c = self.bbox
+                self._map = [[-1] * (max_c - min_c + 1) for _ in range(max_r - min_r + 1)]
+                for i, (r, c) in enumerate(self.positions):
+                    self._map[r - min_r][c - min_c] = i
+        return self._map
+
+    def problem(self, dominos, regions):
+        """(cells, dominos, edges, regions) as taken by every backend"""
+        return self.cells, list(dominos), self.edges, list(regions)
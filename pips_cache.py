@@ -0,0 +1,187 @@
+"""Canonical-form solution cache for Pips puzzles
+
+Two puzzles are equivalent when one is the other shifted, rotated or
+mirrored on the grid, with its cells numbered differently, its dominos
+listed in another order or flipped, or its regions listed in another order.
+canonicalize() maps every member of such a family to the same key, and
+solutions are stored in canonical cell numbering as (cell, cell, pips, pips)
+tiles so that a hit can be replayed onto the caller's own numbering.
+
+SolutionCache is a bounded in-memory LRU optionally backed by sqlite, so
+results survive restarts and can be shared between processes.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import pips_solver
+
+# The eight symmetries of the square, as functions of (row, col)
+TRANSFORMS = (
+    lambda r, c: (r, c),
+    lambda r, c: (c, -r),
+    lambda r, c: (-r, -c),
+    lambda r, c: (-c, r),
+    lambda r, c: (r, -c),
+    lambda r, c: (-r, c),
+    lambda r, c: (c, r),
+    lambda r, c: (-c, -r),
+)
+
+MISS = object()
+
+
+class CanonicalForm:
+    """Canonical key of a puzzle plus the cell renumbering that produced it"""
+
+    def __init__(self, key, text, to_canonical):
+        self.key = key
+        self.text = text
+        self.to_canonical = to_canonical  # caller cell -> canonical cell
+        self.from_canonical = {v: k for k, v in to_canonical.items()}
+
+
+def canonicalize(map_structure, dominos, regions):
+    """Return the CanonicalForm shared by all equivalent puzzles"""
+    node_pos = pips_solver.node_positions(map_structure)
+    tiles = sorted([min(a, b), max(a, b)] for a, b in dominos)
+
+    best = None
+    for transform in TRANSFORMS:
+        moved = {cell: transform(r, c) for cell, (r, c) in node_pos.items()}
+        min_r = min((r for r, c in moved.values()), default=0)
+        min_c = min((c for r, c in moved.values()), default=0)
+        coords = sorted((r - min_r, c - min_c, cell) for cell, (r, c) in moved.items())
+        to_canonical = {cell: i for i, (_, _, cell) in enumerate(coords)}
+        canon_regions = sorted(
+            [sorted(to_canonical[c] for c in cells_R), op,
+             sorted(target) if isinstance(target, list) else target]
+            for cells_R, op, target in regions
+        )
+        text = json.dumps([[[r, c] for r, c, _ in coords], tiles, canon_regions],
+                          separators=(",", ":"))
+        if best is None or text < best[0]:
+            best = (text, to_canonical)
+
+    text, to_canonical = best
+    key = hashlib.sha256(text.encode()).hexdigest()
+    return CanonicalForm(key, text, to_canonical)
+
+
+def to_canonical_solution(form, placements, dominos, edges):
+    """Express placements as canonical [cell, cell, pips, pips] tiles"""
+    if placements is None:
+        return None
+    tiles = []
+    for d, e, o in placements:
+        a, b = dominos[d]
+        if o == 1:
+            a, b = b, a
+        c1, c2 = form.to_canonical[edges[e][0]], form.to_canonical[edges[e][1]]
+        if c1 > c2:
+            c1, c2, a, b = c2, c1, b, a
+        tiles.append([c1, c2, a, b])
+    return sorted(tiles)
+
+
+def from_canonical_solution(form, tiles, dominos, edges):
+    """Replay canonical tiles onto the caller's dominos and edges"""
+    if tiles is None:
+        return None
+    edge_index = {}
+    for e, (c1, c2) in enumerate(edges):
+        edge_index[(c1, c2)] = (e, False)
+        edge_index[(c2, c1)] = (e, True)
+    free = {}
+    for d, (a, b) in enumerate(dominos):
+        free.setdefault((min(a, b), max(a, b)), []).append(d)
+
+    placements = []
+    for c1, c2, a, b in tiles:
+        x1, x2 = form.from_canonical[c1], form.from_canonical[c2]
+        e, reverse = edge_index[(x1, x2)]
+        if reverse:
+            a, b = b, a
+        d = free[(min(a, b), max(a, b))].pop(0)
+        o = 0 if tuple(dominos[d]) == (a, b) else 1
+        placements.append((d, e, o))
+    return sorted(placements)
+
+
+class SolutionCache:
+    """Bounded LRU of canonical solutions with an optional sqlite store"""
+
+    def __init__(self, maxsize=1024, path=None):
+        self.maxsize = maxsize
+        self.path = path
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.db = None
+        if path:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute("CREATE TABLE IF NOT EXISTS solutions "
+                            "(key TEXT PRIMARY KEY, solution TEXT)")
+            self.db.commit()
+
+    def get(self, key):
+        """Return the stored canonical solution (None means unsat) or MISS"""
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            if self.db is not None:
+                row = self.db.execute("SELECT solution FROM solutions WHERE key = ?",
+                                      (key,)).fetchone()
+                if row is not None:
+                    self.hits += 1
+                    value = json.loads(row[0])
+                    self._remember(key, value)
+                    return value
+            self.misses += 1
+            return MISS
+
+    def put(self, key, value):
+        with self.lock:
+            self._remember(key, value)
+            if self.db is not None:
+                self.db.execute("INSERT OR REPLACE INTO solutions VALUES (?, ?)",
+                                (key, json.dumps(value)))
+                self.db.commit()
+
+    def _remember(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+
+def cached_solve(map_structure, dominos, regions, cache, runner=None, **options):
+    """Solve through the cache; returns (placements or None, hit)
+
+    On a miss the puzzle goes to runner(cells, dominos, edges, regions),
+    which defaults to pips_solver.run_solver with the given options.
+    """
+    cells = sorted(pips_solver.node_positions(map_structure))
+    edges = pips_solver.list_edges_from_grid(map_structure)
+    form = canonicalize(map_structure, dominos, regions)
+
+    tiles = cache.get(form.key)
+    if tiles is not MISS:
+        return from_canonical_solution(form, tiles, dominos, edges), True
+
+    if runner is None:
+        placements = pips_solver.run_solver(cells, dominos, edges, regions, **options)
+    else:
+        placements = runner(cells, dominos, edges, regions)
+    cache.put(form.key, to_canonical_solution(form, placements, dominos, edges))
+    return placements, False
@@ -0,0 +1,389 @@
+"""Dancing Links (Algorithm X) backend for the Pips solver
+
+Pips is an exact cover problem: every domino is used once and every cell is
+covered once. Each candidate placement (d, e, o) is a row covering the domino
+column d and the two cell columns of edge e. Region constraints are checked
+incrementally while the search descends: a placement only re-checks the
+regions of the two cells it covers, bounding their open cells by the pip
+values still left in the pool and by the cells' own allowed values. Odd
+pockets of open cells are pruned, and so are open cells whose only open
+neighbour leaves them no placement the regions still allow.
+"""
+import time
+
+from pips_feasibility import unary_domains
+from pips_metrics import NULL
+
+# Nodes searched between two looks at the clock
+CLOCK_INTERVAL = 256
+
+
+class DancingLinks:
+    """Exact cover search over domino placements with region pruning"""
+
+    def __init__(self, cells, dominos, edges, regions):
+        self.cells = cells
+        self.dominos = dominos
+        self.edges = edges
+        self.regions = regions
+
+        D = len(dominos)
+        ncols = D + len(cells)
+        cell_col = {c: D + i for i, c in enumerate(cells)}
+        self.header = {c: col + 1 for c, col in cell_col.items()}
+
+        # Node 0 is the root, nodes 1..ncols are the column headers
+        self.L = [ncols] + list(range(ncols))
+        self.R = list(range(1, ncols + 1)) + [0]
+        self.U = list(range(ncols + 1))
+        self.D = list(range(ncols + 1))
+        self.C = list(range(ncols + 1))
+        self.S = [0] * (ncols + 1)
+        self.ROW = [-1] * (ncols + 1)
+
+        # Identical dominos are interchangeable, so copies of a tile must sit
+        # on increasing (edge, orientation) positions in index order
+        self.prev_same = [-1] * D
+        self.next_same = [-1] * D
+        last_seen = {}
+        for d, (a, b) in enumerate(dominos):
+            key = (min(a, b), max(a, b))
+            prev = last_seen.get(key, -1)
+            self.prev_same[d] = prev
+            if prev >= 0:
+                self.next_same[prev] = d
+            last_seen[key] = d
+        self.position = [None] * D
+
+        # Search state
+        domains = unary_domains(cells, regions)
+        self.neighbours = {c: [] for c in cells}
+        for c1, c2 in edges:
+            self.neighbours[c1].append(c2)
+            self.neighbours[c2].append(c1)
+        self.cell_val = {}
+        self.cell_regions = {c: [] for c in cells}
+        for i, (cells_R, _, _) in enumerate(regions):
+            for c in cells_R:
+                self.cell_regions[c].append(i)
+        self.reg_sum = [0] * len(regions)
+        self.reg_left = [len(cells_R) for cells_R, _, _ in regions]
+        # Range the open cells of each region can still add, from the cell domains
+        self.low = {c: min(domains[c], default=0) for c in cells}
+        self.high = {c: max(domains[c], default=6) for c in cells}
+        self.reg_low = [sum(self.low[c] for c in cells_R) for cells_R, _, _ in regions]
+        self.reg_high = [sum(self.high[c] for c in cells_R) for cells_R, _, _ in regions]
+        self.reg_counts = [[0] * 7 for _ in regions]
+        self.half_counts = [0] * 7
+        for a, b in dominos:
+            self.half_counts[a] += 1
+            self.half_counts[b] += 1
+        self.nodes = 0
+        self.deadline = None
+        self.best = []  # rows of the deepest consistent partial placement so far
+
+        # Placements that break a region on their own (a value a cell may not
+        # take, a two-cell region the tile cannot fill) or cut off an odd
+        # pocket of cells are never added. The pockets only depend on the edge.
+        even = []
+        for c1, c2 in edges:
+            self.cell_val[c1] = self.cell_val[c2] = None
+            even.append(self._pockets_even((c1, c2)))
+            del self.cell_val[c1], self.cell_val[c2]
+        fits = {}  # (first value, second value, edge) -> bool, shared by identical tiles
+        self.rows = []
+        for d, (a, b) in enumerate(dominos):
+            for e, (c1, c2) in enumerate(edges):
+                if not even[e]:
+                    continue
+                for o in [0, 1]:
+                    if o == 1 and a == b:
+                        continue  # a double looks the same both ways round
+                    key = (a, b, e) if o == 0 else (b, a, e)
+                    if key not in fits:
+                        fits[key] = self._fits((d, e, o))
+                    if fits[key]:
+                        self._add_row((d, e, o), [d + 1, cell_col[c1] + 1, cell_col[c2] + 1])
+
+    def _add_row(self, placement, headers):
+        row = len(self.rows)
+        self.rows.append(placement)
+        first = None
+        for h in headers:
+            n = len(self.C)
+            self.C.append(h)
+            self.ROW.append(row)
+            self.U.append(self.U[h])
+            self.D.append(h)
+            self.D[self.U[h]] = n
+            self.U[h] = n
+            self.S[h] += 1
+            if first is None:
+                first = n
+                self.L.append(n)
+                self.R.append(n)
+            else:
+                self.L.append(self.L[first])
+                self.R.append(first)
+                self.R[self.L[first]] = n
+                self.L[first] = n
+
+    def _cover(self, h):
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        R[L[h]] = R[h]
+        L[R[h]] = L[h]
+        i = D[h]
+        while i != h:
+            j = R[i]
+            while j != i:
+                D[U[j]] = D[j]
+                U[D[j]] = U[j]
+                S[C[j]] -= 1
+                j = R[j]
+            i = D[i]
+
+    def _uncover(self, h):
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        i = U[h]
+        while i != h:
+            j = L[i]
+            while j != i:
+                S[C[j]] += 1
+                D[U[j]] = j
+                U[D[j]] = j
+                j = L[j]
+            i = U[i]
+        R[L[h]] = h
+        L[R[h]] = h
+
+    def _blocked(self, row):
+        """True if the row would put an identical copy out of order"""
+        d, e, o = self.rows[row]
+        prev, nxt = self.prev_same[d], self.next_same[d]
+        if prev >= 0 and self.position[prev] is not None and self.position[prev] > (e, o):
+            return True
+        if nxt >= 0 and self.position[nxt] is not None and self.position[nxt] < (e, o):
+            return True
+        return False
+
+    def _choose_column(self):
+        """Pick the open column with the fewest remaining rows"""
+        R, S = self.R, self.S
+        best, best_size = None, None
+        h = R[0]
+        while h != 0:
+            if best is None or S[h] < best_size:
+                best, best_size = h, S[h]
+                if best_size <= 1:
+                    break
+            h = R[h]
+        return best
+
+    def _bound(self, k, largest):
+        """Sum of the k smallest (or largest) pip values left in the pool"""
+        total = 0
+        values = range(6, -1, -1) if largest else range(7)
+        for v in values:
+            if k <= 0:
+                break
+            take = min(k, self.half_counts[v])
+            total += take * v
+            k -= take
+        return total
+
+    def _region_ok(self, i):
+        _, op, target = self.regions[i]
+        left = self.reg_left[i]
+        counts = self.reg_counts[i]
+        if op == "sum_eq":
+            return (self.reg_sum[i] + max(self._bound(left, False), self.reg_low[i]) <= target
+                    <= self.reg_sum[i] + min(self._bound(left, True), self.reg_high[i]))
+        if op == "sum_lt":
+            return self.reg_sum[i] + max(self._bound(left, False), self.reg_low[i]) < target
+        if op == "sum_gt":
+            return self.reg_sum[i] + min(self._bound(left, True), self.reg_high[i]) > target
+        if op == "all_eq":
+            used = [v for v in range(7) if counts[v]]
+            if len(used) > 1:
+                return False
+            if used and left:
+                return self.half_counts[used[0]] >= left
+            return True
+        if op == "all_diff":
+            if max(counts) > 1:
+                return False
+            free = sum(1 for v in range(7) if not counts[v] and self.half_counts[v])
+            return left <= free
+        if op == "domain":
+            return all(not counts[v] for v in range(7) if v not in target)
+        return True
+
+    def _set_cell(self, c, v, sign):
+        if sign > 0:
+            self.cell_val[c] = v
+        else:
+            del self.cell_val[c]
+        for i in self.cell_regions[c]:
+            self.reg_sum[i] += sign * v
+            self.reg_left[i] -= sign
+            self.reg_low[i] -= sign * self.low[c]
+            self.reg_high[i] -= sign * self.high[c]
+            self.reg_counts[i][v] += sign
+
+    def _apply(self, row, sign):
+        d, e, o = self.rows[row]
+        self.position[d] = (e, o) if sign > 0 else None
+        self._set_values(self.rows[row], sign)
+
+    def _fits(self, placement):
+        """True if the placement alone leaves the regions of its cells satisfiable"""
+        self._set_values(placement, 1)
+        ok = self._consistent(self.edges[placement[1]])
+        self._set_values(placement, -1)
+        return ok
+
+    def _set_values(self, placement, sign):
+        d, e, o = placement
+        a, b = self.dominos[d]
+        if o == 1:
+            a, b = b, a
+        c1, c2 = self.edges[e]
+        self.half_counts[a] -= sign
+        self.half_counts[b] -= sign
+        self._set_cell(c1, a, sign)
+        self._set_cell(c2, b, sign)
+
+    def _consistent(self, cells=None):
+        """Check the regions of the given cells, or every region if cells is None"""
+        if cells is None:
+            regions = range(len(self.regions))
+        else:
+            regions = set().union(*(self.cell_regions[c] for c in cells))
+        return all(self._region_ok(i) for i in regions)
+
+    def _forced_cells_ok(self):
+        """True unless an open cell with one open neighbour has no usable row
+
+        Such a cell can only be covered together with that neighbour, so
+        the pool running out of suitable tiles dooms the whole branch.
+        """
+        cell_val, D = self.cell_val, self.D
+        for c in self.cells:
+            if c in cell_val or sum(1 for n in self.neighbours[c] if n not in cell_val) != 1:
+                continue
+            h = self.header[c]
+            r = D[h]
+            while r != h:
+                row = self.ROW[r]
+                if not self._blocked(row):
+                    self._apply(row, 1)
+                    ok = self._consistent(self.edges[self.rows[row][1]])
+                    self._apply(row, -1)
+                    if ok:
+                        break
+                r = D[r]
+            else:
+                return False
+        return True
+
+    def _pockets_even(self, cells):
+        """True if every pocket of open cells next to the given cells is even
+
+        A pocket with an odd number of cells can never be tiled, whatever
+        its regions allow.
+        """
+        seen = set()
+        for c in cells:
+            for start in self.neighbours[c]:
+                if start in self.cell_val or start in seen:
+                    continue
+                seen.add(start)
+                stack = [start]
+                size = 0
+                while stack:
+                    size += 1
+                    for n in self.neighbours[stack.pop()]:
+                        if n not in self.cell_val and n not in seen:
+                            seen.add(n)
+                            stack.append(n)
+                if size % 2:
+                    return False
+        return True
+
+    def partial(self):
+        """The deepest consistent partial placement reached, as (d, e, o) tuples"""
+        return sorted(self.rows[row] for row in self.best)
+
+    def first_solution(self, timeout=None):
+        """First solution or None; raises pips_solver.SolveUnknown after timeout seconds"""
+        self.deadline = None if timeout is None else time.perf_counter() + timeout
+        try:
+            return next(self.solutions(), None)
+        finally:
+            self.deadline = None
+
+    def solutions(self):
+        """Yield every solution as a sorted list of (d, e, o) placements"""
+        if not self._consistent():
+            return
+        yield from self._search([])
+
+    def _search(self, chosen):
+        self.nodes += 1
+        if len(chosen) > len(self.best):
+            self.best = list(chosen)
+        if self.deadline is not None and self.nodes % CLOCK_INTERVAL == 0 \
+                and time.perf_counter() > self.deadline:
+            from pips_solver import SolveUnknown
+            raise SolveUnknown("timeout", self.partial())
+        R, L, D, C = self.R, self.L, self.D, self.C
+        if R[0] == 0:
+            yield sorted(self.rows[row] for row in chosen)
+            return
+        if not self._forced_cells_ok():
+            return
+
+        h = self._choose_column()
+        if h is None or self.S[h] == 0:
+            return
+
+        self._cover(h)
+        r = D[h]
+        while r != h:
+            row = self.ROW[r]
+            if not self._blocked(row):
+                self._apply(row, 1)
+                cells = self.edges[self.rows[row][1]]
+                if self._consistent(cells) and self._pockets_even(cells):
+                    chosen.append(row)
+                    j = R[r]
+                    while j != r:
+                        self._cover(C[j])
+                        j = R[j]
+                    yield from self._search(chosen)
+                    j = L[r]
+                    while j != r:
+                        self._uncover(C[j])
+                        j = L[j]
+                    chosen.pop()
+                self._apply(row, -1)
+            r = D[r]
+        self._uncover(h)
+
+
+def run_solver(cells, dominos, edges, regions, metrics=NULL, timeout=None):
+    """Run the Dancing Links search and return the first solution or None
+
+    With a timeout (seconds) the search raises pips_solver.SolveUnknown
+    carrying the deepest partial placement once the time is up. The links
+    are all allocated up front, so there is no memory budget to enforce.
+    """
+    with metrics.phase("encode"):
+        dlx = DancingLinks(cells, dominos, edges, regions)
+    try:
+        with metrics.phase("search"):
+            placements = dlx.first_solution(timeout=timeout)
+    finally:
+        metrics.count("rows", len(dlx.rows))
+        metrics.count("nodes", dlx.nodes)
+    return placements
@@ -0,0 +1,268 @@
+"""Generator of random Pips puzzles with exactly one solution
+
+Each puzzle starts from a random board shape tiled with dominos drawn from
+a tile set (pips_bench.random_tiling). A hidden solution assigns pips to
+every cell, and a first batch of regions is derived from it. The regions are
+then refined until the hidden solution is the only one:
+
+- one pips_session.SolvingSession holds the board, the dominos and a
+  clause that blocks the hidden layout, so every check asks "is there
+  another solution?" without rebuilding anything;
+- while the answer is yes, the alternative solution shows a cell whose pips
+  differ from the hidden ones. If no region covers that cell, a new region
+  is grown around it. Otherwise its region is tightened: a sum_lt, sum_gt,
+  all_eq or all_diff region becomes sum_eq, and a sum_eq region is split so
+  that the cell stands alone;
+- with minimize=True, regions are then dropped again, one at a time,
+  whenever the puzzle stays unique without them.
+
+Regions are switched on and off through solver assumptions, so the
+refinement loop reuses everything the solver has learned. A layout whose
+alternatives differ only in where the dominos lie, and not in any pips,
+cannot be fixed by regions, so that tiling is discarded and a new one is
+drawn.
+
+Usage:
+    python3 pips_generate.py -n 1000 --rows 6 --cols 6 --workers 4 -o puzzles.jsonl
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pips_bench
+import pips_solver
+
+DOUBLE_SIX = [(a, b) for a in range(7) for b in range(a, 7)]
+TILE_SETS = ("double-six", "random")
+
+
+def draw_tiles(rng, count, tile_set="double-six"):
+    """Draw count dominos: distinct double-six tiles while they last, or any tiles"""
+    if tile_set == "double-six":
+        tiles = []
+        while len(tiles) < count:
+            deck = list(DOUBLE_SIX)
+            rng.shuffle(deck)
+            tiles.extend(deck)
+        return tiles[:count]
+    if tile_set == "random":
+        return [tuple(sorted((rng.randint(0, 6), rng.randint(0, 6)))) for _ in range(count)]
+    raise ValueError(f"unknown tile set {tile_set!r}, expected one of {TILE_SETS}")
+
+
+class PuzzleGenerator:
+    """Refines the regions of one hidden solution until it is unique"""
+
+    def __init__(self, rng, map_structure, pairs, tiles, density=0.5):
+        import pips_session
+
+        self.rng = rng
+        self.map = map_structure
+        self.node_pos = pips_solver.node_positions(map_structure)
+        self.at = {pos: c for c, pos in self.node_pos.items()}
+        self.values = {}
+        dominos = []
+        for (c1, c2), (a, b) in zip(pairs, tiles):
+            if rng.random() < 0.5:
+                a, b = b, a
+            self.values[c1], self.values[c2] = a, b
+            dominos.append([a, b] if rng.random() < 0.5 else [b, a])
+        rng.shuffle(dominos)
+        self.dominos = dominos
+
+        puzzle = pips_solver.normalize_puzzle({"map": map_structure, "dominos": dominos,
+                                               "regions": []})
+        self.cells, self.edges = puzzle["cells"], puzzle["edges"]
+        self.session = pips_session.SolvingSession(self.cells, dominos, self.edges,
+                                                   encoding="boolean")
+        self.checks = 0
+        if self.session.encoding is not None:
+            # Block the hidden layout so that any model is a second solution
+            edge_index = {frozenset(e): i for i, e in enumerate(self.edges)}
+            literals = []
+            used = set()
+            for c1, c2 in pairs:
+                e = edge_index[frozenset((c1, c2))]
+                c1, c2 = self.edges[e]
+                pips = [self.values[c1], self.values[c2]]
+                d = next(d for d, tile in enumerate(dominos)
+                         if d not in used and sorted(tile) == sorted(pips))
+                used.add(d)
+                literals.append(self.session.encoding.literal(d, e, 0 if dominos[d] == pips else 1))
+            from z3 import Not, Or
+            self.session.encoding.solver.add(Or([Not(lit) for lit in literals]))
+
+        self.regions = []  # (cells, op, target), all satisfied by the hidden values
+        self.covered = {}  # cell -> index into self.regions
+        for group, op, target in pips_bench.random_regions(rng, map_structure, self.values,
+                                                           density):
+            self._add(group, op, target)
+
+    def _add(self, group, op, target):
+        self.regions.append((list(group), op, target))
+        for c in group:
+            self.covered[c] = len(self.regions) - 1
+
+    def _replace(self, index, parts):
+        self.regions[index] = None
+        for c in list(self.covered):
+            if self.covered[c] == index:
+                del self.covered[c]
+        for group, op, target in parts:
+            self._add(group, op, target)
+
+    def _sum_eq(self, group):
+        return (sorted(group), "sum_eq", sum(self.values[c] for c in group))
+
+    def active(self):
+        return [region for region in self.regions if region is not None]
+
+    def alternative(self, regions=None):
+        """Pips of another solution under the given regions, or None if unique"""
+        self.checks += 1
+        self.session.sync(self.active() if regions is None else regions)
+        status, _, _ = self.session.check(decode=False)
+        if status != "sat":
+            return None if status == "unsat" else False
+        return self.session.values()
+
+    def refine(self, max_steps=200):
+        """Add or tighten regions until unique; False if regions cannot get there"""
+        if self.session.encoding is None:
+            return False
+        for _ in range(max_steps):
+            other = self.alternative()
+            if other is None:
+                return True
+            if other is False:
+                return False
+            differing = [c for c in self.cells if other[c] != self.values[c]]
+            if not differing:
+                return False  # same pips on a different tiling
+            uncovered = [c for c in differing if c not in self.covered]
+            if uncovered:
+                group = pips_bench.grow_region(self.rng, self.rng.choice(uncovered), self.node_pos,
+                                     self.at, self.covered)
+                group, op, target = pips_bench.region_for(self.rng, group,
+                                                          [self.values[c] for c in group])
+                self._add(group, op, target)
+                continue
+            cell = self.rng.choice(differing)
+            index = self.covered[cell]
+            group, op, target = self.regions[index]
+            if op != "sum_eq":
+                self._replace(index, [self._sum_eq(group)])
+            else:
+                rest = [c for c in group if c != cell]
+                self._replace(index, [self._sum_eq([cell])] + ([self._sum_eq(rest)] if rest else []))
+        return False
+
+    def minimize(self):
+        """Drop regions that the puzzle stays unique without"""
+        order = [i for i, region in enumerate(self.regions) if region is not None]
+        self.rng.shuffle(order)
+        for index in order:
+            trial = [region for i, region in enumerate(self.regions)
+                     if region is not None and i != index]
+            if self.alternative(trial) is None:
+                self._replace(index, [])
+
+    def puzzle(self):
+        regions = [[group, op, target] for group, op, target in self.active()]
+        return {"map": self.map, "dominos": self.dominos, "regions": regions}
+
+
+def generate_puzzle(seed, rows=6, cols=6, holes=0.15, tile_set="double-six", density=0.5,
+                    minimize=True, attempts=20):
+    """Generate one uniquely solvable puzzle from a seed (None if every attempt failed)"""
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    checks = 0
+    for attempt in range(1, attempts + 1):
+        map_structure, pairs = pips_bench.random_tiling(rng, rows, cols, holes=holes)
+        if not pairs:
+            continue
+        generator = PuzzleGenerator(rng, map_structure, pairs, draw_tiles(rng, len(pairs), tile_set),
+                                    density=density)
+        unique = generator.refine()
+        if unique and minimize:
+            generator.minimize()
+        checks += generator.checks
+        if unique:
+            puzzle = generator.puzzle()
+            puzzle["stats"] = {"seed": seed, "attempts": attempt, "checks": checks,
+                               "time": round(time.perf_counter() - start, 6)}
+            return puzzle
+    return None
+
+
+def _generate(args):
+    index, seed, options = args
+    puzzle = generate_puzzle(seed, **options)
+    if puzzle is not None:
+        puzzle = dict(id=f"gen-{seed}", **puzzle)
+    return index, puzzle
+
+
+def generate(count, seed=0, workers=1, **options):
+    """Yield count puzzles (in order), spread over a process pool
+
+    Puzzle i uses the seed seed + i, so a run can be reproduced or resumed.
+    A seed whose attempts all fail yields None.
+    """
+    jobs = ((i, seed + i, options) for i in range(count))
+    if workers == 1:
+        for job in jobs:
+            yield _generate(job)[1]
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for _, puzzle in pool.map(_generate, jobs, chunksize=4):
+            yield puzzle
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="pips_generate",
+                                     description="Generate Pips puzzles with a unique solution")
+    parser.add_argument("-n", "--count", type=int, default=10, help="puzzles to generate")
+    parser.add_argument("--rows", type=int, default=6)
+    parser.add_argument("--cols", type=int, default=6)
+    parser.add_argument("--holes", type=float, default=0.15, help="fraction of missing cells")
+    parser.add_argument("--tiles", default="double-six", choices=TILE_SETS,
+                        help="domino set the tiles are drawn from")
+    parser.add_argument("--density", type=float, default=0.5,
+                        help="fraction of cells covered by the initial regions")
+    parser.add_argument("--no-minimize", action="store_true",
+                        help="keep every region added while refining")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first puzzle")
+    parser.add_argument("--workers", type=int, default=1, help="processes (0: CPU count)")
+    parser.add_argument("-o", "--output", help="JSONL output (default: stdout)")
+    args = parser.parse_args(argv)
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    options = {"rows": args.rows, "cols": args.cols, "holes": args.holes, "tile_set": args.tiles,
+               "density": args.density, "minimize": not args.no_minimize}
+    start = time.perf_counter()
+    made = failed = 0
+    try:
+        for puzzle in generate(args.count, seed=args.seed,
+                               workers=args.workers or os.cpu_count() or 1, **options):
+            if puzzle is None:
+                failed += 1
+                continue
+            made += 1
+            out.write(json.dumps(puzzle, separators=(",", ":")) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - start
+    sys.stderr.write(f"generated {made} unique puzzles ({failed} seeds failed) in {elapsed:.2f}s, "
+                     f"{made / elapsed if elapsed else 0:.2f} puzzles/s\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
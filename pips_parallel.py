@@ -0,0 +1,638 @@
+"""Parallel solving strategies for Pips puzzles
+
+Connected-component decomposition: when the active cells fall into several
+islands (regions spanning islands glue them together), each island is an
+independent sub-puzzle once we know which dominos go to it. Candidate
+domino multisets are generated lazily per island, pruned on the pip totals
+the regions allow and screened with the pip-count checks of
+pips_feasibility; the islands of the surviving splits are solved side by
+side in a process pool. Results are merged back into global (d, e, o)
+placements. Boards with too many candidate splits are solved whole.
+
+Cube-and-conquer: a single hard board is split on the placements that can
+cover its most constrained cells. Every worker process builds the Z3
+encoding once and checks its cubes incrementally with push/pop; the first
+satisfiable cube cancels the rest.
+
+Portfolio: several complete configurations (backend, encoding, tactic,
+seed, ...) race on the same puzzle in separate processes. The first
+definitive answer, sat or unsat, is returned and the other processes are
+terminated. Each race is logged as one JSON line on the "pips.portfolio"
+logger and the winner is reported, so rank_portfolio can narrow the
+portfolio down from collected results.
+"""
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing import connection
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, as_completed, wait
+
+import pips_feasibility
+import pips_presolve
+import pips_solver
+
+logger = logging.getLogger("pips.portfolio")
+
+
+def connected_components(cells, edges, regions=()):
+    """Group cells into islands; a region spanning islands merges them"""
+    parent = {c: c for c in cells}
+
+    def find(c):
+        while parent[c] != c:
+            parent[c] = parent[parent[c]]
+            c = parent[c]
+        return c
+
+    def union(a, b):
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+
+    for c1, c2 in edges:
+        union(c1, c2)
+    for cells_R, _, _ in regions:
+        for c in cells_R[1:]:
+            union(cells_R[0], c)
+
+    groups = {}
+    for c in cells:
+        groups.setdefault(find(c), []).append(c)
+    return sorted(groups.values(), key=lambda g: (-len(g), g[0]))
+
+
+class Subproblem:
+    """One island: renumbered cells, edges and regions plus maps back"""
+
+    def __init__(self, component, edges, regions):
+        self.cell_map = list(component)  # local cell -> global cell
+        local = {c: i for i, c in enumerate(component)}
+        self.edge_map = [e for e, (c1, c2) in enumerate(edges) if c1 in local]
+        self.cells = list(range(len(component)))
+        self.edges = [(local[edges[e][0]], local[edges[e][1]]) for e in self.edge_map]
+        self.regions = [([local[c] for c in cells_R], op, target)
+                        for cells_R, op, target in regions if cells_R and cells_R[0] in local]
+
+
+def _sub_multisets(counts, k, pips, low, high):
+    """Yield count vectors <= counts that sum to k, with pips totalling low..high
+
+    pips[i] is the pip total of one tile of type i. Branches whose pip total
+    cannot end up within [low, high] are cut before they are expanded.
+    """
+    # Sorted pip totals of the tiles from type i on, to bound what is still reachable
+    suffix = [sorted(p for j in range(i, len(counts)) for p in [pips[j]] * counts[j])
+              for i in range(len(counts) + 1)]
+
+    def walk(start, k, low, high):
+        if k == 0:
+            if low <= 0 <= high:
+                yield (0,) * (len(counts) - start)
+            return
+        rest = suffix[start]
+        if len(rest) < k or sum(rest[:k]) > high or sum(rest[-k:]) < low:
+            return
+        for take in range(min(counts[start], k), -1, -1):
+            spent = take * pips[start]
+            for tail in walk(start + 1, k - take, low - spent, high - spent):
+                yield (take,) + tail
+
+    yield from walk(0, k, low, high)
+
+
+def _pip_bounds(cells, regions):
+    """Lowest and highest pip total the regions allow on an island"""
+    domains = pips_feasibility.unary_domains(cells, regions)
+    if not all(domains.values()):
+        return 1, 0
+    low = sum(min(domains[c]) for c in cells)
+    high = sum(max(domains[c]) for c in cells)
+    taken = set()
+    for cells_R, op, target in regions:
+        if op not in ("sum_eq", "sum_lt", "sum_gt") or taken.intersection(cells_R):
+            continue
+        taken.update(cells_R)
+        region_low = sum(min(domains[c]) for c in cells_R)
+        region_high = sum(max(domains[c]) for c in cells_R)
+        if op in ("sum_eq", "sum_gt"):
+            low += max(0, target + (op == "sum_gt") - region_low)
+        if op in ("sum_eq", "sum_lt"):
+            high -= max(0, region_high - target + (op == "sum_lt"))
+    return low, high
+
+
+class _TooManyCandidates(Exception):
+    pass
+
+
+def _solve_sub(cells, dominos, edges, regions, backend, presolve, options):
+    # Islands already run in parallel, so each one is checked sequentially
+    if pips_presolve.presolve(cells, dominos, edges, regions).status == "unsat":
+        return None
+    options = dict(options, cube_depth=0)
+    return pips_solver.run_solver(cells, dominos, edges, regions, backend=backend,
+                                  presolve=presolve, **options)
+
+
+class _Inline:
+    """Stand-in for a process pool when workers=1"""
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+# Above this many screened island multisets, solving the board whole is cheaper
+COMPONENT_CANDIDATE_LIMIT = 256
+
+
+def solve_components(cells, dominos, edges, regions, backend="z3", workers=None,
+                     presolve=False, cube_depth=0, cube_stats=None, timeout=None, **options):
+    """Solve each island separately and merge the placements
+
+    Falls back to a single run_solver call when the board is one component,
+    or when more than COMPONENT_CANDIDATE_LIMIT domino multisets survive the
+    pip-sum and pip-count screens. The islands of each candidate split are
+    solved concurrently in the pool.
+    timeout (seconds) covers the whole board: each island solve gets the
+    time left, and pips_solver.SolveUnknown is raised once it is used up.
+    """
+    def whole_board():
+        remaining = None if deadline is None else max(0.0, deadline - time.perf_counter())
+        return pips_solver.run_solver(cells, dominos, edges, regions, backend=backend,
+                                      presolve=presolve, workers=workers,
+                                      cube_depth=cube_depth, cube_stats=cube_stats,
+                                      timeout=remaining, **options)
+
+    deadline = None if timeout is None else time.perf_counter() + timeout
+    components = connected_components(cells, edges, regions)
+    if len(components) <= 1:
+        return whole_board()
+    if len(cells) != 2 * len(dominos) or any(len(comp) % 2 for comp in components):
+        return None
+
+    subs = [Subproblem(comp, edges, regions) for comp in components]
+
+    def island_options():
+        if deadline is None:
+            return options
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            raise pips_solver.SolveUnknown("timeout")
+        return dict(options, timeout=remaining)
+
+    # Domino types with the global indices of their copies
+    type_index = {}
+    for d, (a, b) in enumerate(dominos):
+        type_index.setdefault((min(a, b), max(a, b)), []).append(d)
+    keys = list(type_index)
+    pips = [a + b for a, b in keys]
+    bounds = [_pip_bounds(sub.cells, sub.regions) for sub in subs]
+
+    def tiles(multiset):
+        return [key for key, take in zip(keys, multiset) for _ in range(take)]
+
+    screened = {}
+
+    def screen(i, multiset):
+        """Cheap counting checks of one island with one multiset"""
+        if (i, multiset) not in screened:
+            if len(screened) >= COMPONENT_CANDIDATE_LIMIT:
+                raise _TooManyCandidates
+            screened[i, multiset] = not pips_feasibility.check_pips(
+                subs[i].cells, tiles(multiset), subs[i].regions)
+        return screened[i, multiset]
+
+    def splits(i, counts, total):
+        """Yield one multiset per island, from island i on, that pass the screens"""
+        later_low = sum(low for low, _ in bounds[i + 1:])
+        later_high = sum(high for _, high in bounds[i + 1:])
+        low = max(bounds[i][0], total - later_high)
+        high = min(bounds[i][1], total - later_low)
+        for multiset in _sub_multisets(counts, len(subs[i].cells) // 2, pips, low, high):
+            if deadline is not None and time.perf_counter() > deadline:
+                raise pips_solver.SolveUnknown("timeout")
+            if not screen(i, multiset):
+                continue
+            if i + 1 == len(subs):
+                yield (multiset,)
+                continue
+            left = [n - take for n, take in zip(counts, multiset)]
+            spent = sum(take * p for take, p in zip(multiset, pips))
+            for rest in splits(i + 1, left, total - spent):
+                yield (multiset,) + rest
+
+    try:
+        candidates = list(splits(0, [len(type_index[key]) for key in keys],
+                                 sum(a + b for a, b in dominos)))
+    except _TooManyCandidates:
+        return whole_board()
+
+    def merge(split):
+        """Lift the island placements of a solved split to global indices"""
+        left = {key: list(type_index[key]) for key in keys}
+        merged = []
+        for i, multiset in enumerate(split):
+            chosen = []
+            for key, take in zip(keys, multiset):
+                chosen.extend(left[key][:take])
+                left[key] = left[key][take:]
+            for d, e, o in results[i, multiset]:
+                d = chosen[d]
+                # Island dominos use the tile's canonical (low, high) orientation
+                if dominos[d][0] > dominos[d][1]:
+                    o = 1 - o
+                merged.append((d, subs[i].edge_map[e], o))
+        return sorted(merged)
+
+    workers = workers or os.cpu_count() or 1
+    pool = _Inline() if workers == 1 else ProcessPoolExecutor(max_workers=workers)
+    results = {}  # (island, multiset) -> placements or None
+    pending = {}
+    try:
+        while True:
+            candidates = [split for split in candidates
+                          if all(results.get(job, ()) is not None for job in enumerate(split))]
+            for split in candidates:
+                if all(job in results for job in enumerate(split)):
+                    for future in pending:
+                        future.cancel()
+                    return merge(split)
+            if not candidates:
+                return None
+            # Submit every island of the leading splits so they run side by side
+            submitted = set(pending.values())
+            for split in candidates:
+                for i, multiset in enumerate(split):
+                    if len(pending) >= 2 * workers:
+                        break
+                    if (i, multiset) in results or (i, multiset) in submitted:
+                        continue
+                    sub = subs[i]
+                    future = pool.submit(_solve_sub, sub.cells, tiles(multiset), sub.edges,
+                                         sub.regions, backend, presolve, island_options())
+                    pending[future] = (i, multiset)
+                    submitted.add((i, multiset))
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[pending.pop(future)] = future.result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def make_cubes(cells, dominos, edges, regions, depth=1):
+    """Split on the placements of the most constrained cell, depth levels deep
+
+    Each cube is a list of (d, e, o) placements. Identical dominos only
+    contribute their lowest unused copy, so cubes differ by more than a swap.
+    """
+    import pips_z3
+    domains = pips_z3.unary_domains(cells, regions)
+    types = pips_z3.domino_types(dominos)
+    cell_edges = {c: [] for c in cells}
+    for e, (c1, c2) in enumerate(edges):
+        cell_edges[c1].append(e)
+        cell_edges[c2].append(e)
+
+    cubes = [[]]
+    for _ in range(depth):
+        next_cubes = []
+        for cube in cubes:
+            covered = {c for d, e, o in cube for c in edges[e]}
+            used = {d for d, e, o in cube}
+            best = None
+            for c in cells:
+                if c in covered:
+                    continue
+                options = []
+                for e in cell_edges[c]:
+                    c1, c2 = edges[e]
+                    if c1 in covered or c2 in covered:
+                        continue
+                    for _, copies in types:
+                        free = [d for d in copies if d not in used]
+                        if not free:
+                            continue
+                        a, b = dominos[free[0]]
+                        for o in [0, 1]:
+                            if o == 1 and a == b:
+                                continue
+                            v1, v2 = (a, b) if o == 0 else (b, a)
+                            if v1 in domains[c1] and v2 in domains[c2]:
+                                options.append((free[0], e, o))
+                if best is None or len(options) < len(best):
+                    best = options
+            if best is None:
+                next_cubes.append(cube)  # nothing left to split on
+            else:
+                next_cubes.extend(cube + [p] for p in best)
+        cubes = next_cubes
+    return cubes
+
+
+_cube_worker = {}
+
+
+def _watch_cancel(cancel):
+    cancel.wait()
+    import z3
+    z3.main_ctx().interrupt()
+
+
+def _cube_worker_init(problem, options, cancel, deadline=None, watch=True):
+    """Build the incremental solver once per worker process
+
+    watch starts a thread that interrupts Z3 when cancel is set; the inline
+    (single worker) path has nothing to cancel it and skips it. An encoding
+    cut short by the deadline leaves every cube of this worker unknown.
+    """
+    import pips_z3
+    _cube_worker["cancel"] = cancel
+    _cube_worker["deadline"] = deadline  # wall-clock time.time(), shared by all workers
+    _cube_worker["expired"] = False
+    encode_deadline = None if deadline is None else time.perf_counter() + deadline - time.time()
+    try:
+        _cube_worker["encoding"] = pips_z3.encode(*problem, deadline=encode_deadline, **options)
+    except pips_solver.SolveUnknown:
+        _cube_worker["encoding"] = None
+        _cube_worker["expired"] = True
+    if watch:
+        threading.Thread(target=_watch_cancel, args=(cancel,), daemon=True).start()
+
+
+def _solve_cube(index, cube):
+    """Check one cube; returns (placements or None, per-cube statistics)"""
+    import z3
+    start = time.perf_counter()
+    encoding = _cube_worker["encoding"]
+    cancel = _cube_worker["cancel"]
+    deadline = _cube_worker.get("deadline")
+    stats = {"cube": index, "placements": [list(p) for p in cube]}
+    placements = None
+
+    if cancel.is_set():
+        stats["status"] = "cancelled"
+    elif _cube_worker["expired"] or (deadline is not None and time.time() >= deadline):
+        stats["status"] = "unknown"
+    elif encoding is None:
+        stats["status"] = "unsat"
+    else:
+        solver = encoding.solver
+        if deadline is not None:
+            solver.set("timeout", max(1, int((deadline - time.time()) * 1000)))
+        try:
+            solver.push()
+            try:
+                solver.add([encoding.literal(*p) for p in cube])
+                result = solver.check()
+                if result == z3.sat:
+                    stats["status"] = "sat"
+                    placements = encoding.decode(solver.model())
+                elif result == z3.unsat:
+                    stats["status"] = "unsat"
+                elif cancel.is_set():
+                    stats["status"] = "cancelled"
+                else:
+                    stats["status"] = "unknown"
+                    stats["reason"] = solver.reason_unknown()
+                z3_stats = solver.statistics()
+                for key in ("conflicts", "decisions", "propagations", "max memory"):
+                    if key in z3_stats.keys():
+                        stats[key.replace(" ", "_")] = z3_stats.get_key_value(key)
+            finally:
+                solver.pop()
+        except z3.Z3Exception:
+            # The interrupt landed outside check(); another cube already won
+            if not cancel.is_set():
+                raise
+            stats["status"] = "cancelled"
+            placements = None
+
+    stats["time"] = round(time.perf_counter() - start, 6)
+    return placements, stats
+
+
+def solve_cubes(cells, dominos, edges, regions, depth=1, workers=None, cube_stats=None,
+                timeout=None, memory=None, **options):
+    """Cube-and-conquer over a pool of incremental Z3 workers
+
+    Returns the first solution found (or None). If cube_stats is a list it
+    receives one statistics dict per cube, ordered by cube number. With a
+    timeout (seconds) or memory budget (megabytes per worker), cubes left
+    undecided raise pips_solver.SolveUnknown unless another cube is solved.
+    """
+    problem = (cells, dominos, edges, regions)
+    deadline = None if timeout is None else time.time() + timeout
+    if memory is not None:
+        options = dict(options, params=dict(options.get("params") or {}, max_memory=int(memory)))
+    cubes = make_cubes(cells, dominos, edges, regions, depth=depth)
+    if deadline is not None and time.time() >= deadline:
+        raise pips_solver.SolveUnknown("timeout")
+    report = []
+    found = None
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        _cube_worker_init(problem, options, threading.Event(), deadline, watch=False)
+        try:
+            for i, cube in enumerate(cubes):
+                placements, stats = _solve_cube(i, cube)
+                report.append(stats)
+                if placements is not None:
+                    found = placements
+                    break
+        finally:
+            _cube_worker.clear()  # don't keep the encoding alive in this process
+    else:
+        cancel = multiprocessing.get_context().Event()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_cube_worker_init,
+                                 initargs=(problem, options, cancel, deadline)) as pool:
+            futures = [pool.submit(_solve_cube, i, cube) for i, cube in enumerate(cubes)]
+            for future in as_completed(futures):
+                if future.cancelled():
+                    continue
+                placements, stats = future.result()
+                report.append(stats)
+                if placements is not None and found is None:
+                    found = placements
+                    cancel.set()
+                    for other in futures:
+                        other.cancel()
+
+    done = {stats["cube"] for stats in report}
+    for i, cube in enumerate(cubes):
+        if i not in done:
+            report.append({"cube": i, "placements": [list(p) for p in cube], "status": "cancelled"})
+    if cube_stats is not None:
+        cube_stats.extend(sorted(report, key=lambda stats: stats["cube"]))
+    if found is None and any(stats["status"] == "unknown" for stats in report):
+        memory_out = any("memory" in stats.get("reason", "") for stats in report)
+        raise pips_solver.SolveUnknown("memory" if memory_out else "timeout")
+    return found
+
+
+# Named configurations for solve_portfolio; each is a set of run_solver options
+PORTFOLIO = {
+    "z3": {"backend": "z3"},
+    "z3-compact": {"backend": "z3", "encoding": "compact"},
+    "z3-lex": {"backend": "z3", "encoding": "compact", "symmetry": "lex"},
+    "z3-bool": {"backend": "z3", "encoding": "boolean"},
+    "z3-bool-fd": {"backend": "z3", "encoding": "boolean", "logic": "QF_FD"},
+    "z3-seed1": {"backend": "z3", "encoding": "compact", "params": {"random_seed": 1}},
+    "dlx": {"backend": "dlx"},
+}
+DEFAULT_PORTFOLIO = ("z3-compact", "z3-bool-fd", "dlx")
+
+# Share of the race's time given to each configuration as its own budget
+PORTFOLIO_TIMEOUT_SHARE = 0.8
+
+
+def portfolio_configs(configs):
+    """Resolve portfolio entries to (name, options) pairs
+
+    An entry is a PORTFOLIO name or a (name, options) pair.
+    """
+    resolved = []
+    for config in configs:
+        if isinstance(config, str):
+            if config not in PORTFOLIO:
+                raise ValueError(f"unknown portfolio configuration {config!r}, "
+                                 f"expected one of {tuple(PORTFOLIO)}")
+            resolved.append((config, PORTFOLIO[config]))
+        else:
+            name, options = config
+            resolved.append((name, dict(options)))
+    return resolved
+
+
+def _race(conn, problem, options):
+    start = time.perf_counter()
+    try:
+        placements = pips_solver.run_solver(*problem, **options)
+        conn.send(("unsat" if placements is None else "sat", placements,
+                   time.perf_counter() - start))
+    except pips_solver.SolveUnknown as exc:
+        conn.send(("unknown", (exc.reason, exc.partial), time.perf_counter() - start))
+    except Exception as exc:
+        conn.send(("error", f"{type(exc).__name__}: {exc}", time.perf_counter() - start))
+    finally:
+        conn.close()
+
+
+def solve_portfolio(cells, dominos, edges, regions, configs=DEFAULT_PORTFOLIO, timeout=None,
+                    portfolio_stats=None, **options):
+    """Race configurations in separate processes and return the first answer
+
+    options are shared by every configuration; a configuration's own
+    options take precedence. Configurations that fail or run out of budget
+    are ignored while others are still running. With a timeout, every
+    configuration gets most of it as its own budget so that it can report
+    a partial placement. Raises pips_solver.SolveUnknown with the largest
+    partial any configuration reported if none answered, TimeoutError if
+    nothing at all came back within timeout seconds and RuntimeError if
+    every configuration failed. If portfolio_stats is a list it receives
+    the race record: the winner and the status and time of every
+    configuration.
+    """
+    problem = (cells, dominos, edges, regions)
+    entries = portfolio_configs(configs)
+    if not entries:
+        raise ValueError("empty portfolio")
+    start = time.perf_counter()
+    ctx = multiprocessing.get_context()
+    if timeout is not None and ctx.get_start_method() == "fork":
+        # Forked configurations inherit the backends instead of importing them on the clock
+        import pips_dlx
+        import pips_z3
+    running = {}  # reader -> (name, process)
+    report = {}
+    for name, config in entries:
+        reader, writer = ctx.Pipe(duplex=False)
+        run_options = dict(options, **config)
+        run_options.setdefault("workers", 1)
+        if timeout is not None:
+            # Leave the race time to collect the answer before it gives up
+            remaining = timeout - (time.perf_counter() - start)
+            run_options.setdefault("timeout", max(0.0, remaining * PORTFOLIO_TIMEOUT_SHARE))
+        process = ctx.Process(target=_race, args=(writer, problem, run_options), daemon=True)
+        process.start()
+        writer.close()
+        running[reader] = (name, process)
+        report[name] = {"status": "cancelled"}
+
+    winner = None
+    placements = None
+    unknown = None  # (reason, partial) with the largest partial so far
+    try:
+        while running and winner is None:
+            remaining = None if timeout is None else timeout - (time.perf_counter() - start)
+            if remaining is not None and remaining <= 0:
+                break
+            ready = connection.wait(list(running), timeout=remaining)
+            for reader in ready:
+                name, process = running.pop(reader)
+                try:
+                    status, value, elapsed = reader.recv()
+                except EOFError:
+                    status, value, elapsed = "error", "process died", time.perf_counter() - start
+                reader.close()
+                report[name] = {"status": status, "time": round(elapsed, 6)}
+                if status == "error":
+                    report[name]["error"] = value
+                elif status == "unknown":
+                    reason, partial = value
+                    report[name]["reason"] = reason
+                    if unknown is None or len(partial or []) > len(unknown[1] or []):
+                        unknown = (reason, partial)
+                elif winner is None:
+                    winner, placements = name, value
+    finally:
+        for reader, (name, process) in running.items():
+            process.terminate()
+            reader.close()
+        for name, process in running.values():
+            process.join()
+
+    stats = {"winner": winner, "time": round(time.perf_counter() - start, 6), "configs": report}
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps(stats, separators=(",", ":")))
+    if portfolio_stats is not None:
+        portfolio_stats.append(stats)
+    if winner is None:
+        errors = {name: r["error"] for name, r in report.items() if r["status"] == "error"}
+        if len(errors) == len(report):
+            raise RuntimeError(f"every portfolio configuration failed: {errors}")
+        if unknown is not None:
+            raise pips_solver.SolveUnknown(*unknown)
+        raise TimeoutError(f"no portfolio configuration answered within {timeout}s")
+    return placements
+
+
+def rank_portfolio(records):
+    """Rank configurations by wins over race records (or solve() results)
+
+    Returns [(name, wins, median winning time)], best first; configurations
+    that never won come last with a median of None.
+    """
+    wins = {}
+    for record in records:
+        races = record.get("portfolio", [record]) if isinstance(record, dict) else []
+        for race in races:
+            for name in race.get("configs", {}):
+                wins.setdefault(name, [])
+            if race.get("winner") is not None:
+                wins.setdefault(race["winner"], []).append(race["time"])
+    ranking = []
+    for name, times in wins.items():
+        times = sorted(times)
+        median = times[len(times) // 2] if times else None
+        ranking.append((name, len(times), median))
+    ranking.sort(key=lambda item: (-item[1], item[2] if item[2] is not None else float("inf")))
+    return ranking
@@ -0,0 +1,285 @@
+"""Presolve propagation for Pips puzzles
+
+Before a backend sees a puzzle, cheap propagation is run to a fixpoint:
+
+- cell domains are narrowed by the regions (bounds reasoning for the sum
+  rules, intersection for all_eq, singleton elimination for all_diff) and by
+  the pip values still left in the domino pool;
+- edges whose two cells cannot take any remaining domino are dropped;
+- a cell with a single live edge forces that edge, which kills the other
+  edges of both of its cells, and if only one tile fits the forced edge the
+  domino is placed outright.
+
+What is left is handed back as a smaller residual problem (renumbered cells,
+edges, dominos and regions). Narrowed cell domains are carried over as
+("domain") regions whose target is the list of allowed values.
+"""
+import time
+
+
+class PresolveResult:
+    """Outcome of presolve: fixed placements, residual problem and statistics"""
+
+    def __init__(self, status, fixed, residual, cell_map, domino_map, edge_map, stats):
+        self.status = status  # "solved", "reduced" or "unsat"
+        self.fixed = fixed  # (d, e, o) placements fixed by propagation
+        self.residual = residual  # (cells, dominos, edges, regions)
+        self.cell_map = cell_map  # residual cell -> original cell
+        self.domino_map = domino_map  # residual domino -> original domino
+        self.edge_map = edge_map  # residual edge -> original edge
+        self.stats = stats
+
+    def expand(self, placements):
+        """Map residual (d, e, o) placements back onto the original puzzle"""
+        if placements is None:
+            return None
+        merged = list(self.fixed)
+        for d, e, o in placements:
+            merged.append((self.domino_map[d], self.edge_map[e], o))
+        return sorted(merged)
+
+
+def _tile_key(domino):
+    a, b = domino
+    return (min(a, b), max(a, b))
+
+
+class _Propagator:
+    def __init__(self, cells, dominos, edges, regions):
+        self.cells = cells
+        self.dominos = dominos
+        self.edges = edges
+        self.regions = regions
+
+        self.remaining = set(range(len(dominos)))
+        self.live = set(range(len(edges)))
+        self.forced = set()
+        self.covered = {}  # cell -> value, for cells under a fixed placement
+        self.fixed = []
+        self.cell_edges = {c: [] for c in cells}
+        for e, (c1, c2) in enumerate(edges):
+            self.cell_edges[c1].append(e)
+            self.cell_edges[c2].append(e)
+        self.dom = {c: set(range(7)) for c in cells}
+        for cells_R, op, target in regions:
+            if op == "domain":
+                for c in cells_R:
+                    self.dom[c] &= set(target)
+        self.rounds = 0
+
+    def pool_values(self):
+        values = set()
+        for d in self.remaining:
+            values.update(self.dominos[d])
+        return values
+
+    def narrow(self, c, allowed):
+        """Intersect a cell domain; returns True if it changed"""
+        new = self.dom[c] & allowed
+        if new != self.dom[c]:
+            self.dom[c] = new
+            if not new:
+                raise _Unsat(f"cell {c} has no possible value")
+            return True
+        return False
+
+    def propagate_regions(self):
+        changed = False
+        for cells_R, op, target in self.regions:
+            if op in ("sum_eq", "sum_lt", "sum_gt"):
+                lows = {c: min(self.dom[c]) for c in cells_R}
+                highs = {c: max(self.dom[c]) for c in cells_R}
+                low_total, high_total = sum(lows.values()), sum(highs.values())
+                for c in cells_R:
+                    others_low = low_total - lows[c]
+                    others_high = high_total - highs[c]
+                    if op == "sum_eq":
+                        bounds = range(target - others_high, target - others_low + 1)
+                    elif op == "sum_lt":
+                        bounds = range(0, target - others_low)
+                    else:
+                        bounds = range(target - others_high + 1, 7)
+                    changed |= self.narrow(c, set(bounds))
+            elif op == "all_eq":
+                common = set(range(7))
+                for c in cells_R:
+                    common &= self.dom[c]
+                for c in cells_R:
+                    changed |= self.narrow(c, common)
+            elif op == "all_diff":
+                for c in cells_R:
+                    if len(self.dom[c]) == 1:
+                        for other in cells_R:
+                            if other != c:
+                                changed |= self.narrow(other, set(range(7)) - self.dom[c])
+        return changed
+
+    def fits(self, e):
+        """Distinct (d, o) choices of remaining tiles that fit edge e"""
+        c1, c2 = self.edges[e]
+        seen = set()
+        choices = []
+        for d in sorted(self.remaining):
+            key = _tile_key(self.dominos[d])
+            if key in seen:
+                continue
+            seen.add(key)
+            a, b = self.dominos[d]
+            for o in [0, 1]:
+                if o == 1 and a == b:
+                    continue
+                v1, v2 = (a, b) if o == 0 else (b, a)
+                if v1 in self.dom[c1] and v2 in self.dom[c2]:
+                    choices.append((d, o))
+        return choices
+
+    def kill_edge(self, e):
+        self.live.discard(e)
+        self.forced.discard(e)
+
+    def place(self, d, e, o):
+        a, b = self.dominos[d]
+        v1, v2 = (a, b) if o == 0 else (b, a)
+        c1, c2 = self.edges[e]
+        self.fixed.append((d, e, o))
+        self.remaining.discard(d)
+        self.covered[c1] = v1
+        self.covered[c2] = v2
+        self.dom[c1] = {v1}
+        self.dom[c2] = {v2}
+        for c in (c1, c2):
+            for other in self.cell_edges[c]:
+                self.kill_edge(other)
+
+    def propagate_edges(self):
+        changed = False
+        pool = self.pool_values()
+        for c in self.cells:
+            if c not in self.covered:
+                changed |= self.narrow(c, pool)
+
+        for e in sorted(self.live):
+            choices = self.fits(e)
+            if not choices:
+                self.kill_edge(e)
+                changed = True
+            elif e in self.forced:
+                c1, c2 = self.edges[e]
+                changed |= self.narrow(c1, {self.dominos[d][o] for d, o in choices})
+                changed |= self.narrow(c2, {self.dominos[d][1 - o] for d, o in choices})
+
+        for c in self.cells:
+            if c in self.covered:
+                continue
+            live_edges = [e for e in self.cell_edges[c] if e in self.live]
+            if not live_edges:
+                raise _Unsat(f"cell {c} cannot be covered by any domino")
+            if len(live_edges) == 1:
+                e = live_edges[0]
+                if e not in self.forced:
+                    self.forced.add(e)
+                    changed = True
+                    c1, c2 = self.edges[e]
+                    for cell in (c1, c2):
+                        for other in self.cell_edges[cell]:
+                            if other != e and other in self.live:
+                                self.kill_edge(other)
+
+        for e in sorted(self.forced):
+            choices = self.fits(e)
+            if len(choices) == 1:
+                d, o = choices[0]
+                self.place(d, e, o)
+                changed = True
+        return changed
+
+    def run(self):
+        changed = True
+        while changed:
+            self.rounds += 1
+            changed = self.propagate_regions()
+            changed |= self.propagate_edges()
+
+    def residual_regions(self, new_cell):
+        """Rewrite the regions over the uncovered cells"""
+        regions = []
+        for cells_R, op, target in self.regions:
+            open_cells = [c for c in cells_R if c not in self.covered]
+            fixed_sum = sum(self.covered[c] for c in cells_R if c in self.covered)
+            if op in ("sum_eq", "sum_lt", "sum_gt"):
+                if not open_cells:
+                    ok = {"sum_eq": fixed_sum == target,
+                          "sum_lt": fixed_sum < target,
+                          "sum_gt": fixed_sum > target}[op]
+                    if not ok:
+                        raise _Unsat(f"region {cells_R} {op} {target} is violated")
+                    continue
+                regions.append(([new_cell[c] for c in open_cells], op, target - fixed_sum))
+            elif op in ("all_eq", "all_diff"):
+                values = [self.covered[c] for c in cells_R if c in self.covered]
+                if op == "all_eq" and len(set(values)) > 1:
+                    raise _Unsat(f"region {cells_R} all_eq is violated")
+                if op == "all_diff" and len(set(values)) < len(values):
+                    raise _Unsat(f"region {cells_R} all_diff is violated")
+                # Fixed members are already folded into the open cells' domains
+                if len(open_cells) > 1:
+                    regions.append(([new_cell[c] for c in open_cells], op, target))
+
+        pool = self.pool_values()
+        for c in sorted(new_cell):
+            if not pool <= self.dom[c]:
+                regions.append(([new_cell[c]], "domain", sorted(self.dom[c])))
+        return regions
+
+
+class _Unsat(Exception):
+    pass
+
+
+def presolve(cells, dominos, edges, regions):
+    """Propagate domains and forced edges; returns a PresolveResult"""
+    start = time.perf_counter()
+    prop = _Propagator(cells, dominos, edges, regions)
+    stats = {
+        "cells": len(cells),
+        "edges": len(edges),
+        "dominos": len(dominos),
+        "regions": len(regions),
+    }
+    try:
+        prop.run()
+        open_cells = [c for c in cells if c not in prop.covered]
+        new_cell = {c: i for i, c in enumerate(open_cells)}
+        res_regions = prop.residual_regions(new_cell)
+        if not open_cells and prop.remaining:
+            raise _Unsat(f"{len(prop.remaining)} domino(s) left over with every cell covered")
+        if open_cells and not prop.remaining:
+            raise _Unsat(f"{len(open_cells)} cell(s) left open with every domino placed")
+    except _Unsat as exc:
+        stats.update(rounds=prop.rounds, reason=str(exc),
+                     time=round(time.perf_counter() - start, 6))
+        return PresolveResult("unsat", [], None, {}, {}, {}, stats)
+
+    edge_map = sorted(e for e in prop.live if all(c in new_cell for c in edges[e]))
+    domino_map = sorted(prop.remaining)
+    residual = (
+        list(range(len(open_cells))),
+        [dominos[d] for d in domino_map],
+        [(new_cell[edges[e][0]], new_cell[edges[e][1]]) for e in edge_map],
+        res_regions,
+    )
+
+    stats.update(
+        rounds=prop.rounds,
+        fixed_placements=len(prop.fixed),
+        forced_edges=len(prop.forced),
+        cells_eliminated=len(cells) - len(open_cells),
+        edges_eliminated=len(edges) - len(edge_map),
+        dominos_eliminated=len(dominos) - len(domino_map),
+        regions_eliminated=len(regions) - sum(1 for r in res_regions if r[1] != "domain"),
+        time=round(time.perf_counter() - start, 6),
+    )
+    status = "solved" if not open_cells else "reduced"
+    return PresolveResult(status, sorted(prop.fixed), residual,
+                          dict(enumerate(open_cells)), dict(enumerate(domino_map)),
+                          dict(enumerate(edge_map)), stats)
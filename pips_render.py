@@ -0,0 +1,244 @@
+"""Headless rendering of solved puzzles to PNG/SVG files
+
+draw_solution() draws a solution onto any matplotlib Axes with one
+collection for the grid lines, one for the cells and one for the tiles, plus
+a label per tile. The editor uses it for its interactive window. Renderer
+keeps a single Agg figure (no pyplot, no display) and swaps the artists for
+each puzzle, so rendering many images does not rebuild a figure each time.
+render_batch() spreads puzzles over a process pool with one Renderer per
+worker.
+
+Usage:
+    python3 pips_render.py puzzles.jsonl -o renders/
+    python3 pips_render.py puzzles.jsonl --solutions solutions.jsonl --format svg --workers 4
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pips
+import pips_solver
+
+TITLE = "Domino Puzzle Solution"
+CELL_FACE = (0.95, 0.95, 0.95)
+CELL_EDGE = (0.5, 0.5, 0.5)
+GRID_COLOR = (0.8, 0.8, 0.8)
+
+
+def solution_tiles(placements, dominos, edges, node_pos):
+    """Return ((min_row, min_col, rows, cols), [(x, y, w, h, label), ...])
+
+    Coordinates are relative to the bounding box of the active cells, with x
+    the column and y the row.
+    """
+    positions = list(node_pos.values())
+    min_row = min(r for r, c in positions)
+    min_col = min(c for r, c in positions)
+    rows = max(r for r, c in positions) - min_row + 1
+    cols = max(c for r, c in positions) - min_col + 1
+    tiles = []
+    for d, e, o in placements:
+        a, b = dominos[d]
+        if o == 1:
+            a, b = b, a
+        (r1, c1), (r2, c2) = node_pos[edges[e][0]], node_pos[edges[e][1]]
+        x, y = min(c1, c2) - min_col, min(r1, r2) - min_row
+        tiles.append((x, y, abs(c2 - c1) + 1, abs(r2 - r1) + 1, f"{a}-{b}"))
+    return (min_row, min_col, rows, cols), tiles
+
+
+def _box(x, y, w, h):
+    return [(x, y), (x + w, y), (x + w, y + h), (x, y + h)]
+
+
+def draw_solution(ax, node_pos, placements, dominos, edges):
+    """Draw a solution on ax and return the artists that were added"""
+    import matplotlib
+    from matplotlib.collections import LineCollection, PolyCollection
+
+    (min_row, min_col, rows, cols), tiles = solution_tiles(placements, dominos, edges, node_pos)
+    ax.set_xlim(0, cols)
+    ax.set_ylim(rows, 0)
+    ax.set_aspect("equal")
+
+    # Faded grid lines over the bounding box
+    segments = [[(x, 0), (x, rows)] for x in range(cols + 1)]
+    segments += [[(0, y), (cols, y)] for y in range(rows + 1)]
+    grid = LineCollection(segments, colors=[GRID_COLOR], linewidths=0.5, linestyles=":")
+
+    cells = PolyCollection([_box(c - min_col, r - min_row, 1, 1) for r, c in node_pos.values()],
+                           facecolors=[CELL_FACE], edgecolors=[CELL_EDGE], linewidths=1,
+                           alpha=0.5)
+
+    cmap = matplotlib.colormaps["tab20"]
+    boxes = PolyCollection([_box(x, y, w, h) for x, y, w, h, _ in tiles],
+                           facecolors=[cmap(i % 20) for i in range(len(tiles))],
+                           edgecolors="black", linewidths=3, alpha=0.8)
+
+    artists = [ax.add_collection(grid), ax.add_collection(cells), ax.add_collection(boxes)]
+    fontsize = max(4, min(14, 112 / max(rows, cols)))
+    for x, y, w, h, label in tiles:
+        artists.append(ax.text(x + w / 2, y + h / 2, label, ha="center", va="center",
+                               fontsize=fontsize, weight="bold"))
+    return artists
+
+
+class Renderer:
+    """One reusable Agg figure that renders solutions to files"""
+
+    def __init__(self, size=(10, 10), dpi=100):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        self.figure = Figure(figsize=size, dpi=dpi)
+        FigureCanvasAgg(self.figure)
+        # Fixed layout instead of tight_layout(), which would re-measure every image
+        self.ax = self.figure.add_axes((0.02, 0.02, 0.96, 0.92))
+        self.ax.set_xticks([])
+        self.ax.set_yticks([])
+        self.title = self.ax.set_title(TITLE, fontsize=16)
+        self.artists = []
+
+    def render(self, path, node_pos, placements, dominos, edges, title=TITLE, fmt=None):
+        """Write one solution image; the format comes from fmt or the file name"""
+        for artist in self.artists:
+            artist.remove()
+        self.artists = draw_solution(self.ax, node_pos, placements, dominos, edges)
+        self.title.set_text(title)
+        self.figure.savefig(path, format=fmt)
+
+
+_renderer = None
+
+
+def _init_worker(size, dpi):
+    global _renderer
+    _renderer = Renderer(size=size, dpi=dpi)
+
+
+def image_name(index, data, fmt):
+    """File name for a puzzle image: its id (made file-safe) or its position"""
+    name = data.get("id") if isinstance(data, dict) else None
+    name = re.sub(r"[^A-Za-z0-9._-]", "_", str(name)) if name is not None else f"puzzle-{index}"
+    return f"{name}.{fmt}"
+
+
+def _render_job(job):
+    index, data, solution, out_dir, fmt, options = job
+    start = time.perf_counter()
+    entry = {"index": index, "id": data.get("id") if isinstance(data, dict) else None}
+    try:
+        puzzle = pips_solver.normalize_puzzle(data)
+        edges = puzzle["edges"]
+        if solution is None:
+            placements = pips_solver.run_solver(puzzle["cells"], puzzle["dominos"], edges,
+                                                puzzle["regions"], **options)
+        else:
+            placements = solution.get("placements")
+            edges = [tuple(e) for e in solution.get("edges") or edges]
+        if placements is None:
+            entry["status"] = "unsat"
+        else:
+            path = os.path.join(out_dir, image_name(index, data, fmt))
+            node_pos = pips_solver.node_positions(puzzle["map"])
+            _renderer.render(path, node_pos, placements, puzzle["dominos"], edges, fmt=fmt)
+            entry["status"] = "rendered"
+            entry["path"] = path
+    except Exception as exc:  # keep the batch going
+        entry["status"] = "error"
+        entry["error"] = f"{type(exc).__name__}: {exc}"
+    entry["time"] = round(time.perf_counter() - start, 6)
+    return entry
+
+
+def render_batch(puzzles, out_dir, solutions=None, fmt="png", workers=1, size=(10, 10),
+                 dpi=100, chunksize=16, **options):
+    """Render one image per puzzle into out_dir and return a status per puzzle
+
+    solutions holds earlier solve() results, either as a list in puzzle
+    order (see match_solutions) or as a dict by puzzle id; puzzles without
+    one are solved first with run_solver(**options). With workers > 1 the
+    puzzles are spread over a process pool, each worker with its own
+    Renderer.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    if solutions is None:
+        solutions = [None] * len(puzzles)
+    elif isinstance(solutions, dict):
+        solutions = [solutions.get(data.get("id")) if isinstance(data, dict) else None
+                     for data in puzzles]
+    jobs = ((i, data, solution, out_dir, fmt, options)
+            for i, (data, solution) in enumerate(zip(puzzles, solutions)))
+    if workers == 1:
+        _init_worker(size, dpi)
+        return [_render_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(size, dpi)) as pool:
+        return list(pool.map(_render_job, jobs, chunksize=chunksize))
+
+
+def match_solutions(puzzles, solutions):
+    """Line up solve() results with puzzles, one per puzzle
+
+    Results are matched by id when every puzzle and every result has an id
+    of its own (puzzles without a result get None and are solved);
+    otherwise, with missing or repeated ids, they are matched by position
+    as in pips_verify, which raises ValueError if the counts differ.
+    """
+    ids = [data.get("id") if isinstance(data, dict) else None for data in puzzles]
+    by_id = {s.get("id"): s for s in solutions if s.get("id") is not None}
+    if None not in ids and len(set(ids)) == len(ids) and len(by_id) == len(solutions):
+        return [by_id.get(puzzle_id) for puzzle_id in ids]
+    if len(solutions) != len(puzzles):
+        raise ValueError(f"{len(solutions)} solutions for {len(puzzles)} puzzles and their ids "
+                         f"do not match one to one")
+    return list(solutions)
+
+
+def read_jsonl(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="pips_render", description="Render solved Pips puzzles to images")
+    parser.add_argument("puzzles", help="puzzle JSONL file (or a single JSON puzzle)")
+    parser.add_argument("-o", "--output-dir", default="renders", help="directory for the images")
+    parser.add_argument("--solutions", help="solve results (JSONL) to draw instead of solving")
+    parser.add_argument("--format", default="png", choices=("png", "svg"))
+    parser.add_argument("--workers", type=int, default=1, help="render processes (0: CPU count)")
+    parser.add_argument("--dpi", type=int, default=100)
+    parser.add_argument("--size", type=float, default=10.0, help="figure size in inches")
+    parser.add_argument("--backend", default="z3", choices=pips_solver.BACKENDS,
+                        help="backend for puzzles without a solution")
+    args = parser.parse_args(argv)
+
+    with open(args.puzzles) as f:
+        puzzles = list(pips.read_puzzles(f))
+    solutions = None
+    if args.solutions:
+        try:
+            solutions = match_solutions(puzzles, read_jsonl(args.solutions))
+        except ValueError as exc:
+            parser.error(str(exc))
+
+    start = time.perf_counter()
+    results = render_batch(puzzles, args.output_dir, solutions=solutions, fmt=args.format,
+                           workers=args.workers or os.cpu_count() or 1,
+                           size=(args.size, args.size), dpi=args.dpi, backend=args.backend)
+    elapsed = time.perf_counter() - start
+    rendered = sum(entry["status"] == "rendered" for entry in results)
+    for entry in results:
+        if entry["status"] == "error":
+            sys.stderr.write(f"error: {entry['id']}: {entry['error']}\n")
+    sys.stderr.write(f"rendered {rendered}/{len(results)} images in {elapsed:.2f}s "
+                     f"({rendered / elapsed if elapsed else 0:.1f}/s) to {args.output_dir}\n")
+    return 1 if any(entry["status"] == "error" for entry in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,419 @@
+"""Local solver service with a warm worker pool
+
+Other tools on the same machine can solve puzzles over HTTP without paying
+the Python and Z3 start-up cost for every puzzle:
+
+    python3 pips_service.py --port 8765 --workers 4
+    python3 pips_service.py --unix /tmp/pips.sock
+
+    POST /solve   body: a puzzle dict, or {"puzzle": {...}, "timeout": 5,
+                  "options": {"backend": "dlx", ...}}; answers with the
+                  pips_solver.solve() result
+    GET  /stats   throughput, latency percentiles, queue and worker state
+    GET  /health
+
+The service only binds to localhost or a Unix socket and needs no network
+access. Each worker process imports the solver once and then takes puzzles
+one at a time. Requests wait in one queue. The solver gets most of a
+request's remaining time as its own budget, so it normally stops in time
+with an "unknown" answer and its best partial placement. A request that
+still runs past its timeout gets a "timeout" answer and its worker is
+replaced, so a runaway search never holds a worker. Identical puzzles submitted while one is
+queued or running share that solve instead of starting another.
+
+Workers are ordinary (non-daemonic) processes so that portfolio, cube and
+decompose options can start processes of their own. Each worker leads its
+own process group, and replacing or shutting down a worker kills the whole
+group, so no solver processes outlive the service.
+"""
+import argparse
+import atexit
+import collections
+import hashlib
+import http.client
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("pips.service")
+
+# Share of a request's remaining time given to the solver itself as its budget
+SOFT_TIMEOUT_SHARE = 0.8
+
+# Tiny puzzle solved by every new worker so the first real request is warm
+_WARMUP = {"map": [[0, 1]], "dominos": [[1, 2]], "regions": []}
+
+
+def _worker_main(conn):
+    if hasattr(os, "setsid"):
+        os.setsid()  # lead a process group so _kill_worker reaches our children too
+    import pips_solver
+    for backend in pips_solver.BACKENDS:
+        pips_solver.solve(_WARMUP, backend=backend)
+    conn.send(("ready", os.getpid()))
+    while True:
+        try:
+            item = conn.recv()
+        except EOFError:
+            return
+        if item is None:
+            return
+        data, options = item
+        try:
+            conn.send(("done", pips_solver.solve(data, **options)))
+        except Exception as exc:
+            conn.send(("error", f"{type(exc).__name__}: {exc}"))
+
+
+def _kill_worker(process):
+    """Kill a worker process together with any solver processes it started"""
+    if hasattr(os, "killpg"):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+    else:
+        process.kill()
+
+
+def puzzle_key(data, options):
+    """Key under which identical submissions are coalesced (the id is ignored)"""
+    text = json.dumps([data.get("map"), data.get("dominos"), data.get("regions"), options],
+                      sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class _Job:
+    def __init__(self, key, data, options, timeout):
+        self.key = key
+        self.data = data
+        self.options = options
+        self.submitted = time.perf_counter()
+        self.deadline = None if timeout is None else self.submitted + timeout
+        self.done = threading.Event()
+        self.kind = None
+        self.payload = None
+
+
+class SolverService:
+    """Queue of puzzles served by a pool of persistent worker processes"""
+
+    def __init__(self, workers=None, timeout=30.0, latency_window=4096):
+        self.size = workers or os.cpu_count() or 1
+        self.timeout = timeout  # default per-request timeout in seconds
+        self.ctx = multiprocessing.get_context("spawn")
+        self.jobs = queue.Queue()
+        self.lock = threading.Lock()
+        self.in_flight = {}  # puzzle key -> _Job
+        self.busy = 0
+        self.started = time.perf_counter()
+        self.counters = collections.Counter()
+        self.latencies = collections.deque(maxlen=latency_window)  # (finished, seconds)
+        self.threads = []
+        self.processes = {}  # slot -> current worker process
+        self.closed = False
+        for slot in range(self.size):
+            process, conn = self._start_worker()
+            self.processes[slot] = process
+            thread = threading.Thread(target=self._serve_slot, args=(slot, process, conn),
+                                      daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        # Non-daemonic workers would otherwise keep the interpreter from exiting
+        atexit.register(self.shutdown)
+
+    def _start_worker(self):
+        parent, child = self.ctx.Pipe()
+        process = self.ctx.Process(target=_worker_main, args=(child,))
+        process.start()
+        child.close()
+        parent.recv()  # ("ready", pid) once the solver modules are loaded
+        return process, parent
+
+    def _stop_worker(self, process, conn, kill=False):
+        if kill:
+            _kill_worker(process)
+        else:
+            try:
+                conn.send(None)
+            except OSError:
+                _kill_worker(process)
+        conn.close()
+        process.join(timeout=5)
+        if process.is_alive():
+            _kill_worker(process)
+            process.join()
+
+    def _serve_slot(self, slot, process, conn):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                self._stop_worker(process, conn)
+                return
+            now = time.perf_counter()
+            if job.deadline is not None and now >= job.deadline:
+                self._finish(job, "timeout", None)
+                continue
+            with self.lock:
+                self.busy += 1
+            try:
+                remaining = None if job.deadline is None else job.deadline - now
+                options = job.options
+                if remaining is not None and "timeout" not in options:
+                    # Let the solver stop on its own first and report its partial answer;
+                    # the worker is only killed if it overruns the full deadline
+                    options = dict(options, timeout=remaining * SOFT_TIMEOUT_SHARE)
+                conn.send((job.data, options))
+                if conn.poll(remaining):
+                    try:
+                        kind, payload = conn.recv()
+                    except EOFError:
+                        kind, payload = "error", "worker process died"
+                else:
+                    kind, payload = "timeout", None
+            except OSError:
+                kind, payload = "error", "worker process died"
+            finally:
+                with self.lock:
+                    self.busy -= 1
+            self._finish(job, kind, payload)
+            if kind != "done" and not (kind == "error" and process.is_alive()):
+                # Timed out or crashed: replace the worker with a fresh one
+                self._stop_worker(process, conn, kill=True)
+                with self.lock:
+                    self.counters["restarts"] += 1
+                logger.info("restarting worker %d after %s", slot, kind)
+                process, conn = self._start_worker()
+                self.processes[slot] = process
+
+    def _finish(self, job, kind, payload):
+        with self.lock:
+            if self.in_flight.get(job.key) is job:
+                del self.in_flight[job.key]
+            job.kind, job.payload = kind, payload
+        job.done.set()
+
+    def submit(self, data, timeout=None, **options):
+        """Solve a puzzle dict in the pool and return a solve() result dict
+
+        timeout (seconds, default the service's) covers queueing and
+        solving. A submission identical to a queued or running one waits
+        for that solve; the shared solve keeps the first submitter's
+        timeout. The result gains "coalesced" and "latency" fields.
+        """
+        start = time.perf_counter()
+        if timeout is None:
+            timeout = self.timeout
+        key = puzzle_key(data, options)
+        with self.lock:
+            self.counters["requests"] += 1
+            job = self.in_flight.get(key)
+            coalesced = job is not None
+            if coalesced:
+                self.counters["coalesced"] += 1
+            else:
+                job = _Job(key, data, options, timeout)
+                self.in_flight[key] = job
+        if not coalesced:
+            self.jobs.put(job)
+
+        if job.done.wait(timeout):
+            kind, payload = job.kind, job.payload
+        else:
+            kind, payload = "timeout", None
+        if kind == "done":
+            result = dict(payload, id=data.get("id"))
+        elif kind == "timeout":
+            result = {"id": data.get("id"), "status": "timeout", "timeout": timeout}
+        else:
+            result = {"id": data.get("id"), "status": "error", "error": payload}
+        latency = time.perf_counter() - start
+        result["coalesced"] = coalesced
+        result["latency"] = round(latency, 6)
+        with self.lock:
+            self.counters[result["status"]] += 1
+            self.latencies.append((time.perf_counter(), latency))
+        return result
+
+    def stats(self):
+        """Throughput, latency percentiles and pool state"""
+        now = time.perf_counter()
+        with self.lock:
+            latencies = sorted(seconds for _, seconds in self.latencies)
+            recent = sum(1 for finished, _ in self.latencies if now - finished <= 60.0)
+            counters = dict(self.counters)
+            busy = self.busy
+            in_flight = len(self.in_flight)
+        uptime = now - self.started
+        answered = sum(counters.get(status, 0)
+                       for status in ("sat", "unsat", "unknown", "timeout", "error"))
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 6)
+
+        return {
+            "uptime": round(uptime, 3),
+            "workers": self.size,
+            "busy": busy,
+            "queued": self.jobs.qsize(),
+            "in_flight": in_flight,
+            "counters": counters,
+            "throughput": {"overall": round(answered / uptime, 3) if uptime else 0.0,
+                           "last_minute": round(recent / min(max(uptime, 1e-9), 60.0), 3)},
+            "latency": {"count": len(latencies),
+                        "mean": round(sum(latencies) / len(latencies), 6) if latencies else None,
+                        "p50": percentile(0.5), "p90": percentile(0.9),
+                        "p99": percentile(0.99),
+                        "max": round(latencies[-1], 6) if latencies else None},
+        }
+
+    def shutdown(self):
+        """Stop every worker, killing those still busy after a grace period"""
+        if self.closed:
+            return
+        self.closed = True
+        for _ in self.threads:
+            self.jobs.put(None)
+        for thread in self.threads:
+            thread.join(timeout=10)
+        for process in self.processes.values():
+            if process.is_alive():
+                _kill_worker(process)
+                process.join()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "pips-service"
+
+    def _reply(self, code, body):
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._reply(200, self.server.service.stats())
+        elif self.path == "/health":
+            self._reply(200, {"status": "ok"})
+        else:
+            self._reply(404, {"error": f"no such endpoint {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/solve":
+            self._reply(404, {"error": f"no such endpoint {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length))
+            if not isinstance(body, dict):
+                raise ValueError("expected a JSON object")
+            if "puzzle" in body:
+                data, timeout = body["puzzle"], body.get("timeout")
+                options = body.get("options") or {}
+            else:
+                data, timeout, options = body, None, {}
+            if not isinstance(data, dict) or not isinstance(options, dict):
+                raise ValueError("puzzle and options must be JSON objects")
+        except ValueError as exc:
+            self._reply(400, {"status": "error", "error": str(exc)})
+            return
+        result = self.server.service.submit(data, timeout=timeout, **options)
+        code = {"timeout": 504, "error": 500}.get(result["status"], 200)
+        self._reply(code, result)
+
+    def log_message(self, format, *args):
+        logger.debug("%s %s", self.requestline, format % args)
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ("unix", 0)
+
+
+def make_server(service, host="127.0.0.1", port=8765, unix=None):
+    """HTTP server for a SolverService on a TCP port or a Unix socket path"""
+    if unix:
+        if os.path.exists(unix):
+            os.unlink(unix)
+        server = _UnixHTTPServer(unix, _Handler)
+    else:
+        server = ThreadingHTTPServer((host, port), _Handler)
+        server.daemon_threads = True
+    server.service = service
+    return server
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+def request(method, path, body=None, host="127.0.0.1", port=8765, unix=None, timeout=None):
+    """Small client: send one request to a running service and decode the reply"""
+    if unix:
+        conn = _UnixHTTPConnection(unix, timeout=timeout)
+    else:
+        conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        payload = None if body is None else json.dumps(body)
+        headers = {} if body is None else {"Content-Type": "application/json"}
+        conn.request(method, path, body=payload, headers=headers)
+        return json.loads(conn.getresponse().read())
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="pips_service", description="Local Pips solver service")
+    parser.add_argument("--host", default="127.0.0.1", help="address to bind (default: localhost)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, help="solver processes (default: CPU count)")
+    parser.add_argument("--timeout", type=float, default=30.0,
+                        help="default per-request timeout in seconds")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    service = SolverService(workers=args.workers, timeout=args.timeout)
+    server = make_server(service, host=args.host, port=args.port, unix=args.unix)
+    logger.info("serving on %s with %d workers", args.unix or f"http://{args.host}:{args.port}",
+                service.size)
+    signal.signal(signal.SIGTERM,
+                  lambda signum, frame: threading.Thread(target=server.shutdown).start())
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+        if args.unix and os.path.exists(args.unix):
+            os.unlink(args.unix)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""Incremental solving session for a board that is being edited
+
+The placement and coverage constraints depend only on the cells, edges and
+dominos, so they are built once. Every region is added behind its own
+selector literal and switched on through check() assumptions; retracting a
+region just stops assuming it. Re-solving after adding or removing a region
+reuses everything the solver has learned so far.
+"""
+import time
+
+from z3 import *
+
+import pips_z3
+
+NO_TIMEOUT = 4294967295  # Z3's default: no limit
+
+
+class SolvingSession:
+    """Persistent Z3 solver for one board and domino set"""
+
+    def __init__(self, cells, dominos, edges, encoding="compact"):
+        self.cells = cells
+        self.dominos = dominos
+        self.edges = edges
+        self.encoding = pips_z3.encode(cells, dominos, edges, [], encoding=encoding)
+        self.selectors = {}  # region key -> selector Bool
+        self.active = []  # region keys, in the order they were added
+        self.last_time = None
+        self.model = None
+
+    @staticmethod
+    def region_key(region):
+        cells_R, op, target = region
+        return (tuple(cells_R), op, tuple(target) if isinstance(target, list) else target)
+
+    def add_region(self, region):
+        """Switch a region on; returns its key"""
+        key = self.region_key(region)
+        if key not in self.selectors and self.encoding is not None:
+            selector = Bool(f"region_{len(self.selectors)}")
+            self.encoding.solver.add(Implies(selector, self.encoding.region(region)))
+            self.selectors[key] = selector
+        if key not in self.active:
+            self.active.append(key)
+        return key
+
+    def remove_region(self, region):
+        """Switch a region off (its clauses stay, guarded by an unused selector)"""
+        key = self.region_key(region)
+        if key in self.active:
+            self.active.remove(key)
+
+    def sync(self, regions):
+        """Make the active regions match the given list"""
+        wanted = [self.region_key(region) for region in regions]
+        for key in list(self.active):
+            if key not in wanted:
+                self.active.remove(key)
+        for region in regions:
+            self.add_region(region)
+
+    def check(self, decode=True, timeout=None):
+        """Solve with the active regions
+
+        Returns (status, placements, conflict) where status is "sat",
+        "unsat" or "unknown", and conflict lists the active regions (as
+        (cells, op, target)) in the unsat core. With decode=False the
+        placements are left as None; values() reads the cell pips instead.
+        A timeout (seconds) applies to this check only and ends it as
+        "unknown".
+        """
+        start = time.perf_counter()
+        try:
+            if self.encoding is None:
+                return "unsat", None, []
+            solver = self.encoding.solver
+            solver.set("timeout", NO_TIMEOUT if timeout is None else max(1, int(timeout * 1000)))
+            assumptions = [self.selectors[key] for key in self.active]
+            result = solver.check(*assumptions)
+            if result == sat:
+                self.model = solver.model()
+                return "sat", self.encoding.decode(self.model) if decode else None, []
+            if result == unsat:
+                core = {str(lit) for lit in solver.unsat_core()}
+                conflict = [(list(key[0]), key[1], key[2]) for key in self.active
+                            if str(self.selectors[key]) in core]
+                return "unsat", None, conflict
+            return "unknown", None, []
+        finally:
+            self.last_time = time.perf_counter() - start
+
+    def values(self):
+        """Pips of every cell in the last model, as {cell: value}"""
+        values = {}
+        for c in self.cells:
+            val = self.encoding.cell_val[c]
+            if isinstance(val, dict):
+                val = next(v for v, bit in val.items()
+                           if is_true(self.model.evaluate(bit, model_completion=True)))
+            else:
+                val = self.model.evaluate(val, model_completion=True).as_long()
+            values[c] = val
+        return values
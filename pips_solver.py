@@ -0,0 +1,425 @@
+"""Headless Pips solver core
+
+Nothing in this module imports pygame or matplotlib, so it can be used on
+display-less machines. Puzzles use the same format as the notebook:
+
+    {
+        "id": "easy-example",
+        "map": [[-1, -1, 0], [1, 2, 3], [-1, 4, 5], [-1, 6, 7]],
+        "dominos": [[4, 1], [3, 4], [1, 3], [5, 3]],
+        "regions": [[[1], "sum_eq", 4], [[2, 4, 6], "all_eq", null]]
+    }
+
+Regions may also be given as {"cells": [...], "op": "...", "target": ...}.
+"""
+import time
+
+import pips_board
+import pips_feasibility
+from pips_metrics import NULL
+
+REGION_OPS = ("sum_eq", "sum_lt", "sum_gt", "all_eq", "all_diff")
+# Residual problems produced by presolve may also carry unary
+# ([cell], "domain", [allowed values]) regions, which every backend accepts.
+BACKENDS = ("z3", "dlx")
+# Share of a time budget that Z3 leaves for the best-partial search if it gives up,
+# and the time that search gets when there is only a memory budget
+PARTIAL_SHARE = 0.1
+PARTIAL_SECONDS = 1.0
+
+
+class SolveUnknown(TimeoutError):
+    """A solve ran out of its time or memory budget without an answer
+
+    reason is "timeout" or "memory". partial holds the largest set of
+    (d, e, o) placements found that the regions still allowed, or None if
+    none could be worked out.
+    """
+
+    def __init__(self, reason, partial=None):
+        super().__init__(reason, partial)
+        self.reason = reason
+        self.partial = None if partial is None else sorted(partial)
+
+    def __str__(self):
+        return f"solve ran out of its {'time' if self.reason == 'timeout' else 'memory'} budget"
+
+
+def build_map_structure(active_cells, cell_map):
+    """Build map structure from active cells - fill gaps with -1"""
+    if not active_cells:
+        return []
+
+    # Find the bounding box of active cells
+    rows = [r for r, c in active_cells]
+    cols = [c for r, c in active_cells]
+    min_row, max_row = min(rows), max(rows)
+    min_col, max_col = min(cols), max(cols)
+
+    # Build map with -1 for empty cells
+    map_structure = []
+    for r in range(min_row, max_row + 1):
+        row = []
+        for c in range(min_col, max_col + 1):
+            if (r, c) in active_cells:
+                row.append(cell_map[(r, c)])
+            else:
+                row.append(-1)
+        map_structure.append(row)
+
+    return map_structure
+
+
+def list_edges_from_grid(map_structure):
+    """Generate edges from map structure - matches original code"""
+    edges = []
+    rows = len(map_structure)
+
+    for r in range(rows):
+        cols = len(map_structure[r])
+        # Horizontal edges within row
+        for c in range(cols - 1):
+            if map_structure[r][c] != -1 and map_structure[r][c + 1] != -1:
+                edges.append((map_structure[r][c], map_structure[r][c + 1]))
+
+        # Vertical edges to next row
+        if r < rows - 1:
+            for c in range(min(cols, len(map_structure[r + 1]))):
+                if map_structure[r][c] != -1 and map_structure[r + 1][c] != -1:
+                    edges.append((map_structure[r][c], map_structure[r + 1][c]))
+
+    return edges
+
+
+def node_positions(map_structure):
+    """Map each cell number to its (row, col) in the map structure"""
+    node_pos = {}
+    for r, row in enumerate(map_structure):
+        for c, val in enumerate(row):
+            if val != -1:
+                node_pos[val] = (r, c)
+    return node_pos
+
+
+def normalize_puzzle(data):
+    """Validate a puzzle dict and convert it to the internal tuple format"""
+    if not isinstance(data, dict):
+        raise ValueError("puzzle must be a JSON object")
+    map_structure = data.get("map", data.get("map_structure"))
+    if not map_structure:
+        raise ValueError("puzzle has no 'map'")
+    map_structure = [[int(v) for v in row] for row in map_structure]
+
+    dominos = []
+    for domino in data.get("dominos", []):
+        a, b = (int(v) for v in domino)
+        if not (0 <= a <= 6 and 0 <= b <= 6):
+            raise ValueError(f"domino {domino} has pips outside 0-6")
+        dominos.append((a, b))
+
+    regions = []
+    for region in data.get("regions", []):
+        if isinstance(region, dict):
+            cells_R, op, target = region["cells"], region["op"], region.get("target")
+        else:
+            cells_R, op, target = region
+        if op not in REGION_OPS:
+            raise ValueError(f"unknown region op {op!r}")
+        regions.append(([int(c) for c in cells_R], op, None if target is None else int(target)))
+
+    cells = sorted(node_positions(map_structure))
+    if cells != list(range(len(cells))):
+        raise ValueError("map cells must be numbered 0..N-1")
+    board = pips_board.Board.from_map(map_structure)
+    if board.map_structure() == map_structure:
+        edges = board.edges
+    else:
+        # Not numbered row-major (or padded); keep the caller's numbering
+        board = None
+        edges = list_edges_from_grid(map_structure)
+
+    return {
+        "id": data.get("id"),
+        "map": map_structure,
+        "cells": cells,
+        "edges": edges,
+        "dominos": dominos,
+        "regions": regions,
+        "board": board,
+    }
+
+
+def run_solver(cells, dominos, edges, regions, backend="z3", presolve=False,
+               decompose=False, workers=None, cube_depth=0, cube_stats=None, metrics=None,
+               portfolio=None, portfolio_stats=None, feasibility=True, timeout=None, memory=None,
+               **options):
+    """Solve a puzzle and return a list of (d, e, o) placements or None
+
+    backend selects the search engine: "z3" (SMT encoding) or "dlx"
+    (Dancing Links exact cover with region pruning). With presolve=True the
+    puzzle is first reduced by propagation (see pips_presolve). With
+    decompose=True disconnected islands are solved separately in a pool of
+    workers processes (see pips_parallel). With cube_depth > 0 a single
+    board is split into cubes that workers check in parallel; per-cube
+    statistics are appended to cube_stats if a list is given. With a
+    portfolio (a list of pips_parallel.PORTFOLIO names or (name, options)
+    pairs) the configurations race in separate processes and the first
+    answer wins; the race record is appended to portfolio_stats. A
+    pips_metrics.SolveMetrics passed as metrics collects phase timings,
+    problem sizes and backend statistics. Extra options are passed to the
+    backend, e.g. encoding="compact" for Z3. Unless feasibility=False, the
+    global counting checks of pips_feasibility reject impossible puzzles
+    before any of this runs.
+
+    timeout (seconds) and memory (megabytes, enforced by Z3) bound the
+    solve, presolve and encoding included. When a budget runs out
+    SolveUnknown is raised instead of returning, carrying the largest
+    consistent partial placement found.
+    """
+    if metrics is None:
+        metrics = NULL
+    elif metrics.enabled and "cells" not in metrics.counters:
+        metrics.count("cells", len(cells))
+        metrics.count("edges", len(edges))
+        metrics.count("dominos", len(dominos))
+        metrics.count("regions", len(regions))
+    if feasibility:
+        with metrics.phase("feasibility"):
+            reasons = pips_feasibility.explain_infeasible(cells, dominos, edges, regions)
+        if reasons:
+            return None
+    deadline = None if timeout is None else time.perf_counter() + timeout
+    # Z3 gets most of the budget; the rest goes to a partial placement
+    z3_timeout = None if timeout is None else timeout * (1 - PARTIAL_SHARE)
+    if decompose:
+        import pips_parallel
+        with metrics.phase("decompose"):
+            try:
+                return pips_parallel.solve_components(
+                    cells, dominos, edges, regions, backend=backend, workers=workers,
+                    presolve=presolve, cube_depth=cube_depth, cube_stats=cube_stats,
+                    portfolio=portfolio, portfolio_stats=portfolio_stats, timeout=timeout,
+                    memory=memory, **options)
+            except SolveUnknown as exc:
+                # Island placements use island numbering; report no partial
+                raise SolveUnknown(exc.reason) from None
+    if presolve:
+        import pips_presolve
+        with metrics.phase("presolve"):
+            reduced = pips_presolve.presolve(cells, dominos, edges, regions)
+        if deadline is not None and reduced.status == "reduced" and _remaining(deadline) <= 0:
+            raise SolveUnknown("timeout", reduced.expand([]))
+        return solve_presolved(reduced, backend=backend, workers=workers,
+                               cube_depth=cube_depth, cube_stats=cube_stats, metrics=metrics,
+                               portfolio=portfolio, portfolio_stats=portfolio_stats,
+                               timeout=_remaining(deadline), memory=memory, **options)
+    if portfolio:
+        import pips_parallel
+        with metrics.phase("portfolio"):
+            try:
+                return pips_parallel.solve_portfolio(
+                    cells, dominos, edges, regions, configs=portfolio,
+                    portfolio_stats=portfolio_stats, timeout=timeout, backend=backend,
+                    cube_depth=cube_depth, memory=memory, **options)
+            except SolveUnknown:
+                raise
+            except TimeoutError:
+                raise SolveUnknown("timeout") from None
+    if cube_depth:
+        if backend != "z3":
+            raise ValueError("cube-and-conquer needs the incremental z3 backend")
+        import pips_parallel
+        try:
+            with metrics.phase("cubes"):
+                return pips_parallel.solve_cubes(cells, dominos, edges, regions,
+                                                 depth=cube_depth, workers=workers,
+                                                 cube_stats=cube_stats, timeout=z3_timeout,
+                                                 memory=memory, **options)
+        except SolveUnknown as exc:
+            with metrics.phase("partial"):
+                seconds = _remaining(deadline) if deadline is not None else PARTIAL_SECONDS
+                return best_partial(cells, dominos, edges, regions, seconds, exc.reason)
+    if backend == "z3":
+        import pips_z3
+        try:
+            return pips_z3.run_solver(cells, dominos, edges, regions, metrics=metrics,
+                                      timeout=z3_timeout, memory=memory, **options)
+        except SolveUnknown as exc:
+            with metrics.phase("partial"):
+                seconds = _remaining(deadline) if deadline is not None else PARTIAL_SECONDS
+                return best_partial(cells, dominos, edges, regions, seconds, exc.reason)
+    if backend == "dlx":
+        import pips_dlx
+        return pips_dlx.run_solver(cells, dominos, edges, regions, metrics=metrics,
+                                   timeout=timeout)
+    raise ValueError(f"unknown backend {backend!r}, expected one of {BACKENDS}")
+
+
+def _remaining(deadline):
+    return None if deadline is None else max(0.0, deadline - time.perf_counter())
+
+
+def best_partial(cells, dominos, edges, regions, seconds, reason="timeout"):
+    """Spend up to seconds on a Dancing Links search after another backend gave up
+
+    Returns a solution (or None for no solution) if the search finishes in
+    time; otherwise raises SolveUnknown(reason) with the largest consistent
+    partial placement the search reached.
+    """
+    import pips_dlx
+    dlx = pips_dlx.DancingLinks(cells, dominos, edges, regions)
+    try:
+        return dlx.first_solution(timeout=seconds)
+    except SolveUnknown as exc:
+        raise SolveUnknown(reason, exc.partial) from None
+
+
+def run_board(board, dominos, regions, **options):
+    """Solve a puzzle laid out on a pips_board.Board (see run_solver)"""
+    return run_solver(*board.problem(dominos, regions), **options)
+
+
+def solve_presolved(reduced, backend="z3", cube_stats=None, **options):
+    """Finish a PresolveResult with a backend and map the answer back"""
+    if reduced.status == "unsat":
+        return None
+    if reduced.status == "solved":
+        return reduced.expand([])
+    try:
+        placements = run_solver(*reduced.residual, backend=backend, cube_stats=cube_stats,
+                                **options)
+    except SolveUnknown as exc:
+        # The placements fixed by presolve are part of the partial answer
+        raise SolveUnknown(exc.reason, reduced.expand(exc.partial or [])) from None
+    return reduced.expand(placements)
+
+
+def iter_solutions(cells, dominos, edges, regions, backend="z3", presolve=False, **options):
+    """Yield all solutions one at a time, modulo swaps of identical dominos
+
+    Z3 keeps one incremental solver and blocks each layout it returns; DLX
+    simply continues its exact cover search. Puzzles that fail the
+    pips_feasibility checks yield nothing.
+    """
+    if pips_feasibility.explain_infeasible(cells, dominos, edges, regions):
+        return
+    if presolve:
+        import pips_presolve
+        reduced = pips_presolve.presolve(cells, dominos, edges, regions)
+        if reduced.status == "solved":
+            yield reduced.expand([])
+        elif reduced.status == "reduced":
+            for placements in iter_solutions(*reduced.residual, backend=backend, **options):
+                yield reduced.expand(placements)
+        return
+    if backend == "z3":
+        import pips_z3
+        yield from pips_z3.iter_solutions(cells, dominos, edges, regions, **options)
+    elif backend == "dlx":
+        import pips_dlx
+        yield from pips_dlx.DancingLinks(cells, dominos, edges, regions).solutions()
+    else:
+        raise ValueError(f"unknown backend {backend!r}, expected one of {BACKENDS}")
+
+
+def count_solutions(cells, dominos, edges, regions, limit=None, **options):
+    """Count solutions, stopping early once limit is reached
+
+    Raises SolveUnknown if the backend gives up before the count is known.
+    """
+    count = 0
+    for _ in iter_solutions(cells, dominos, edges, regions, **options):
+        count += 1
+        if limit is not None and count >= limit:
+            break
+    return count
+
+
+def is_unique(cells, dominos, edges, regions, **options):
+    """True if the puzzle has exactly one solution (stops at the second)"""
+    return count_solutions(cells, dominos, edges, regions, limit=2, **options) == 1
+
+
+def solve(data, backend="z3", presolve=False, cache=None, metrics=None, **options):
+    """Solve a puzzle dict and return a JSON-serializable result dict
+
+    If cache is a pips_cache.SolutionCache, equivalent puzzles solved before
+    are answered from it without running a backend. metrics (a
+    pips_metrics.SolveMetrics) is filled in as in run_solver. A solve that
+    runs out of its timeout/memory budget gets status "unknown", its
+    "reason" and the best "partial" placement instead of "unsat".
+    """
+    if metrics is None:
+        metrics = NULL
+    with metrics.phase("normalize"):
+        puzzle = normalize_puzzle(data)
+    if metrics.enabled:
+        metrics.count("cells", len(puzzle["cells"]))
+        metrics.count("edges", len(puzzle["edges"]))
+        metrics.count("dominos", len(puzzle["dominos"]))
+        metrics.count("regions", len(puzzle["regions"]))
+    start = time.perf_counter()
+    timeout = options.pop("timeout", None)
+    deadline = None if timeout is None else start + timeout
+    problem = (puzzle["cells"], puzzle["dominos"], puzzle["edges"], puzzle["regions"])
+    presolve_stats = None
+    with metrics.phase("feasibility"):
+        reasons = pips_feasibility.explain_infeasible(*problem)
+    cube_stats = [] if options.get("cube_depth") else None
+    portfolio_stats = [] if options.get("portfolio") else None
+    cached = None
+    unknown = None
+    try:
+        if reasons:
+            placements = None
+        elif cache is not None:
+            import pips_cache
+            placements, cached = pips_cache.cached_solve(
+                puzzle["map"], puzzle["dominos"], puzzle["regions"], cache,
+                backend=backend, presolve=presolve, cube_stats=cube_stats, metrics=metrics,
+                portfolio_stats=portfolio_stats, feasibility=False, timeout=_remaining(deadline),
+                **options)
+            metrics.count("cached", int(cached))
+        elif presolve:
+            import pips_presolve
+            with metrics.phase("presolve"):
+                reduced = pips_presolve.presolve(*problem)
+            presolve_stats = reduced.stats
+            if deadline is not None and reduced.status == "reduced" and _remaining(deadline) <= 0:
+                raise SolveUnknown("timeout", reduced.expand([]))
+            placements = solve_presolved(reduced, backend=backend, cube_stats=cube_stats,
+                                         metrics=metrics, portfolio_stats=portfolio_stats,
+                                         timeout=_remaining(deadline), **options)
+        else:
+            placements = run_solver(*problem, backend=backend, cube_stats=cube_stats,
+                                    metrics=metrics, portfolio_stats=portfolio_stats,
+                                    feasibility=False, timeout=_remaining(deadline), **options)
+    except SolveUnknown as exc:
+        placements, unknown = None, exc
+    elapsed = time.perf_counter() - start
+
+    result = {
+        "id": puzzle["id"],
+        "status": "unsat" if placements is None else "sat",
+        "placements": None if placements is None else [list(p) for p in placements],
+        "edges": [list(e) for e in puzzle["edges"]],
+        "time": round(elapsed, 6),
+    }
+    if unknown is not None:
+        # Out of budget: not a proof that there is no solution
+        result["status"] = "unknown"
+        result["reason"] = unknown.reason
+        result["partial"] = None if unknown.partial is None else [list(p) for p in unknown.partial]
+    if reasons:
+        result["infeasible"] = reasons
+    if cached is not None:
+        result["cached"] = cached
+    if presolve_stats is not None:
+        result["presolve"] = presolve_stats
+    if cube_stats:
+        result["cubes"] = cube_stats
+    if portfolio_stats:
+        result["portfolio"] = portfolio_stats
+        if metrics.enabled and len(portfolio_stats) == 1:
+            metrics.labels["winner"] = portfolio_stats[0]["winner"]
+    return result
@@ -1,11 +1,47 @@
-import pygame
+import logging
+import queue
 import sys
-from z3 import *
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
+import threading
 
-# Initialize Pygame
-pygame.init()
+import pips_board
+import pips_cache
+import pips_feasibility
+import pips_solver
+import pips_worker
+
+logger = logging.getLogger("pips.interface")
+
+# pygame, matplotlib and z3 are loaded on first use: pygame when the editor
+# starts, matplotlib when a solution is shown, z3 (through pips_session and
+# the backends) when something is solved. Importing this module stays cheap;
+# pips_bench.py --startup keeps it that way.
+pygame = None
+plt = None
+
+
+def load_pygame():
+    """Import pygame and start only the display and font modules"""
+    global pygame
+    if pygame is None:
+        import pygame as pg
+        pg.display.init()
+        pg.font.init()
+        pygame = pg
+    return pygame
+
+
+def load_pyplot():
+    """Import matplotlib.pyplot"""
+    global plt
+    if plt is None:
+        import matplotlib.pyplot as pyplot
+        plt = pyplot
+    return plt
+
+
+def open_figures():
+    """Numbers of the open solution windows (none before pyplot is loaded)"""
+    return plt.get_fignums() if plt is not None else []
 
 # Constants
 WINDOW_WIDTH = 1200
@@ -16,6 +52,16 @@ GRID_COLS = 8
 GRID_OFFSET_X = 50
 GRID_OFFSET_Y = 100
 
+# Board viewport: larger boards scroll and zoom inside this area
+VIEW_WIDTH = 640
+VIEW_HEIGHT = 640
+MIN_CELL_SIZE = 8
+MAX_CELL_SIZE = 160
+LABEL_MIN_CELL_SIZE = 24  # smaller cells are drawn without their number
+
+# Live status checks run on the pygame thread, so they give up quickly
+LIVE_CHECK_TIMEOUT = 0.2  # seconds
+
 # Colors
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
@@ -38,12 +84,15 @@ class Button:
         self.color = color
         self.text_color = text_color
         self.active = False
+        self.label = None  # (font, surface) rendered on first draw
         
     def draw(self, screen, font):
         color = self.color if not self.active else SELECTED_CELL
         pygame.draw.rect(screen, color, self.rect)
         pygame.draw.rect(screen, BLACK, self.rect, 2)
-        text_surface = font.render(self.text, True, self.text_color)
+        if self.label is None or self.label[0] is not font:
+            self.label = (font, font.render(self.text, True, self.text_color))
+        text_surface = self.label[1]
         text_rect = text_surface.get_rect(center=self.rect.center)
         screen.blit(text_surface, text_rect)
         
@@ -52,21 +101,50 @@ class Button:
 
 # Main application class
 class DominoPuzzleBuilder:
-    def __init__(self):
+    def __init__(self, event_driven=True, rows=GRID_ROWS, cols=GRID_COLS):
+        load_pygame()
         self.screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
         pygame.display.set_caption("Domino Puzzle Builder")
         self.clock = pygame.time.Clock()
         self.font = pygame.font.Font(None, 24)
         self.title_font = pygame.font.Font(None, 36)
         
+        # Board size and viewport (cell_size is the zoom level, view_x/y the
+        # scroll offset in board pixels)
+        self.rows = rows
+        self.cols = cols
+        self.view_rect = pygame.Rect(GRID_OFFSET_X, GRID_OFFSET_Y, VIEW_WIDTH, VIEW_HEIGHT)
+        self.cell_size = GRID_SIZE
+        self.view_x = 0
+        self.view_y = 0
+        self.panning = False
+        
         # State
         self.mode = "SETUP_BOARD"  # SETUP_BOARD, ADD_DOMINOS, ADD_REGIONS, SOLVE
-        self.active_cells = set()  # Cells that are part of the board
-        self.cell_map = {}  # Maps grid position to cell number
+        self.board = pips_board.Board()  # Active cells with numbering and edges
         self.dominos = []  # List of (a, b) tuples
         self.regions = []  # List of (cells, op, target) tuples
         self.current_region_cells = []
         self.current_region_type = None
+        self.solution_cache = pips_cache.SolutionCache()
+        self.session = None  # Incremental solver for the current cells + dominos
+        self.session_key = None
+        self.session_builder = None  # (key, thread, result dict) building a session
+        self.live_check = None  # (thread, regions, result dict) checking regions off the loop
+        self.live_pending = False  # a live check is waiting for its session or the last check
+        self.live_status = None  # (text, color) feedback while building regions
+        self.solver_events = queue.Queue()
+        # The worker posts this pygame event with each solver event so an idle
+        # wait_events() wakes up for it (pygame.event.post is thread-safe)
+        self.solver_wakeup = pygame.event.custom_type()
+        self.background = pips_worker.BackgroundSolver(self.solver_events,
+                                                       notify=self.wake_for_solver)
+        
+        # Rendering: redraw only when something changed unless event_driven is off
+        self.event_driven = event_driven
+        self.dirty = True
+        self.region_color = {}  # cell number -> color of the last region containing it
+        self.text_cache = {}  # (text, color, font) -> rendered surface
         
         # Input fields
         self.domino_input = {"a": "", "b": ""}
@@ -102,46 +180,113 @@ class DominoPuzzleBuilder:
         # Action buttons
         self.finish_region_button = Button(750, 400, 180, 40, "Finish Region", (150, 255, 150))
         self.clear_region_button = Button(750, 450, 180, 40, "Clear Selection", (255, 150, 150))
+        self.undo_region_button = Button(950, 400, 180, 40, "Undo Region", (255, 200, 150))
+        self.cancel_solve_button = Button(1080, 20, 100, 40, "Cancel", (255, 200, 100))
         self.add_domino_button = Button(950, 150, 180, 40, "Add Domino", (150, 255, 150))
         self.clear_board_button = Button(950, 20, 120, 40, "Clear All", (255, 100, 100))
         
     def get_grid_cell(self, pos):
         """Convert mouse position to grid cell coordinates"""
+        if not self.view_rect.collidepoint(pos):
+            return None
         x, y = pos
-        col = (x - GRID_OFFSET_X) // GRID_SIZE
-        row = (y - GRID_OFFSET_Y) // GRID_SIZE
-        if 0 <= row < GRID_ROWS and 0 <= col < GRID_COLS:
+        col = (x - GRID_OFFSET_X + self.view_x) // self.cell_size
+        row = (y - GRID_OFFSET_Y + self.view_y) // self.cell_size
+        if 0 <= row < self.rows and 0 <= col < self.cols:
             return (row, col)
         return None
     
+    def clamp_view(self):
+        """Keep the viewport inside the board"""
+        max_x = max(0, self.cols * self.cell_size - VIEW_WIDTH)
+        max_y = max(0, self.rows * self.cell_size - VIEW_HEIGHT)
+        self.view_x = min(max(0, self.view_x), max_x)
+        self.view_y = min(max(0, self.view_y), max_y)
+    
+    def scroll(self, dx, dy):
+        """Move the viewport by (dx, dy) screen pixels"""
+        self.view_x += dx
+        self.view_y += dy
+        self.clamp_view()
+    
+    def zoom(self, factor, pos):
+        """Change the cell size, keeping the board point under pos in place"""
+        size = int(round(self.cell_size * factor))
+        if size == self.cell_size:
+            size += 1 if factor > 1 else -1
+        size = min(max(size, MIN_CELL_SIZE), MAX_CELL_SIZE)
+        x, y = pos
+        board_x = (x - GRID_OFFSET_X + self.view_x) / self.cell_size
+        board_y = (y - GRID_OFFSET_Y + self.view_y) / self.cell_size
+        self.cell_size = size
+        self.view_x = int(board_x * size - (x - GRID_OFFSET_X))
+        self.view_y = int(board_y * size - (y - GRID_OFFSET_Y))
+        self.clamp_view()
+    
+    def render_text(self, text, color=BLACK, font=None):
+        """Render text once and reuse the surface on later frames"""
+        font = font or self.font
+        key = (text, color, id(font))
+        surface = self.text_cache.get(key)
+        if surface is None:
+            if len(self.text_cache) > 4096:
+                self.text_cache.clear()
+            surface = font.render(text, True, color)
+            self.text_cache[key] = surface
+        return surface
+    
+    def rebuild_region_index(self):
+        """Recompute the cell -> region color lookup after regions change"""
+        self.region_color = {}
+        for i, (region_cells, _, _) in enumerate(self.regions):
+            for cell_num in region_cells:
+                self.region_color[cell_num] = REGION_COLORS[i % len(REGION_COLORS)]
+    
     def draw_grid(self):
-        """Draw the grid and active cells"""
-        for row in range(GRID_ROWS):
-            for col in range(GRID_COLS):
-                x = GRID_OFFSET_X + col * GRID_SIZE
-                y = GRID_OFFSET_Y + row * GRID_SIZE
-                
-                # Determine cell color
-                cell = (row, col)
-                if cell in self.active_cells:
-                    color = ACTIVE_CELL
-                    if cell in self.current_region_cells:
-                        color = SELECTED_CELL
-                    # Check if part of existing region
-                    for i, (region_cells, _, _) in enumerate(self.regions):
-                        if self.cell_map.get(cell) in region_cells:
-                            color = REGION_COLORS[i % len(REGION_COLORS)]
-                    pygame.draw.rect(self.screen, color, (x, y, GRID_SIZE, GRID_SIZE))
-                    
-                    # Draw cell number
-                    if cell in self.cell_map:
-                        text = self.font.render(str(self.cell_map[cell]), True, BLACK)
-                        self.screen.blit(text, (x + 5, y + 5))
-                else:
-                    pygame.draw.rect(self.screen, LIGHT_GRAY, (x, y, GRID_SIZE, GRID_SIZE))
-                
-                # Draw grid lines
-                pygame.draw.rect(self.screen, GRAY, (x, y, GRID_SIZE, GRID_SIZE), 1)
+        """Draw the visible part of the grid and the active cells in it"""
+        size = self.cell_size
+        first_row = self.view_y // size
+        first_col = self.view_x // size
+        last_row = min(self.rows, (self.view_y + VIEW_HEIGHT) // size + 1)
+        last_col = min(self.cols, (self.view_x + VIEW_WIDTH) // size + 1)
+        left = GRID_OFFSET_X - self.view_x
+        top = GRID_OFFSET_Y - self.view_y
+        
+        self.screen.set_clip(self.view_rect)
+        board = pygame.Rect(left, top, self.cols * size, self.rows * size).clip(self.view_rect)
+        pygame.draw.rect(self.screen, LIGHT_GRAY, board)
+        
+        # Grid lines for the visible rows and columns only
+        for col in range(first_col, last_col + 1):
+            x = left + col * size
+            pygame.draw.line(self.screen, GRAY, (x, board.top), (x, board.bottom - 1))
+        for row in range(first_row, last_row + 1):
+            y = top + row * size
+            pygame.draw.line(self.screen, GRAY, (board.left, y), (board.right - 1, y))
+        
+        selected = set(self.current_region_cells)
+        cell_map = self.board.cell_map
+        for cell in self.board:
+            row, col = cell
+            if not (first_row <= row < last_row and first_col <= col < last_col):
+                continue
+            x = left + col * size
+            y = top + row * size
+            
+            # Determine cell color (an existing region wins over the selection)
+            cell_num = cell_map.get(cell)
+            color = self.region_color.get(cell_num)
+            if color is None:
+                color = SELECTED_CELL if cell in selected else ACTIVE_CELL
+            pygame.draw.rect(self.screen, color, (x, y, size, size))
+            
+            # Draw cell number
+            if cell_num is not None and size >= LABEL_MIN_CELL_SIZE:
+                self.screen.blit(self.render_text(str(cell_num)), (x + 5, y + 5))
+            
+            # Draw grid lines
+            pygame.draw.rect(self.screen, GRAY, (x, y, size, size), 1)
+        self.screen.set_clip(None)
     
     def draw_instructions(self):
         """Draw mode-specific instructions"""
@@ -152,26 +297,28 @@ class DominoPuzzleBuilder:
             "SOLVE": "Click 'Solve!' to find the solution and visualize it!"
         }
         
-        text = self.font.render(instructions[self.mode], True, BLACK)
-        self.screen.blit(text, (50, 730))
+        self.screen.blit(self.render_text(instructions[self.mode]), (50, 730))
+        if self.rows * self.cell_size > VIEW_HEIGHT or self.cols * self.cell_size > VIEW_WIDTH:
+            hint = "Mouse wheel zooms, right-drag or arrow keys scroll the board"
+            self.screen.blit(self.render_text(hint, DARK_GRAY), (50, 755))
     
     def draw_dominos_list(self):
         """Draw the list of added dominos"""
         y = 150
-        text = self.font.render("Dominos:", True, BLACK)
-        self.screen.blit(text, (750, y))
+        self.screen.blit(self.render_text("Dominos:"), (750, y))
         y += 30
         
         for i, (a, b) in enumerate(self.dominos):
-            text = self.font.render(f"{i+1}. ({a}, {b})", True, BLACK)
-            self.screen.blit(text, (750, y))
+            self.screen.blit(self.render_text(f"{i+1}. ({a}, {b})"), (750, y))
             y += 25
     
     def draw_regions_list(self):
         """Draw the list of added regions"""
         y = 500
-        text = self.font.render("Regions:", True, BLACK)
-        self.screen.blit(text, (750, y))
+        self.screen.blit(self.render_text("Regions:"), (750, y))
+        if self.live_status:
+            status_text, status_color = self.live_status
+            self.screen.blit(self.render_text(status_text, status_color), (850, y))
         y += 30
         
         for i, (cells, op, target) in enumerate(self.regions):
@@ -179,8 +326,7 @@ class DominoPuzzleBuilder:
             pygame.draw.rect(self.screen, REGION_COLORS[i % len(REGION_COLORS)], color_rect)
             
             target_str = f"={target}" if target is not None else ""
-            text = self.font.render(f"{cells} {op} {target_str}", True, BLACK)
-            self.screen.blit(text, (775, y))
+            self.screen.blit(self.render_text(f"{cells} {op} {target_str}"), (775, y))
             y += 25
     
     def draw_input_fields(self):
@@ -189,48 +335,36 @@ class DominoPuzzleBuilder:
             # Domino input fields - moved to right side
             pygame.draw.rect(self.screen, WHITE, (950, 200, 80, 30))
             pygame.draw.rect(self.screen, BLACK, (950, 200, 80, 30), 2)
-            text = self.font.render("a: " + self.domino_input["a"], True, BLACK)
-            self.screen.blit(text, (955, 205))
+            self.screen.blit(self.render_text("a: " + self.domino_input["a"]), (955, 205))
             
             pygame.draw.rect(self.screen, WHITE, (1040, 200, 80, 30))
             pygame.draw.rect(self.screen, BLACK, (1040, 200, 80, 30), 2)
-            text = self.font.render("b: " + self.domino_input["b"], True, BLACK)
-            self.screen.blit(text, (1045, 205))
+            self.screen.blit(self.render_text("b: " + self.domino_input["b"]), (1045, 205))
             
             self.add_domino_button.draw(self.screen, self.font)
             
         elif self.mode == "ADD_REGIONS":
             # Region target input
             if self.current_region_type in ["sum_eq", "sum_lt", "sum_gt"]:
-                text = self.font.render("Target:", True, BLACK)
-                self.screen.blit(text, (750, 365))
+                self.screen.blit(self.render_text("Target:"), (750, 365))
                 
                 pygame.draw.rect(self.screen, WHITE, (820, 360, 100, 30))
                 pygame.draw.rect(self.screen, BLACK, (820, 360, 100, 30), 2)
-                text = self.font.render(self.region_target_input, True, BLACK)
-                self.screen.blit(text, (825, 365))
+                self.screen.blit(self.render_text(self.region_target_input), (825, 365))
             
             self.finish_region_button.draw(self.screen, self.font)
             self.clear_region_button.draw(self.screen, self.font)
+            self.undo_region_button.draw(self.screen, self.font)
     
     def handle_board_click(self, cell):
         """Handle clicking a cell in SETUP_BOARD mode"""
-        if cell in self.active_cells:
-            self.active_cells.remove(cell)
-            if cell in self.cell_map:
-                del self.cell_map[cell]
-        else:
-            self.active_cells.add(cell)
-        
-        # Renumber cells
-        self.cell_map = {}
-        for i, c in enumerate(sorted(self.active_cells)):
-            self.cell_map[c] = i
+        # The board keeps the row-major numbering and edges up to date
+        self.board.toggle(cell)
+        self.rebuild_region_index()
     
     def handle_region_click(self, cell):
         """Handle clicking a cell in ADD_REGIONS mode"""
-        if cell in self.active_cells and self.current_region_type:
-            cell_num = self.cell_map[cell]
+        if cell in self.board and self.current_region_type:
             if cell in self.current_region_cells:
                 self.current_region_cells.remove(cell)
             else:
@@ -251,7 +385,7 @@ class DominoPuzzleBuilder:
     def finish_region(self):
         """Finish adding a region"""
         if self.current_region_cells and self.current_region_type:
-            cell_nums = [self.cell_map[cell] for cell in self.current_region_cells]
+            cell_nums = [self.board.number(cell) for cell in self.current_region_cells]
             
             target = None
             if self.current_region_type in ["sum_eq", "sum_lt", "sum_gt"]:
@@ -268,279 +402,357 @@ class DominoPuzzleBuilder:
             # Deactivate region buttons
             for button in self.region_buttons.values():
                 button.active = False
+            
+            self.rebuild_region_index()
+            self.update_live_status()
     
-    def solve_puzzle(self):
-        """Solve the domino puzzle using Z3"""
-        if not self.active_cells or not self.dominos:
-            print("Please set up the board and add dominos first!")
+    def undo_region(self):
+        """Remove the most recently added region"""
+        if self.regions:
+            self.regions.pop()
+            self.rebuild_region_index()
+            self.update_live_status()
+    
+    def get_session(self, wait=True):
+        """Return the solving session for the current cells and dominos
+
+        Encoding a large board takes seconds, so the session is built on a
+        helper thread. With wait=False this returns None until it is ready;
+        the thread posts a wake-up event when it finishes.
+        """
+        key = (self.board.version, tuple(self.dominos))
+        if self.session is not None and key == self.session_key:
+            return self.session
+        if self.live_check is not None and self.live_check[0].is_alive():
+            # Z3 is busy with a live check; never run two threads on it
+            if not wait:
+                return None
+            self.live_check[0].join()
+        if self.session_builder is None or (self.session_builder[0] != key
+                                            and not self.session_builder[1].is_alive()):
+            result = {}
+            thread = threading.Thread(target=self._build_session, daemon=True,
+                                      args=(self.board.cells, list(self.dominos),
+                                            self.board.edges, result))
+            self.session_builder = (key, thread, result)
+            thread.start()
+        build_key, thread, result = self.session_builder
+        if wait:
+            thread.join()
+            if build_key != key:  # a stale build was running; Z3 is free now
+                return self.get_session(wait=True)
+        if thread.is_alive() or build_key != key:
+            return None
+        self.session_builder = None
+        if "error" in result:
+            raise result["error"]
+        self.session, self.session_key = result["session"], key
+        return self.session
+    
+    def _build_session(self, cells, dominos, edges, result):
+        try:
+            import pips_session
+            result["session"] = pips_session.SolvingSession(cells, dominos, edges)
+        except Exception as exc:
+            result["error"] = exc
+        self.wake_for_solver()
+    
+    def session_solve(self, cells, dominos, edges, regions):
+        """Solve the current board through the incremental session"""
+        session = self.get_session()
+        if self.live_check is not None:
+            self.live_check[0].join()
+        session.sync(regions)
+        status, placements, conflict = session.check()
+        logger.debug("Session check: %s in %.3fs", status, session.last_time)
+        return placements
+    
+    def update_live_status(self):
+        """Re-check the board after a region edit and remember the verdict"""
+        self.live_pending = False
+        if not self.board or len(self.board) != 2 * len(self.dominos):
+            self.live_status = None
+            return
+        reasons = pips_feasibility.explain_infeasible(self.board.cells, self.dominos,
+                                                      self.board.edges, self.regions)
+        if reasons:
+            logger.info("Impossible puzzle: %s", "; ".join(reasons))
+            self.live_status = (f"Impossible: {reasons[0]}", (200, 0, 0))
             return
+        session = self.get_session(wait=False)
+        self.live_status = ("Checking...", DARK_GRAY)
+        if session is None or self.live_busy():
+            self.live_pending = True
+            return
+        regions = list(self.regions)
+        result = {}
+        thread = threading.Thread(target=self._run_live_check, daemon=True,
+                                  args=(session, regions, result))
+        self.live_check = (thread, regions, result)
+        thread.start()
+
+    def live_busy(self):
+        """True while a session build or a live check is running on a helper thread"""
+        building = self.session_builder is not None and self.session_builder[1].is_alive()
+        checking = self.live_check is not None and self.live_check[0].is_alive()
+        return building or checking
+
+    def _run_live_check(self, session, regions, result):
+        """Check regions against the session on a helper thread and wake the loop"""
+        try:
+            session.sync(regions)
+            result["verdict"] = session.check(decode=False, timeout=LIVE_CHECK_TIMEOUT)
+            result["time"] = session.last_time
+        except Exception as exc:
+            result["error"] = exc
+        self.wake_for_solver()
+
+    def finish_live_check(self):
+        """Show the verdict of a finished live check"""
+        thread, regions, result = self.live_check
+        self.live_check = None
+        if "error" in result:
+            raise result["error"]
+        if regions != self.regions:
+            self.live_pending = True  # edited while checking; check again
+            return
+        status, placements, conflict = result["verdict"]
+        ms = result["time"] * 1000
+        if status == "sat":
+            self.live_status = (f"Satisfiable ({ms:.0f} ms)", (0, 150, 0))
+        elif status == "unsat":
+            numbers = [i + 1 for i, region in enumerate(self.regions)
+                       if (list(region[0]), region[1], region[2]) in conflict]
+            self.live_status = (f"Unsatisfiable, check regions {numbers}", (200, 0, 0))
+        else:
+            self.live_status = (f"Unknown (no answer within {ms:.0f} ms)", DARK_GRAY)
+    
+    def prepare_solve(self):
+        """Snapshot the current puzzle for solving and print its setup"""
+        if not self.board or not self.dominos:
+            logger.warning("Please set up the board and add dominos first!")
+            return None
         
         # Build cells and edges
-        cells = list(range(len(self.active_cells)))
+        cells = self.board.cells
         map_structure = self.build_map_structure()
         edges = self.list_edges_from_grid()
         
-        print(f"\n=== Puzzle Setup ===")
-        print(f"Map structure (like original code):")
+        logger.info("=== Puzzle Setup ===")
+        logger.info("Map structure (like original code):")
         for row in map_structure:
-            print(f"  {row}")
-        print(f"\nCells: {cells}")
-        print(f"Edges: {edges}")
-        print(f"Dominos: {self.dominos}")
-        print(f"Regions: {self.regions}")
-        print(f"\nNumber of edges: {len(edges)}, Number of dominos: {len(self.dominos)}")
-        
-        if len(edges) != len(self.dominos):
-            print(f"\n⚠️ WARNING: You have {len(self.dominos)} dominos but {len(edges)} edges!")
-            print("Each domino needs exactly one edge (pair of adjacent cells).")
+            logger.info("  %s", row)
+        logger.info("Cells: %s", cells)
+        logger.info("Edges: %s", edges)
+        logger.info("Dominos: %s", self.dominos)
+        logger.info("Regions: %s", self.regions)
+        logger.info("Number of edges: %d, Number of dominos: %d", len(edges), len(self.dominos))
+        
+        reasons = pips_feasibility.explain_infeasible(cells, self.dominos, edges, self.regions)
+        if reasons:
+            logger.warning("❌ This puzzle cannot be solved:")
+            for reason in reasons:
+                logger.warning("- %s", reason)
+            return None
         
-        # Call solver
-        placements = self.run_solver(cells, self.dominos, edges, self.regions)
+        node_pos = self.board.node_pos
         
+        return {
+            "cells": cells,
+            "map": map_structure,
+            "edges": edges,
+            "dominos": list(self.dominos),
+            "regions": list(self.regions),
+            "node_pos": node_pos,
+        }
+    
+    def finish_solve(self, job, placements, block=True):
+        """Show the solution of a prepared puzzle, or explain why there is none"""
         if placements:
-            # Visualize
-            node_pos = {}
-            for cell, cell_num in self.cell_map.items():
-                node_pos[cell_num] = cell
-            
-            self.visualize_solution(placements, self.dominos, edges, node_pos)
+            self.visualize_solution(placements, job["dominos"], job["edges"], job["node_pos"],
+                                    block=block)
         else:
-            print("\n❌ No solution found!")
-            print("Possible reasons:")
-            print("- Region constraints are too strict")
-            print("- Not enough dominos for the number of cells")
-            print("- Domino values don't match region requirements")
+            logger.info("❌ No solution found!")
+            logger.info("Possible reasons:")
+            logger.info("- Region constraints are too strict")
+            logger.info("- Not enough dominos for the number of cells")
+            logger.info("- Domino values don't match region requirements")
+    
+    def solve_puzzle(self):
+        """Solve the domino puzzle, blocking until the answer is ready"""
+        job = self.prepare_solve()
+        if job is None:
+            return
+        
+        # Call solver (equivalent puzzles solved before come from the cache)
+        placements, cached = pips_cache.cached_solve(job["map"], job["dominos"], job["regions"],
+                                                     self.solution_cache, runner=self.session_solve)
+        if cached:
+            logger.info("Answered from the solution cache")
+        self.finish_solve(job, placements)
+    
+    def start_solve(self):
+        """Hand the current puzzle to the background solver"""
+        job = self.prepare_solve()
+        if job is None:
+            return
+        
+        job["form"] = pips_cache.canonicalize(job["map"], job["dominos"], job["regions"])
+        tiles = self.solution_cache.get(job["form"].key)
+        if tiles is not pips_cache.MISS:
+            logger.info("Answered from the solution cache")
+            placements = pips_cache.from_canonical_solution(job["form"], tiles, job["dominos"],
+                                                            job["edges"])
+            self.finish_solve(job, placements, block=False)
+            return
+        
+        problem = (job["cells"], job["dominos"], job["edges"], job["regions"])
+        job_id = self.background.submit(problem, tag=job)
+        logger.info("Queued solve #%s", job_id)
+    
+    def poll_solver(self):
+        """Handle finished background solves without blocking the loop
+
+        Returns True if any solver event arrived.
+        """
+        handled = False
+        while True:
+            try:
+                event = self.solver_events.get_nowait()
+            except queue.Empty:
+                return handled
+            handled = True
+            job = event["tag"]
+            if event["type"] == "done":
+                logger.info("Solve #%s finished in %.2fs", event["job"], event["time"])
+                self.solution_cache.put(job["form"].key, pips_cache.to_canonical_solution(
+                    job["form"], event["placements"], job["dominos"], job["edges"]))
+                self.finish_solve(job, event["placements"], block=False)
+            elif event["type"] == "cancelled":
+                logger.info("Solve #%s cancelled", event["job"])
+            elif event["type"] == "error":
+                logger.warning("Solve #%s failed: %s", event["job"], event["error"])
+    
+    def draw_solver_status(self):
+        """Draw a spinner and the Cancel button while a solve is running"""
+        job, elapsed, waiting = self.background.status()
+        if job is None and not waiting:
+            return
+        spinner = "|/-\\"[int(elapsed * 8) % 4]
+        label = f"Solving {spinner} {elapsed:.1f}s" if job is not None else "Starting..."
+        if waiting:
+            label += f" (+{waiting} queued)"
+        text = self.render_text(label, DARK_GRAY)
+        self.screen.blit(text, (700, 32))
+        self.cancel_solve_button.draw(self.screen, self.font)
     
     def build_map_structure(self):
         """Build map structure from active cells - fill gaps with -1"""
-        if not self.active_cells:
-            return []
-        
-        # Find the bounding box of active cells
-        rows = [r for r, c in self.active_cells]
-        cols = [c for r, c in self.active_cells]
-        min_row, max_row = min(rows), max(rows)
-        min_col, max_col = min(cols), max(cols)
-        
-        # Build map with -1 for empty cells
-        map_structure = []
-        for r in range(min_row, max_row + 1):
-            row = []
-            for c in range(min_col, max_col + 1):
-                if (r, c) in self.active_cells:
-                    row.append(self.cell_map[(r, c)])
-                else:
-                    row.append(-1)
-            map_structure.append(row)
-        
-        return map_structure
+        return self.board.map_structure()
     
     def list_edges_from_grid(self):
         """Generate edges from map structure - matches original code"""
-        map_structure = self.build_map_structure()
-        edges = []
-        rows = len(map_structure)
-        
-        for r in range(rows):
-            cols = len(map_structure[r])
-            # Horizontal edges within row
-            for c in range(cols - 1):
-                if map_structure[r][c] != -1 and map_structure[r][c + 1] != -1:
-                    edges.append((map_structure[r][c], map_structure[r][c + 1]))
-            
-            # Vertical edges to next row
-            if r < rows - 1:
-                for c in range(min(cols, len(map_structure[r + 1]))):
-                    if c < len(map_structure[r]) and c < len(map_structure[r + 1]):
-                        if map_structure[r][c] != -1 and map_structure[r + 1][c] != -1:
-                            edges.append((map_structure[r][c], map_structure[r + 1][c]))
-        
-        return edges
-    
-    def run_solver(self, cells, dominos, edges, regions):
-        """Run Z3 solver"""
-        solver = Solver()
-        
-        D = len(dominos)
-        E = len(edges)
-        
-        # Variables
-        place = {}
-        for d in range(D):
-            for e in range(E):
-                for o in [0, 1]:
-                    place[(d, e, o)] = Bool(f"place_{d}_{e}_{o}")
-        
-        cell_val = [Int(f"v_{c}") for c in cells]
-        for c in cells:
-            solver.add(And(cell_val[c] >= 0, cell_val[c] <= 6))
-        
-        # Each domino placed exactly once
-        for d in range(D):
-            choices = [place[(d, e, o)] for e in range(E) for o in [0, 1]]
-            solver.add(AtLeast(*choices, 1))
-            solver.add(AtMost(*choices, 1))
-        
-        # Build touches
-        touches = {c: [] for c in cells}
-        for d, (a, b) in enumerate(dominos):
-            for e, (c1, c2) in enumerate(edges):
-                for o in [0, 1]:
-                    p = place[(d, e, o)]
-                    if o == 0:
-                        v1, v2 = a, b
-                    else:
-                        v1, v2 = b, a
-                    touches[c1].append((p, v1))
-                    touches[c2].append((p, v2))
-        
-        # Each cell touched exactly once
-        for c in cells:
-            bools = [p for (p, v) in touches[c]]
-            solver.add(AtLeast(*bools, 1))
-            solver.add(AtMost(*bools, 1))
-        
-        # Cell value implication
-        for c in cells:
-            constraints = []
-            for (p, v) in touches[c]:
-                constraints.append(Implies(p, cell_val[c] == v))
-            solver.add(And(*constraints))
-        
-        # Region constraints
-        for cells_R, op, target in regions:
-            vals = [cell_val[c] for c in cells_R]
-            
-            if op == "sum_eq":
-                solver.add(Sum(vals) == target)
-            elif op == "sum_lt":
-                solver.add(Sum(vals) < target)
-            elif op == "sum_gt":
-                solver.add(Sum(vals) > target)
-            elif op == "all_eq":
-                base = vals[0]
-                solver.add(And([v == base for v in vals]))
-            elif op == "all_diff":
-                solver.add(Distinct(vals))
-        
-        # Solve
-        if solver.check() == sat:
-            model = solver.model()
-            placements = []
-            for d in range(D):
-                for e in range(E):
-                    for o in [0, 1]:
-                        if model.evaluate(place[(d, e, o)], model_completion=True):
-                            placements.append((d, e, o))
-            return placements
-        else:
-            return None
+        return self.board.edges
     
-    def visualize_solution(self, placements, dominos, edges, node_pos):
-        """Visualize the solution using matplotlib"""
-        # Use actual grid dimensions (8x8 from pygame grid)
-        rows = GRID_ROWS
-        cols = GRID_COLS
-        
-        tiles = []
-        for dom_idx, edge_idx, flipped in placements:
-            a, b = dominos[dom_idx]
-            if flipped == 1:
-                a, b = b, a
-            
-            n1, n2 = edges[edge_idx]
-            # node_pos maps cell_num -> (row, col) from original pygame grid
-            c1 = node_pos[n1]
-            c2 = node_pos[n2]
-            
-            label = f"{a}-{b}"
-            tiles.append({
-                "cells": [c1, c2],
-                "value": label,
-            })
-        
-        # Plot
+    def run_solver(self, cells, dominos, edges, regions, backend="z3"):
+        """Run the headless solver"""
+        return pips_solver.run_solver(cells, dominos, edges, regions, backend=backend)
+    
+    def visualize_solution(self, placements, dominos, edges, node_pos, block=True):
+        """Visualize the solution using matplotlib (block=False returns at once)"""
+        load_pyplot()
+        import pips_render
         fig, ax = plt.subplots(figsize=(10, 10))
-        ax.set_xlim(0, cols)
-        ax.set_ylim(0, rows)
-        ax.set_aspect("equal")
-        ax.invert_yaxis()
-        
-        # Draw all grid cells (faded background)
-        for row in range(rows):
-            for col in range(cols):
-                rect = patches.Rectangle(
-                    (col, row), 1, 1,
-                    fill=False,
-                    linewidth=0.5,
-                    edgecolor=(0.8, 0.8, 0.8),
-                    linestyle=":"
-                )
-                ax.add_patch(rect)
-        
-        # Draw active cells
-        for cell in self.active_cells:
-            row, col = cell
-            rect = patches.Rectangle(
-                (col, row), 1, 1,
-                fill=True,
-                linewidth=1,
-                edgecolor=(0.5, 0.5, 0.5),
-                facecolor=(0.95, 0.95, 0.95),
-                alpha=0.5
-            )
-            ax.add_patch(rect)
-        
-        # Draw domino tiles
-        cmap = plt.cm.get_cmap("tab20")
-        for i, tile in enumerate(tiles):
-            cells = tile["cells"]
-            color = cmap(i % 20)
-            
-            # cells are (row, col) tuples
-            rows_ = [r for (r, c) in cells]
-            cols_ = [c for (r, c) in cells]
-            min_r, max_r = min(rows_), max(rows_)
-            min_c, max_c = min(cols_), max(cols_)
-            
-            # x is column, y is row
-            x, y = min_c, min_r
-            w = max_c - min_c + 1
-            h = max_r - min_r + 1
-            
-            rect = patches.Rectangle(
-                (x, y), w, h,
-                linewidth=3,
-                edgecolor="black",
-                facecolor=color,
-                alpha=0.8,
-            )
-            ax.add_patch(rect)
-            
-            value = tile.get("value", "")
-            cx = x + w / 2
-            cy = y + h / 2
-            ax.text(cx, cy, str(value), ha="center", va="center",
-                    fontsize=14, weight="bold")
+        # node_pos maps cell_num -> (row, col) from original pygame grid
+        pips_render.draw_solution(ax, node_pos, placements, dominos, edges)
         
         ax.set_xticks([])
         ax.set_yticks([])
-        plt.title("Domino Puzzle Solution", fontsize=16)
+        plt.title(pips_render.TITLE, fontsize=16)
         plt.tight_layout()
-        plt.show()
+        if block:
+            plt.show()
+        else:
+            plt.show(block=False)
+            plt.pause(0.001)
+    
+    def wake_for_solver(self):
+        """Wake an idle wait_events() from another thread (solver events, session builds)"""
+        try:
+            pygame.event.post(pygame.event.Event(self.solver_wakeup))
+        except pygame.error:  # the display is already shut down
+            pass
+    
+    def wait_events(self):
+        """Return pending pygame events, sleeping until one arrives when idle"""
+        if not self.event_driven:
+            return pygame.event.get()
+        # Keep ticking while a solve runs (spinner) or solution windows are open
+        timeout = 50 if self.background.busy or open_figures() else 0
+        first = pygame.event.wait(timeout)
+        events = [] if first.type == pygame.NOEVENT else [first]
+        events.extend(pygame.event.get())
+        return events
+    
+    def draw(self):
+        """Draw the whole window"""
+        self.screen.fill(WHITE)
+        self.draw_grid()
+        
+        # Draw mode buttons
+        for mode, button in self.mode_buttons.items():
+            button.active = (mode == self.mode)
+            button.draw(self.screen, self.font)
+        
+        self.clear_board_button.draw(self.screen, self.font)
+        
+        # Draw region buttons
+        if self.mode == "ADD_REGIONS":
+            for button in self.region_buttons.values():
+                button.draw(self.screen, self.font)
+        
+        # Draw mode-specific content
+        if self.mode == "ADD_DOMINOS":
+            self.draw_dominos_list()
+        elif self.mode == "ADD_REGIONS":
+            self.draw_regions_list()
+        
+        self.draw_input_fields()
+        self.draw_instructions()
+        self.draw_solver_status()
     
     def run(self):
         """Main game loop"""
         running = True
         
         while running:
-            self.screen.fill(WHITE)
-            
             # Handle events
-            for event in pygame.event.get():
+            for event in self.wait_events():
+                if event.type != pygame.MOUSEMOTION:
+                    self.dirty = True
                 if event.type == pygame.QUIT:
                     running = False
                 
+                elif event.type == pygame.MOUSEWHEEL:
+                    pos = pygame.mouse.get_pos()
+                    if self.view_rect.collidepoint(pos):
+                        self.zoom(1.25 ** event.y, pos)
+                
+                elif event.type == pygame.MOUSEBUTTONDOWN and event.button in (4, 5):
+                    pass  # wheel clicks are handled as MOUSEWHEEL
+                
+                elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 3:
+                    # Right-drag pans the board
+                    self.panning = self.view_rect.collidepoint(event.pos)
+                
+                elif event.type == pygame.MOUSEBUTTONUP and event.button == 3:
+                    self.panning = False
+                
+                elif event.type == pygame.MOUSEMOTION:
+                    if self.panning:
+                        self.scroll(-event.rel[0], -event.rel[1])
+                        self.dirty = True
+                
                 elif event.type == pygame.MOUSEBUTTONDOWN:
                     pos = pygame.mouse.get_pos()
                     
@@ -549,13 +761,20 @@ class DominoPuzzleBuilder:
                         if button.is_clicked(pos):
                             self.mode = mode
                     
+                    # Cancel a running solve
+                    if self.background.busy and self.cancel_solve_button.is_clicked(pos):
+                        self.background.cancel()
+                    
                     # Check clear button
                     if self.clear_board_button.is_clicked(pos):
-                        self.active_cells.clear()
-                        self.cell_map.clear()
+                        self.board.clear()
                         self.dominos.clear()
                         self.regions.clear()
                         self.current_region_cells.clear()
+                        self.region_color.clear()
+                        self.live_status = None
+                        self.live_pending = False
+                        self.session = None
                         self.mode = "SETUP_BOARD"
                     
                     # Handle grid clicks
@@ -594,6 +813,9 @@ class DominoPuzzleBuilder:
                         if self.clear_region_button.is_clicked(pos):
                             self.current_region_cells.clear()
                         
+                        if self.undo_region_button.is_clicked(pos):
+                            self.undo_region()
+                        
                         # Check target input field
                         if 820 <= pos[0] <= 920 and 360 <= pos[1] <= 390:
                             self.active_input = "target"
@@ -606,7 +828,12 @@ class DominoPuzzleBuilder:
                         pass
                 
                 elif event.type == pygame.KEYDOWN:
-                    if self.mode == "ADD_DOMINOS" and self.active_input:
+                    step = self.cell_size
+                    arrows = {pygame.K_LEFT: (-step, 0), pygame.K_RIGHT: (step, 0),
+                              pygame.K_UP: (0, -step), pygame.K_DOWN: (0, step)}
+                    if event.key in arrows:
+                        self.scroll(*arrows[event.key])
+                    elif self.mode == "ADD_DOMINOS" and self.active_input:
                         if event.key == pygame.K_BACKSPACE:
                             self.domino_input[self.active_input] = self.domino_input[self.active_input][:-1]
                         elif event.unicode.isdigit():
@@ -620,40 +847,42 @@ class DominoPuzzleBuilder:
             
             # Check if solve mode activated
             if self.mode == "SOLVE":
-                self.solve_puzzle()
+                self.start_solve()
                 self.mode = "ADD_REGIONS"  # Reset back
             
-            # Draw everything
-            self.draw_grid()
+            # Pick up finished solves and keep solution windows responsive
+            if self.poll_solver():
+                self.dirty = True
+            if self.live_check is not None and not self.live_check[0].is_alive():
+                self.finish_live_check()
+                self.dirty = True
+            if self.live_pending and not self.live_busy():
+                self.update_live_status()
+                self.dirty = True
+            for num in open_figures():
+                plt.figure(num).canvas.flush_events()
+            if self.background.busy:
+                self.dirty = True  # animate the spinner
             
-            # Draw mode buttons
-            for mode, button in self.mode_buttons.items():
-                button.active = (mode == self.mode)
-                button.draw(self.screen, self.font)
-            
-            self.clear_board_button.draw(self.screen, self.font)
-            
-            # Draw region buttons
-            if self.mode == "ADD_REGIONS":
-                for button in self.region_buttons.values():
-                    button.draw(self.screen, self.font)
-            
-            # Draw mode-specific content
-            if self.mode == "ADD_DOMINOS":
-                self.draw_dominos_list()
-            elif self.mode == "ADD_REGIONS":
-                self.draw_regions_list()
-            
-            self.draw_input_fields()
-            self.draw_instructions()
-            
-            pygame.display.flip()
-            self.clock.tick(60)
-        
+            # Draw everything, but only when something changed
+            if self.dirty or not self.event_driven:
+                self.draw()
+                pygame.display.flip()
+                self.dirty = False
+            if not self.event_driven:
+                self.clock.tick(60)
+        
+        self.background.shutdown()
         pygame.quit()
         sys.exit()
 
 
 if __name__ == "__main__":
-    app = DominoPuzzleBuilder()
+    import argparse
+    parser = argparse.ArgumentParser(description="Interactive Pips puzzle builder")
+    parser.add_argument("--rows", type=int, default=GRID_ROWS, help="board rows")
+    parser.add_argument("--cols", type=int, default=GRID_COLS, help="board columns")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    app = DominoPuzzleBuilder(rows=args.rows, cols=args.cols)
     app.run()
\ No newline at end of file
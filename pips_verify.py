@@ -0,0 +1,291 @@
+"""Vectorized checking of many solutions at once
+
+Before solutions are published they are checked against their puzzles.
+VerifyBatch packs a list of puzzles and their (d, e, o) placements into flat
+NumPy arrays, with per-puzzle offsets:
+
+- cell positions (row, col) from each map;
+- the edges of each solution as pairs of global cell indices;
+- the dominos of each puzzle and the placements of each solution;
+- region membership as (region, cell) pairs, plus an op code, a target
+  and a bitmask of allowed values per region.
+
+check() then runs every rule over the whole batch with array operations:
+placement indices in range, one placement per domino, every cell covered
+exactly once, both cells of an edge adjacent on the board, and every region
+op. Each puzzle gets a pass/fail verdict and the reason for its first failed
+rule. Python loops only run over the packing and over the failures.
+
+Usage:
+    python3 pips_verify.py puzzles.jsonl solutions.jsonl
+    python3 pips_verify.py corpus.pips
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+import pips
+import pips_archive
+import pips_solver
+
+OPS = ("sum_eq", "sum_lt", "sum_gt", "all_eq", "all_diff", "domain")
+_OP_CODE = {op: i for i, op in enumerate(OPS)}
+_PIPS = np.arange(7)
+
+
+def _offsets(sizes):
+    """Start of each block in a flat array, plus the total at the end"""
+    offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+    return offsets
+
+
+class VerifyBatch:
+    """Puzzles and their placements packed into flat arrays"""
+
+    def __init__(self, puzzles, solutions):
+        """puzzles are puzzle dicts; solutions are solve() results or placement lists
+
+        A solve() result's own "edges" are used when present, so the edge
+        numbering of stored solutions is checked rather than assumed.
+        """
+        if len(puzzles) != len(solutions):
+            raise ValueError(f"{len(puzzles)} puzzles but {len(solutions)} solutions")
+        self.ids = []
+        self.missing = []  # puzzles without placements
+        # Plain lists are filled first (with cell numbers local to each puzzle)
+        # and turned into arrays once, which is far cheaper than many small arrays
+        rows, cols, cell_counts = [], [], []
+        edge_cells, edge_counts = [], []
+        pip_values, dom_counts = [], []
+        place, place_counts = [], []
+        member_cell, member_counts, region_counts = [], [], []
+        region_op, region_target, region_allowed = [], [], []
+        for p, (data, solution) in enumerate(zip(puzzles, solutions)):
+            self.ids.append(data.get("id"))
+            map_structure = data["map"]
+            position = {}
+            for r, row in enumerate(map_structure):
+                for c, cell in enumerate(row):
+                    if cell >= 0:
+                        position[cell] = (r, c)
+            n = len(position)
+            if sorted(position) != list(range(n)):
+                raise ValueError(f"puzzle {p}: map cells must be numbered 0..N-1")
+            for cell in range(n):
+                r, c = position[cell]
+                rows.append(r)
+                cols.append(c)
+            cell_counts.append(n)
+
+            if isinstance(solution, dict):
+                edges = solution.get("edges")
+                placements = solution.get("placements")
+            else:
+                edges, placements = None, solution
+            if edges is None:
+                edges = pips_solver.list_edges_from_grid(map_structure)
+            for c1, c2 in edges:
+                edge_cells.extend((c1, c2))
+            edge_counts.append(len(edges))
+
+            dominos = data.get("dominos", [])
+            for a, b in dominos:
+                pip_values.extend((a, b))
+            dom_counts.append(len(dominos))
+
+            if placements is None:
+                self.missing.append(p)
+                placements = []
+            for d, e, o in placements:
+                place.extend((d, e, o))
+            place_counts.append(len(placements))
+
+            regions = data.get("regions", [])
+            for region in regions:
+                if isinstance(region, dict):
+                    cells_R, op, target = region["cells"], region["op"], region.get("target")
+                else:
+                    cells_R, op, target = region
+                member_cell.extend(cells_R)
+                member_counts.append(len(cells_R))
+                region_op.append(_OP_CODE[op])
+                if op == "domain":
+                    region_target.append(0)
+                    region_allowed.append(sum(1 << v for v in target))
+                else:
+                    region_target.append(0 if target is None else int(target))
+                    region_allowed.append(0x7F)
+            region_counts.append(len(regions))
+
+        def array(values, columns=1):
+            return np.array(values, dtype=np.int64).reshape(-1, columns)
+
+        self.size = len(puzzles)
+        self.cell_offsets = _offsets(cell_counts)
+        self.edge_offsets = _offsets(edge_counts)
+        self.domino_offsets = _offsets(dom_counts)
+        self.place_offsets = _offsets(place_counts)
+        self.region_offsets = _offsets(region_counts)
+        self.rows, self.cols = array(rows)[:, 0], array(cols)[:, 0]
+        # Edges and region members refer to global cell indices
+        edge_cells = array(edge_cells, 2) + self.cell_offsets[self._owner(self.edge_offsets)][:, None]
+        self.edge_c1, self.edge_c2 = edge_cells.T
+        self.dom_a, self.dom_b = array(pip_values, 2).T
+        self.place_d, self.place_e, self.place_o = array(place, 3).T
+        self.member_region = np.repeat(np.arange(len(member_counts)), member_counts)
+        region_owner = self._owner(self.region_offsets)
+        self.member_cell = array(member_cell)[:, 0] + \
+            self.cell_offsets[region_owner[self.member_region]]
+        self.region_op = np.array(region_op, dtype=np.int64)
+        self.region_target = np.array(region_target, dtype=np.int64)
+        self.region_allowed = np.array(region_allowed, dtype=np.int64)
+
+    def _owner(self, offsets):
+        """Puzzle index of each element of a flat array with these offsets"""
+        return np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+
+    def check(self):
+        """Return one {"id", "ok", "reason"} dict per puzzle"""
+        reasons = [None] * self.size
+        for p in self.missing:
+            reasons[p] = "no placements"
+
+        def fail(bad, owner, describe):
+            """Record describe(i) for the first bad element of each puzzle still passing"""
+            for i in np.flatnonzero(bad):
+                p = owner[i]
+                if reasons[p] is None:
+                    reasons[p] = describe(i)
+
+        cells = len(self.rows)
+        cell_owner = self._owner(self.cell_offsets)
+        place_owner = self._owner(self.place_offsets)
+        edge_owner = self._owner(self.edge_offsets)
+        domino_owner = self._owner(self.domino_offsets)
+        region_owner = self._owner(self.region_offsets)
+
+        # Edges join two cells of their own puzzle that touch on the board
+        lo, hi = self.cell_offsets[edge_owner], self.cell_offsets[edge_owner + 1]
+        in_range = (self.edge_c1 >= lo) & (self.edge_c1 < hi) & \
+            (self.edge_c2 >= lo) & (self.edge_c2 < hi)
+        fail(~in_range, edge_owner, lambda i: f"edge {i - self.edge_offsets[edge_owner[i]]} "
+                                              f"names a cell that is not on the board")
+        c1 = np.where(in_range, self.edge_c1, 0)
+        c2 = np.where(in_range, self.edge_c2, 0)
+        if cells:
+            distance = np.abs(self.rows[c1] - self.rows[c2]) + np.abs(self.cols[c1] - self.cols[c2])
+            fail(in_range & (distance != 1), edge_owner,
+                 lambda i: f"edge {i - self.edge_offsets[edge_owner[i]]} joins cells "
+                           f"{c1[i] - lo[i]} and {c2[i] - lo[i]}, which are not adjacent")
+
+        # Placement indices in range for their puzzle
+        d, e, o = self.place_d, self.place_e, self.place_o
+        dominos = np.diff(self.domino_offsets)[place_owner]
+        edges = np.diff(self.edge_offsets)[place_owner]
+        valid = (d >= 0) & (d < dominos) & (e >= 0) & (e < edges) & ((o == 0) | (o == 1))
+        fail(~valid, place_owner, lambda i: f"placement {[int(d[i]), int(e[i]), int(o[i])]} "
+                                            f"is out of range")
+        gd = np.where(valid, d + self.domino_offsets[place_owner], 0)
+        ge = np.where(valid, e + self.edge_offsets[place_owner], 0)
+
+        # Every domino placed exactly once
+        used = np.bincount(gd[valid], minlength=len(self.dom_a))
+        fail(used != 1, domino_owner,
+             lambda i: f"domino {i - self.domino_offsets[domino_owner[i]]} is placed "
+                       f"{used[i]} times")
+
+        # Every cell covered exactly once
+        first, second = self.edge_c1[ge], self.edge_c2[ge]
+        covered = np.bincount(np.concatenate([first[valid], second[valid]]), minlength=cells)
+        fail(covered != 1, cell_owner,
+             lambda i: f"cell {i - self.cell_offsets[cell_owner[i]]} is covered "
+                       f"{covered[i]} times")
+
+        # Cell values, then a region x value count table answers every op
+        flip = o == 1
+        value = np.full(cells, -1, dtype=np.int64)
+        value[first[valid]] = np.where(flip, self.dom_b[gd], self.dom_a[gd])[valid]
+        value[second[valid]] = np.where(flip, self.dom_a[gd], self.dom_b[gd])[valid]
+        regions = len(self.region_op)
+        if regions:
+            shown = value[self.member_cell]
+            counted = shown >= 0
+            table = np.bincount(self.member_region[counted] * 7 + shown[counted],
+                                minlength=regions * 7).reshape(regions, 7)
+            total = table @ _PIPS
+            op, target = self.region_op, self.region_target
+            ok = np.select(
+                [op == 0, op == 1, op == 2, op == 3, op == 4],
+                [total == target, total < target, total > target,
+                 (table > 0).sum(axis=1) <= 1, table.max(axis=1) <= 1],
+                default=(table * (((self.region_allowed[:, None] >> _PIPS) & 1) == 0)).sum(axis=1) == 0)
+            fail(~ok, region_owner, lambda i: self._region_reason(i, region_owner, table[i]))
+
+        return [{"id": self.ids[p], "ok": reasons[p] is None, "reason": reasons[p]}
+                for p in range(self.size)]
+
+    def _region_reason(self, i, region_owner, counts):
+        p = region_owner[i]
+        op = OPS[self.region_op[i]]
+        cells = self.member_cell[self.member_region == i] - self.cell_offsets[p]
+        number = i - self.region_offsets[p]
+        values = ", ".join(f"{v}x{counts[v]}" for v in range(7) if counts[v])
+        if op in ("sum_eq", "sum_lt", "sum_gt"):
+            return (f"region {number} {cells.tolist()} {op} {self.region_target[i]} "
+                    f"adds up to {int(counts @ _PIPS)}")
+        return f"region {number} {cells.tolist()} {op} is broken by pips {values}"
+
+
+def verify_batch(puzzles, solutions):
+    """Check each solution against its puzzle; one {"id", "ok", "reason"} per puzzle"""
+    return VerifyBatch(puzzles, solutions).check()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="pips_verify",
+                                     description="Check stored solutions against their puzzles")
+    parser.add_argument("puzzles", help="puzzle JSONL file, or an archive with stored solutions")
+    parser.add_argument("solutions", nargs="?",
+                        help="solve results (JSONL), matched by id or by position")
+    parser.add_argument("--batch", type=int, default=100000, help="puzzles checked per batch")
+    args = parser.parse_args(argv)
+
+    if args.solutions is None:
+        if not pips_archive.is_archive(args.puzzles):
+            parser.error("solutions are required unless puzzles is an archive")
+        batches = pips_archive.Archive(args.puzzles).batches(args.batch)
+    else:
+        puzzles = list(pips.iter_inputs([args.puzzles]))
+        with open(args.solutions) as f:
+            solutions = list(pips.read_puzzles(f))
+        by_id = {s.get("id"): s for s in solutions if s.get("id") is not None}
+        if len(by_id) == len(solutions) and all(p.get("id") in by_id for p in puzzles):
+            solutions = [by_id[p.get("id")] for p in puzzles]
+        batches = ((puzzles[i:i + args.batch], solutions[i:i + args.batch])
+                   for i in range(0, len(puzzles), args.batch))
+
+    start = time.perf_counter()
+    checked = failed = unsolved = 0
+    for puzzles, solutions in batches:
+        if args.solutions is None:
+            # Only the archive records that carry a solution are checked
+            kept = [i for i, solution in enumerate(solutions) if solution is not None]
+            unsolved += len(puzzles) - len(kept)
+            puzzles, solutions = [puzzles[i] for i in kept], [solutions[i] for i in kept]
+        for n, verdict in enumerate(verify_batch(puzzles, solutions), checked):
+            if not verdict["ok"]:
+                failed += 1
+                name = verdict["id"] if verdict["id"] is not None else f"puzzle {n}"
+                sys.stdout.write(f"{name}: {verdict['reason']}\n")
+        checked += len(puzzles)
+    elapsed = time.perf_counter() - start
+    skipped = f", {unsolved} puzzles without a stored solution skipped" if unsolved else ""
+    sys.stderr.write(f"checked {checked} solutions in {elapsed:.2f}s, {failed} failed{skipped}\n")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
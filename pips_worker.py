@@ -0,0 +1,140 @@
+"""Background solving for interactive front ends
+
+BackgroundSolver runs one puzzle at a time in a child process, so the
+caller's loop never blocks and a solve can be cancelled by terminating the
+child, whichever backend is running. Further puzzles submitted while a
+solve is in progress wait in a queue. Progress comes back as event dicts on
+a queue.Queue that the caller drains whenever it likes; a notify callback,
+called from the worker thread after each event, lets a loop that sleeps
+on something else (such as pygame.event.wait) wake up for them:
+
+    {"type": "started", "job": 3, "tag": ...}
+    {"type": "done", "job": 3, "tag": ..., "placements": [...], "time": 1.2}
+    {"type": "cancelled", "job": 3, "tag": ...}
+    {"type": "error", "job": 3, "tag": ..., "error": "..."}
+"""
+import itertools
+import multiprocessing
+import queue
+import threading
+import time
+
+import pips_solver
+
+
+def _solve_in_child(conn, problem, options):
+    try:
+        conn.send(("done", pips_solver.run_solver(*problem, **options)))
+    except Exception as exc:
+        conn.send(("error", f"{type(exc).__name__}: {exc}"))
+    finally:
+        conn.close()
+
+
+class BackgroundSolver:
+    """Queue of puzzles solved one by one in cancellable child processes"""
+
+    def __init__(self, events=None, poll_interval=0.05, notify=None):
+        self.events = events if events is not None else queue.Queue()
+        self.notify = notify
+        self.poll_interval = poll_interval
+        self.ctx = multiprocessing.get_context("spawn")
+        self.jobs = queue.Queue()
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.queued = []  # job ids waiting to start
+        self.current = None  # (job id, start time) of the running solve
+        self.cancelled = set()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    @property
+    def busy(self):
+        with self.lock:
+            return self.current is not None or bool(self.queued)
+
+    def status(self):
+        """Return (running job id or None, seconds running, number queued)"""
+        with self.lock:
+            if self.current is None:
+                return None, 0.0, len(self.queued)
+            job, start = self.current
+            return job, time.perf_counter() - start, len(self.queued)
+
+    def submit(self, problem, tag=None, **options):
+        """Queue (cells, dominos, edges, regions) for solving; returns the job id"""
+        job = next(self.ids)
+        with self.lock:
+            self.queued.append(job)
+        self.jobs.put((job, problem, tag, options))
+        return job
+
+    def cancel(self, job=None):
+        """Cancel a queued job, or the running one if job is None"""
+        with self.lock:
+            if job is None:
+                if self.current is None:
+                    return
+                job = self.current[0]
+            self.cancelled.add(job)
+
+    def shutdown(self):
+        self.cancel()
+        with self.lock:
+            self.cancelled.update(self.queued)
+        self.jobs.put(None)
+
+    def _post(self, kind, job, tag, **fields):
+        self.events.put(dict(type=kind, job=job, tag=tag, **fields))
+        if self.notify is not None:
+            self.notify()
+
+    def _run(self):
+        while True:
+            item = self.jobs.get()
+            if item is None:
+                return
+            job, problem, tag, options = item
+            with self.lock:
+                self.queued.remove(job)
+                if job in self.cancelled:
+                    self._post("cancelled", job, tag)
+                    continue
+                start = time.perf_counter()
+                self.current = (job, start)
+            self._post("started", job, tag)
+            try:
+                self._solve(job, problem, tag, options, start)
+            finally:
+                with self.lock:
+                    self.current = None
+                    self.cancelled.discard(job)
+
+    def _solve(self, job, problem, tag, options, start):
+        parent, child = self.ctx.Pipe(duplex=False)
+        process = self.ctx.Process(target=_solve_in_child, args=(child, problem, options),
+                                   daemon=True)
+        process.start()
+        child.close()
+        try:
+            while not parent.poll(self.poll_interval):
+                with self.lock:
+                    stop = job in self.cancelled
+                if stop:
+                    process.terminate()
+                    self._post("cancelled", job, tag)
+                    return
+                if not process.is_alive() and not parent.poll():
+                    self._post("error", job, tag, error="solver process died")
+                    return
+            kind, payload = parent.recv()
+            if kind == "done":
+                self._post("done", job, tag, placements=payload,
+                           time=time.perf_counter() - start)
+            else:
+                self._post("error", job, tag, error=payload)
+        except EOFError:
+            self._post("error", job, tag, error="solver process died")
+        finally:
+            parent.close()
+            process.join(timeout=1)
@@ -0,0 +1,522 @@
+"""Z3 backend for the Pips solver
+
+Two encodings are available:
+
+- "full": the notebook encoding, one place_{d}_{e}_{o} Bool for every
+  domino x edge x orientation.
+- "compact": doubles get a single orientation, placements that break a
+  single-cell region are never created, and interchangeable copies of the
+  same tile are collapsed. With symmetry="counts" each distinct tile gets one
+  set of placement variables and a multiplicity count; with symmetry="lex"
+  every copy keeps its own variables and consecutive copies must occupy
+  lexicographically increasing placement slots.
+- "boolean": the compact encoding with one-hot Bool cell values instead of
+  Ints. Region sums become pseudo-Boolean constraints, all_eq/all_diff
+  become clauses and cardinality constraints, so the problem stays in
+  QF_FD and can run on Z3's SAT/PB engine (e.g. logic="QF_FD" or
+  tactic="qffd") instead of the arithmetic solver.
+
+The solver itself is configurable: tactic names a Z3 tactic (a
+comma-separated list is chained with Then), logic picks a solver with
+SolverFor, and params is a dict of solver parameters, so different
+combinations can be measured against each other (see pips_bench).
+"""
+import time
+
+from z3 import *
+
+from pips_feasibility import pip_counts, unary_domains
+from pips_metrics import NULL
+
+ENCODINGS = ("full", "compact", "boolean")
+SYMMETRIES = ("counts", "lex")
+
+
+def check_deadline(deadline):
+    """Raise pips_solver.SolveUnknown("timeout") once a perf_counter() deadline has passed
+
+    Encoding a large board takes seconds, so the encoders call this between
+    cells and tiles to keep a time budget.
+    """
+    if deadline is not None and time.perf_counter() > deadline:
+        from pips_solver import SolveUnknown
+        raise SolveUnknown("timeout")
+
+
+def domino_types(dominos):
+    """Group identical dominos: returns a list of ((a, b), [d, ...])"""
+    types = {}
+    for d, (a, b) in enumerate(dominos):
+        key = (min(a, b), max(a, b))
+        if key not in types:
+            types[key] = ((a, b), [])
+        types[key][1].append(d)
+    return list(types.values())
+
+
+def region_constraint(cell_val, region):
+    """Z3 formula for one (cells, op, target) region"""
+    cells_R, op, target = region
+    vals = [cell_val[c] for c in cells_R]
+
+    if op == "sum_eq":
+        return Sum(vals) == target
+    elif op == "sum_lt":
+        return Sum(vals) < target
+    elif op == "sum_gt":
+        return Sum(vals) > target
+    elif op == "all_eq":
+        base = vals[0]
+        return And([v == base for v in vals])
+    elif op == "all_diff":
+        return Distinct(vals)
+    elif op == "domain":
+        return And([Or([v == x for x in target]) for v in vals])
+    raise ValueError(f"unknown region op {op!r}")
+
+
+def pb_region_constraint(cell_bits, region):
+    """Pseudo-Boolean formula for one region over one-hot cell values
+
+    cell_bits[c] maps each value still allowed in cell c to its Bool.
+    """
+    cells_R, op, target = region
+
+    def bit(c, v):
+        return cell_bits[c].get(v, BoolVal(False))
+
+    if op in ("sum_eq", "sum_lt", "sum_gt"):
+        terms = [(x, v) for c in cells_R for v, x in cell_bits[c].items() if v > 0]
+        low, high = {"sum_eq": (target, target), "sum_lt": (None, target - 1),
+                     "sum_gt": (target + 1, None)}[op]
+        if high is not None and high < 0:
+            return BoolVal(False)
+        if not terms:
+            return BoolVal((low is None or low <= 0) and (high is None or high >= 0))
+        if low == high:
+            return PbEq(terms, low)
+        return PbLe(terms, high) if low is None else PbGe(terms, low)
+    elif op == "all_eq":
+        values = set().union(*(cell_bits[c] for c in cells_R))
+        return And([bit(cells_R[0], v) == bit(c, v) for v in sorted(values) for c in cells_R[1:]])
+    elif op == "all_diff":
+        values = set().union(*(cell_bits[c] for c in cells_R))
+        constraints = []
+        for v in sorted(values):
+            bits = [cell_bits[c][v] for c in cells_R if v in cell_bits[c]]
+            if len(bits) > 1:
+                constraints.append(PbLe([(x, 1) for x in bits], 1))
+        return And(constraints)
+    elif op == "domain":
+        return And([Not(x) for c in cells_R for v, x in cell_bits[c].items() if v not in target])
+    raise ValueError(f"unknown region op {op!r}")
+
+
+def add_pip_counts(enc, dominos):
+    """Global cardinality constraints: exactly as many cells show each value
+    as the dominos carry, and all cells together show the total pip budget
+
+    These are implied by the placements, but stating them lets Z3 count
+    values across the whole board instead of rediscovering it placement by
+    placement. Returns False if some value can no longer be shown often
+    enough.
+    """
+    if not enc.cell_val:
+        return True
+    counts = pip_counts(dominos)
+    for v, count in enumerate(counts):
+        if isinstance(enc.cell_val[0], dict):
+            shows = [bits[v] for bits in enc.cell_val if v in bits]
+        else:
+            shows = [val == v for val in enc.cell_val]
+        if len(shows) < count:
+            return False
+        if shows:
+            enc.solver.add(PbEq([(x, 1) for x in shows], count))
+    if not isinstance(enc.cell_val[0], dict):
+        enc.solver.add(Sum(enc.cell_val) == sum(v * count for v, count in enumerate(counts)))
+    return True
+
+
+def make_solver(tactic=None, logic=None, params=None):
+    """Create the Z3 solver an encoding is loaded into
+
+    tactic is a tactic name or a comma-separated chain ("simplify,qffd"),
+    logic a logic name for SolverFor ("QF_FD"); with neither the default
+    Solver() is used. params is a dict of solver parameters.
+    """
+    if tactic and logic:
+        raise ValueError("choose either a tactic or a logic, not both")
+    if tactic:
+        names = [name.strip() for name in tactic.split(",")]
+        tactics = [Tactic(name) for name in names]
+        solver = (tactics[0] if len(tactics) == 1 else Then(*tactics)).solver()
+    elif logic:
+        solver = SolverFor(logic)
+    else:
+        solver = Solver()
+    for key, value in (params or {}).items():
+        solver.set(key, value)
+    return solver
+
+
+def add_region_constraints(solver, cell_val, regions):
+    """Add the region rules over the cell value variables"""
+    for region in regions:
+        solver.add(region_constraint(cell_val, region))
+
+
+class Encoding:
+    """A Z3 solver loaded with a puzzle plus the variables needed to read it back"""
+
+    def __init__(self, solver, place, cell_val, decode, literal, region=None):
+        self.solver = solver
+        self.place = place
+        self.cell_val = cell_val  # Ints, or {value: Bool} per cell for the boolean encoding
+        self._decode = decode
+        self._literal = literal
+        self._region = region or (lambda r: region_constraint(cell_val, r))
+
+    def decode(self, model):
+        """Turn a model into a sorted list of (d, e, o) placements"""
+        return self._decode(model)
+
+    def literal(self, d, e, o):
+        """Boolean that holds when domino d sits on edge e with orientation o"""
+        return self._literal(d, e, o)
+
+    def region(self, region):
+        """Formula for a region over this encoding's cell values"""
+        return self._region(region)
+
+
+def encode_full(cells, dominos, edges, regions, metrics=NULL, solver=None, deadline=None):
+    """The original encoding: every domino x edge x orientation"""
+    solver = solver if solver is not None else Solver()
+
+    D = len(dominos)
+    E = len(edges)
+
+    # Variables
+    with metrics.phase("encode.variables"):
+        place = {}
+        for d in range(D):
+            check_deadline(deadline)
+            for e in range(E):
+                for o in [0, 1]:
+                    place[(d, e, o)] = Bool(f"place_{d}_{e}_{o}")
+
+        cell_val = [Int(f"v_{c}") for c in cells]
+        for c in cells:
+            solver.add(And(cell_val[c] >= 0, cell_val[c] <= 6))
+
+        # Each domino placed exactly once
+        for d in range(D):
+            check_deadline(deadline)
+            choices = [place[(d, e, o)] for e in range(E) for o in [0, 1]]
+            solver.add(AtLeast(*choices, 1))
+            solver.add(AtMost(*choices, 1))
+
+    # Build touches
+    with metrics.phase("encode.touches"):
+        touches = {c: [] for c in cells}
+        for d, (a, b) in enumerate(dominos):
+            check_deadline(deadline)
+            for e, (c1, c2) in enumerate(edges):
+                for o in [0, 1]:
+                    p = place[(d, e, o)]
+                    if o == 0:
+                        v1, v2 = a, b
+                    else:
+                        v1, v2 = b, a
+                    touches[c1].append((p, v1))
+                    touches[c2].append((p, v2))
+
+    with metrics.phase("encode.constraints"):
+        # Each cell touched exactly once
+        for c in cells:
+            check_deadline(deadline)
+            bools = [p for (p, v) in touches[c]]
+            solver.add(AtLeast(*bools, 1))
+            solver.add(AtMost(*bools, 1))
+
+        # Cell value implication
+        for c in cells:
+            check_deadline(deadline)
+            constraints = []
+            for (p, v) in touches[c]:
+                constraints.append(Implies(p, cell_val[c] == v))
+            solver.add(And(*constraints))
+
+        check_deadline(deadline)
+        add_region_constraints(solver, cell_val, regions)
+
+    def decode(model):
+        placements = []
+        for d in range(D):
+            for e in range(E):
+                for o in [0, 1]:
+                    if model.evaluate(place[(d, e, o)], model_completion=True):
+                        placements.append((d, e, o))
+        return placements
+
+    return Encoding(solver, place, cell_val, decode, lambda d, e, o: place[(d, e, o)])
+
+
+def encode_compact(cells, dominos, edges, regions, symmetry="counts", metrics=NULL,
+                   solver=None, boolean=False, deadline=None):
+    """Pruned encoding with identical-tile symmetry removed
+
+    With boolean=True cell values are one-hot Bools and every constraint is
+    a clause or a pseudo-Boolean constraint (the "boolean" encoding).
+    Returns None when some cell has no placement left after pruning, which
+    means the puzzle has no solution.
+    """
+    if symmetry not in SYMMETRIES:
+        raise ValueError(f"unknown symmetry {symmetry!r}, expected one of {SYMMETRIES}")
+    solver = solver if solver is not None else Solver()
+    with metrics.phase("encode.variables"):
+        domains = unary_domains(cells, regions)
+        types = domino_types(dominos)
+
+        if boolean:
+            cell_val = [{v: Bool(f"v_{c}_{v}") for v in sorted(domains[c])} for c in cells]
+            for c in cells:
+                if not cell_val[c]:
+                    return None
+                solver.add(PbEq([(x, 1) for x in cell_val[c].values()], 1))
+        else:
+            cell_val = [Int(f"v_{c}") for c in cells]
+            for c in cells:
+                solver.add(Or([cell_val[c] == v for v in sorted(domains[c])]))
+
+        # Candidate slots (e, o) for each tile type, relative to its first copy
+        slots = []
+        for (a, b), _ in types:
+            candidates = []
+            for e, (c1, c2) in enumerate(edges):
+                for o in [0, 1]:
+                    if o == 1 and a == b:
+                        continue
+                    v1, v2 = (a, b) if o == 0 else (b, a)
+                    if v1 in domains[c1] and v2 in domains[c2]:
+                        candidates.append((e, o))
+            slots.append(candidates)
+
+        # Variables: one copy per tile type (counts) or per domino (lex)
+        place = {}
+        owners = []  # (key, t, e, o) for every placement variable
+        prefix = "tile" if symmetry == "counts" else "place"
+        for t, ((a, b), copies) in enumerate(types):
+            check_deadline(deadline)
+            group = [t] if symmetry == "counts" else copies
+            for k in group:
+                for e, o in slots[t]:
+                    place[(k, e, o)] = Bool(f"{prefix}_{k}_{e}_{o}")
+                    owners.append(((k, e, o), t, e, o))
+
+        # Each tile placed as many times as it appears
+        for t, ((a, b), copies) in enumerate(types):
+            check_deadline(deadline)
+            if symmetry == "counts":
+                choices = [place[(t, e, o)] for e, o in slots[t]]
+                if len(choices) < len(copies):
+                    return None
+                solver.add(PbEq([(p, 1) for p in choices], len(copies)))
+            else:
+                for d in copies:
+                    choices = [place[(d, e, o)] for e, o in slots[t]]
+                    if not choices:
+                        return None
+                    solver.add(PbEq([(p, 1) for p in choices], 1))
+                # Lexicographic symmetry breaking: copy k sits on an earlier slot than copy k+1
+                if boolean:
+                    for d1, d2 in zip(copies, copies[1:]):
+                        for i, (e, o) in enumerate(slots[t]):
+                            earlier = [place[(d1, e1, o1)] for e1, o1 in slots[t][:i]]
+                            solver.add(Implies(place[(d2, e, o)], Or(earlier)))
+                    continue
+                slot_index = {}
+                for d in copies:
+                    slot_index[d] = Int(f"slot_{d}")
+                    for i, (e, o) in enumerate(slots[t]):
+                        solver.add(Implies(place[(d, e, o)], slot_index[d] == i))
+                for d1, d2 in zip(copies, copies[1:]):
+                    solver.add(slot_index[d1] < slot_index[d2])
+
+    # Each cell touched exactly once, and linked to its value
+    with metrics.phase("encode.touches"):
+        touches = {c: [] for c in cells}
+        for key, t, e, o in owners:
+            a, b = types[t][0]
+            v1, v2 = (a, b) if o == 0 else (b, a)
+            c1, c2 = edges[e]
+            touches[c1].append((place[key], v1))
+            touches[c2].append((place[key], v2))
+
+    with metrics.phase("encode.constraints"):
+        for c in cells:
+            check_deadline(deadline)
+            if not touches[c]:
+                return None
+            solver.add(PbEq([(p, 1) for p, v in touches[c]], 1))
+            if boolean:
+                solver.add(And([Implies(p, cell_val[c][v]) for p, v in touches[c]]))
+            else:
+                solver.add(And([Implies(p, cell_val[c] == v) for p, v in touches[c]]))
+
+        if boolean:
+            for region in regions:
+                check_deadline(deadline)
+                solver.add(pb_region_constraint(cell_val, region))
+        else:
+            check_deadline(deadline)
+            add_region_constraints(solver, cell_val, regions)
+
+    def decode(model):
+        placements = []
+        for t, ((a, b), copies) in enumerate(types):
+            group = [t] if symmetry == "counts" else copies
+            chosen = [(e, o) for k in group for e, o in slots[t]
+                      if is_true(model.evaluate(place[(k, e, o)], model_completion=True))]
+            for d, (e, o) in zip(copies, sorted(chosen)):
+                # Slots are oriented like the first copy; flip for reversed copies
+                if tuple(dominos[d]) != (a, b):
+                    o = 1 - o
+                placements.append((d, e, o))
+        return sorted(placements)
+
+    type_of = {d: t for t, (_, copies) in enumerate(types) for d in copies}
+
+    def literal(d, e, o):
+        t = type_of[d]
+        a, b = types[t][0]
+        if tuple(dominos[d]) != (a, b):
+            o = 1 - o
+        if a == b:
+            o = 0
+        group = [t] if symmetry == "counts" else types[t][1]
+        lits = [place[(k, e, o)] for k in group if (k, e, o) in place]
+        return Or(lits) if lits else BoolVal(False)
+
+    if boolean:
+        return Encoding(solver, place, cell_val, decode, literal,
+                        region=lambda r: pb_region_constraint(cell_val, r))
+    return Encoding(solver, place, cell_val, decode, literal)
+
+
+def encode(cells, dominos, edges, regions, encoding="full", symmetry="counts", metrics=NULL,
+           tactic=None, logic=None, params=None, cardinality=True, deadline=None):
+    """Build the solver for the chosen encoding (None if trivially unsat)
+
+    With cardinality=True the global pip-count constraints of
+    add_pip_counts() are added on top of the encoding. Past deadline (a
+    time.perf_counter() value) encoding stops with SolveUnknown("timeout").
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError(f"unknown encoding {encoding!r}, expected one of {ENCODINGS}")
+    solver = make_solver(tactic=tactic, logic=logic, params=params)
+    if encoding == "full":
+        enc = encode_full(cells, dominos, edges, regions, metrics=metrics, solver=solver,
+                          deadline=deadline)
+    else:
+        enc = encode_compact(cells, dominos, edges, regions, symmetry=symmetry, metrics=metrics,
+                             solver=solver, boolean=encoding == "boolean", deadline=deadline)
+    if enc is not None and cardinality:
+        check_deadline(deadline)
+        with metrics.phase("encode.cardinality"):
+            if not add_pip_counts(enc, dominos):
+                return None
+    return enc
+
+
+def encoding_size(enc):
+    """Return (distinct variables, top-level assertions) of an encoding"""
+    assertions = enc.solver.assertions()
+    seen = set()
+    variables = set()
+    todo = list(assertions)
+    while todo:
+        expr = todo.pop()
+        if expr.get_id() in seen:
+            continue
+        seen.add(expr.get_id())
+        if is_const(expr) and expr.decl().kind() == Z3_OP_UNINTERPRETED:
+            variables.add(expr.get_id())
+        todo.extend(expr.children())
+    return len(variables), len(assertions)
+
+
+def run_solver(cells, dominos, edges, regions, encoding="full", symmetry="counts",
+               metrics=NULL, tactic=None, logic=None, params=None, cardinality=True,
+               timeout=None, memory=None):
+    """Run Z3 solver
+
+    timeout (seconds, counted from the start of encoding) and memory
+    (megabytes) become the solver's timeout and max_memory; running out,
+    during encoding or solving, raises pips_solver.SolveUnknown.
+    """
+    from pips_solver import SolveUnknown
+    deadline = None if timeout is None else time.perf_counter() + timeout
+    if memory is not None:
+        params = dict(params or {}, max_memory=int(memory))
+    with metrics.phase("encode"):
+        enc = encode(cells, dominos, edges, regions, encoding=encoding, symmetry=symmetry,
+                     metrics=metrics, tactic=tactic, logic=logic, params=params,
+                     cardinality=cardinality, deadline=deadline)
+    if enc is None:
+        return None
+    if metrics.enabled:
+        metrics.count("placement_vars", len(enc.place))
+        metrics.count("assertions", len(enc.solver.assertions()))
+    if deadline is not None:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            raise SolveUnknown("timeout")
+        enc.solver.set("timeout", max(1, int(remaining * 1000)))
+
+    # Solve
+    with metrics.phase("check"):
+        result = enc.solver.check()
+    metrics.add_z3_stats(enc.solver)
+    if result == sat:
+        with metrics.phase("decode"):
+            return enc.decode(enc.solver.model())
+    if result == unknown:
+        reason = enc.solver.reason_unknown()
+        raise SolveUnknown("memory" if "memory" in reason else "timeout")
+    return None
+
+
+def iter_solutions(cells, dominos, edges, regions, encoding="compact", symmetry="counts",
+                   tactic=None, logic=None, params=None, cardinality=True):
+    """Yield every solution, treating swaps of identical dominos as the same
+
+    One compact (or boolean) encoding is reused throughout: after each model
+    a clause blocking exactly that tile layout is added and the same solver
+    is asked again, so learned clauses carry over between solutions. The
+    full encoding tells identical copies apart, so "full" falls back to
+    "compact". A check that ends unknown (a timeout or max_memory param ran
+    out) raises pips_solver.SolveUnknown instead of ending the sequence.
+    """
+    if encoding == "full":
+        encoding = "compact"
+    enc = encode(cells, dominos, edges, regions, encoding=encoding, symmetry=symmetry,
+                 tactic=tactic, logic=logic, params=params, cardinality=cardinality)
+    if enc is None:
+        return
+    solver = enc.solver
+    while True:
+        result = solver.check()
+        if result == unsat:
+            return
+        if result == unknown:
+            # A timeout/max_memory param ran out: the count so far is not complete
+            from pips_solver import SolveUnknown
+            reason = solver.reason_unknown()
+            raise SolveUnknown("memory" if "memory" in reason else "timeout")
+        model = solver.model()
+        placements = enc.decode(model)
+        yield placements
+        # Block this layout; the literals are shared by identical copies
+        solver.add(Or([Not(enc.literal(d, e, o)) for d, e, o in placements]))
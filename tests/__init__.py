@@ -0,0 +1,29 @@
+"""Shared puzzles for the test suite"""
+import json
+import os
+
+import pips_solver
+
+EXAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "examples")
+
+
+def load_example(name):
+    with open(os.path.join(EXAMPLES, name)) as f:
+        return json.load(f)
+
+
+def load_corpus(max_cells=None):
+    """Puzzles of the bench corpus (without its header line)"""
+    puzzles = []
+    with open(os.path.join(EXAMPLES, "bench_corpus.jsonl")) as f:
+        for line in f:
+            data = json.loads(line)
+            if "map" in data and (max_cells is None or data["tags"]["cells"] <= max_cells):
+                puzzles.append(data)
+    return puzzles
+
+
+def problem(data):
+    """(cells, dominos, edges, regions) of a puzzle dict"""
+    puzzle = pips_solver.normalize_puzzle(data)
+    return puzzle["cells"], puzzle["dominos"], puzzle["edges"], puzzle["regions"]
@@ -0,0 +1,56 @@
+import json
+
+import pips_archive
+import pips_solver
+import pips_verify
+
+from tests import EXAMPLES, load_corpus, load_example
+
+SMALL = load_corpus(max_cells=16)
+
+
+def test_round_trip_keeps_puzzles_and_solutions(tmp_path):
+    path = str(tmp_path / "small.pips")
+    results = [pips_solver.solve(data, backend="dlx") for data in SMALL]
+    assert pips_archive.write_archive(path, SMALL, results) == len(SMALL)
+
+    with pips_archive.Archive(path) as archive:
+        assert len(archive) == len(SMALL)
+        records = list(archive.items())
+    for data, result, (puzzle, placements) in zip(SMALL, results, records):
+        assert puzzle == {key: data[key] for key in ("id", "map", "dominos", "regions")}
+        if result["status"] == "sat":
+            verdict, = pips_verify.verify_batch([puzzle], [placements])
+            assert verdict["ok"], verdict["reason"]
+        else:
+            assert placements is None
+
+
+def test_lookup_by_id(tmp_path):
+    path = str(tmp_path / "small.pips")
+    pips_archive.write_archive(path, SMALL)
+    with pips_archive.Archive(path) as archive:
+        for n, data in enumerate(SMALL):
+            assert archive.find(data["id"]) == n
+            assert archive.get(data["id"])["dominos"] == data["dominos"]
+        assert archive.find("no-such-puzzle") is None
+        assert archive.solution(SMALL[0]["id"]) is None
+
+
+def test_puzzle_without_id(tmp_path):
+    path = str(tmp_path / "easy.pips")
+    data = load_example("easy.json")
+    del data["id"]
+    pips_archive.write_archive(path, [data])
+    with pips_archive.Archive(path) as archive:
+        assert archive[0] == dict(data, id=None)
+
+
+def test_pack_skips_the_corpus_header(tmp_path, capsys):
+    path = str(tmp_path / "corpus.pips")
+    corpus = f"{EXAMPLES}/bench_corpus.jsonl"
+    assert pips_archive.main(["pack", corpus, "-o", path]) == 0
+    assert "skipped input 0: not a puzzle" in capsys.readouterr().err
+    assert pips_archive.main(["unpack", path]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(line)["id"] for line in lines] == [data["id"] for data in load_corpus()]
@@ -0,0 +1,64 @@
+import pytest
+
+import pips_dlx
+import pips_presolve
+import pips_solver
+
+from tests import load_corpus, load_example, problem
+
+BIG = next(data for data in load_corpus() if data["id"] == "b8x8-d100-1")
+
+
+@pytest.fixture
+def check_clock_every_node(monkeypatch):
+    # The search only reads the clock every CLOCK_INTERVAL nodes, and it
+    # solves the corpus boards within that; checking at every node makes
+    # the tiny budgets below run out for sure
+    monkeypatch.setattr(pips_dlx, "CLOCK_INTERVAL", 1)
+
+
+def assert_partial(data, partial):
+    cells, dominos, edges, regions = problem(data)
+    used = [d for d, _, _ in partial]
+    covered = [c for _, e, _ in partial for c in edges[e]]
+    assert len(set(used)) == len(used) and set(used) <= set(range(len(dominos)))
+    assert len(set(covered)) == len(covered)
+
+
+@pytest.mark.parametrize("backend", ["z3", "dlx"])
+def test_run_solver_raises_with_partial(check_clock_every_node, backend):
+    with pytest.raises(pips_solver.SolveUnknown) as info:
+        pips_solver.run_solver(*problem(BIG), backend=backend, timeout=0.001)
+    assert info.value.reason == "timeout"
+    assert info.value.partial is not None
+    assert_partial(BIG, info.value.partial)
+
+
+@pytest.mark.parametrize("options", [{}, {"backend": "dlx"}, {"presolve": True}])
+def test_solve_reports_unknown_not_unsat(check_clock_every_node, options):
+    result = pips_solver.solve(BIG, timeout=0.001, **options)
+    assert result["status"] == "unknown"
+    assert result["reason"] == "timeout"
+    assert result["placements"] is None
+    assert_partial(BIG, result["partial"])
+
+
+def test_presolve_partial_keeps_fixed_placements(check_clock_every_node):
+    data = next(data for data in load_corpus() if data["id"] == "b6x8-d30-1")
+    fixed = pips_presolve.presolve(*problem(data)).fixed
+    assert fixed
+    result = pips_solver.solve(data, timeout=0.001, presolve=True)
+    assert result["status"] == "unknown"
+    assert {tuple(p) for p in fixed} <= {tuple(p) for p in result["partial"]}
+
+
+def test_enough_budget_solves():
+    result = pips_solver.solve(load_example("easy.json"), timeout=30)
+    assert result["status"] == "sat"
+    assert "reason" not in result
+
+
+def test_infeasible_puzzle_is_unsat_within_any_budget():
+    data = load_example("easy.json")
+    data["regions"] = data["regions"] + [[[7], "sum_eq", 6]]
+    assert pips_solver.solve(data, timeout=0.001)["status"] == "unsat"
@@ -0,0 +1,62 @@
+import pips_cache
+import pips_verify
+
+from tests import load_example
+
+
+def transformed(data, transform):
+    """The puzzle with its map put through transform, cells renumbered row-major"""
+    grid = transform(data["map"])
+    renumber = {}
+    for row in grid:
+        for cell in row:
+            if cell >= 0:
+                renumber[cell] = len(renumber)
+    return {"map": [[renumber.get(cell, -1) for cell in row] for row in grid],
+            "dominos": [list(reversed(d)) for d in reversed(data["dominos"])],
+            "regions": [[[renumber[c] for c in cells], op, target]
+                        for cells, op, target in data["regions"]]}
+
+
+def rotate(grid):
+    return [list(row) for row in zip(*grid[::-1])]
+
+
+def reflect(grid):
+    return [row[::-1] for row in grid]
+
+
+def test_rotations_and_reflections_hit_the_cache():
+    data = load_example("easy.json")
+    cache = pips_cache.SolutionCache()
+    placements, hit = pips_cache.cached_solve(data["map"], data["dominos"], data["regions"], cache)
+    assert not hit and placements is not None
+
+    for transform in (rotate, reflect, lambda g: rotate(rotate(g)), lambda g: reflect(rotate(g))):
+        variant = transformed(data, transform)
+        placements, hit = pips_cache.cached_solve(variant["map"], variant["dominos"],
+                                                  variant["regions"], cache)
+        assert hit
+        verdict, = pips_verify.verify_batch([variant], [placements])
+        assert verdict["ok"], verdict["reason"]
+    assert cache.hits == 4 and cache.misses == 1
+
+
+def test_different_regions_miss_the_cache():
+    data = load_example("easy.json")
+    cache = pips_cache.SolutionCache()
+    pips_cache.cached_solve(data["map"], data["dominos"], data["regions"], cache)
+    regions = data["regions"][:-1]
+    _, hit = pips_cache.cached_solve(data["map"], data["dominos"], regions, cache)
+    assert not hit
+
+
+def test_unsat_answers_are_cached(tmp_path):
+    data = load_example("easy.json")
+    regions = data["regions"] + [[[7], "sum_eq", 6]]
+    cache = pips_cache.SolutionCache(path=str(tmp_path / "cache.db"))
+    assert pips_cache.cached_solve(data["map"], data["dominos"], regions, cache) == (None, False)
+    cache.close()
+    cache = pips_cache.SolutionCache(path=str(tmp_path / "cache.db"))
+    assert pips_cache.cached_solve(data["map"], data["dominos"], regions, cache) == (None, True)
+    cache.close()
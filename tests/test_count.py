@@ -0,0 +1,31 @@
+import pytest
+
+import pips_solver
+
+from tests import load_corpus, load_example, problem
+
+SMALL = load_corpus(max_cells=8)
+LIMIT = 50  # enough to tell the backends apart without enumerating large counts
+
+
+@pytest.mark.parametrize("data", SMALL, ids=[data["id"] for data in SMALL])
+def test_z3_counts_match_dlx(data):
+    args = problem(data)
+    count = pips_solver.count_solutions(*args, backend="dlx", limit=LIMIT)
+    assert pips_solver.count_solutions(*args, backend="z3", limit=LIMIT) == count
+    assert (count == 0) == (data["expected"] == "unsat")
+
+
+def test_limit_stops_the_count():
+    data = next(data for data in SMALL if data["id"] == "b2x4-d30-1")
+    args = problem(data)
+    assert pips_solver.count_solutions(*args, backend="dlx") == 96
+    assert pips_solver.count_solutions(*args, limit=2) == 2
+    assert not pips_solver.is_unique(*args)
+
+
+def test_easy_example_is_unique():
+    args = problem(load_example("easy.json"))
+    assert pips_solver.is_unique(*args)
+    assert pips_solver.is_unique(*args, backend="dlx")
+    assert pips_solver.count_solutions(*args, presolve=True) == 1
@@ -0,0 +1,68 @@
+import pytest
+
+import pips_parallel
+import pips_solver
+import pips_verify
+
+from tests import load_example, problem
+
+
+def two_islands(first, second):
+    """One board with second placed to the right of first, a column apart"""
+    width = len(first["map"][0]) + 1
+    rows = max(len(first["map"]), len(second["map"]))
+    positions = {}
+    for shift, data, side in ((0, first, 0), (width, second, 1)):
+        for r, row in enumerate(data["map"]):
+            for c, cell in enumerate(row):
+                if cell >= 0:
+                    positions[(r, c + shift)] = (side, cell)
+    number = {key: i for i, key in enumerate(positions[p] for p in sorted(positions))}
+    grid = [[-1] * (width + len(second["map"][0])) for _ in range(rows)]
+    for (r, c), key in positions.items():
+        grid[r][c] = number[key]
+    regions = [[[number[side, c] for c in cells], op, target]
+               for side, data in enumerate((first, second))
+               for cells, op, target in data["regions"]]
+    return {"map": grid, "dominos": first["dominos"] + second["dominos"], "regions": regions}
+
+
+EASY = load_example("easy.json")
+BOARD = two_islands(EASY, EASY)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_islands_solve_and_merge(workers):
+    args = problem(BOARD)
+    assert len(pips_parallel.connected_components(args[0], args[2], args[3])) == 2
+    placements = pips_parallel.solve_components(*args, workers=workers)
+    verdict, = pips_verify.verify_batch([BOARD], [placements])
+    assert verdict["ok"], verdict["reason"]
+
+
+def test_unsat_island():
+    data = two_islands(EASY, dict(EASY, regions=EASY["regions"] + [[[7], "sum_eq", 6]]))
+    assert pips_parallel.solve_components(*problem(data), workers=1) is None
+
+
+def test_too_many_candidates_solves_whole(monkeypatch):
+    monkeypatch.setattr(pips_parallel, "COMPONENT_CANDIDATE_LIMIT", 0)
+    calls = []
+    run_solver = pips_solver.run_solver
+
+    def spy(cells, *args, **options):
+        calls.append(len(cells))
+        return run_solver(cells, *args, **options)
+
+    monkeypatch.setattr(pips_solver, "run_solver", spy)
+    placements = pips_parallel.solve_components(*problem(BOARD), workers=1)
+    assert calls == [16]
+    verdict, = pips_verify.verify_batch([BOARD], [placements])
+    assert verdict["ok"], verdict["reason"]
+
+
+def test_sub_multisets_respect_pip_bounds():
+    # Two tile types with 3 and 7 pips, two copies each, pick two tiles
+    found = set(pips_parallel._sub_multisets([2, 2], 2, [3, 7], 9, 11))
+    assert found == {(1, 1)}
+    assert set(pips_parallel._sub_multisets([2, 2], 2, [3, 7], 0, 100)) == {(2, 0), (1, 1), (0, 2)}
@@ -0,0 +1,24 @@
+import pips_presolve
+import pips_verify
+
+from tests import load_example, problem
+
+
+def test_presolve_solves_the_easy_example():
+    data = load_example("easy.json")
+    result = pips_presolve.presolve(*problem(data))
+    assert result.status == "solved"
+    verdict, = pips_verify.verify_batch([data], [result.expand([])])
+    assert verdict["ok"], verdict["reason"]
+
+
+def test_missing_pip_value_is_unsat():
+    data = load_example("easy.json")
+    data["regions"] = data["regions"] + [[[7], "sum_eq", 6]]
+    assert pips_presolve.presolve(*problem(data)).status == "unsat"
+
+
+def test_domino_that_fits_nowhere_is_unsat():
+    data = {"map": [[0, 1]], "dominos": [[1, 2]],
+            "regions": [[[0], "sum_eq", 1], [[1], "sum_eq", 1]]}
+    assert pips_presolve.presolve(*problem(data)).status == "unsat"
@@ -0,0 +1,27 @@
+import pytest
+
+import pips_render
+
+
+def test_match_by_id_in_any_order():
+    puzzles = [{"id": "a"}, {"id": "b"}, {"id": "c"}]
+    solutions = [{"id": "c", "n": 3}, {"id": "a", "n": 1}]
+    assert pips_render.match_solutions(puzzles, solutions) == [{"id": "a", "n": 1}, None,
+                                                               {"id": "c", "n": 3}]
+
+
+def test_match_by_position_without_ids():
+    puzzles = [{}, {}]
+    solutions = [{"n": 1}, {"n": 2}]
+    assert pips_render.match_solutions(puzzles, solutions) == solutions
+
+
+def test_repeated_ids_match_by_position():
+    puzzles = [{"id": "a"}, {"id": "a"}]
+    solutions = [{"id": "a", "n": 1}, {"id": "a", "n": 2}]
+    assert pips_render.match_solutions(puzzles, solutions) == solutions
+
+
+def test_count_mismatch_without_ids():
+    with pytest.raises(ValueError):
+        pips_render.match_solutions([{}, {}], [{"n": 1}])
@@ -0,0 +1,65 @@
+import re
+
+import pips_solver
+import pips_verify
+
+from tests import load_example, problem
+
+
+def solved():
+    data = load_example("easy.json")
+    placements = pips_solver.run_solver(*problem(data))
+    return data, [list(p) for p in placements]
+
+
+def reason(data, placements):
+    verdict, = pips_verify.verify_batch([data], [placements])
+    assert not verdict["ok"]
+    return verdict["reason"]
+
+
+def test_solution_passes():
+    data, placements = solved()
+    verdict, = pips_verify.verify_batch([data], [placements])
+    assert verdict == {"id": "nyt-easy-example", "ok": True, "reason": None}
+
+
+def test_missing_solution():
+    data, _ = solved()
+    assert reason(data, None) == "no placements"
+
+
+def test_out_of_range_placement():
+    data, placements = solved()
+    placements[0] = [99, 0, 0]
+    assert reason(data, placements) == "placement [99, 0, 0] is out of range"
+
+
+def test_domino_placed_twice():
+    data, placements = solved()
+    placements[1][0] = placements[0][0]
+    assert re.fullmatch(r"domino \d is placed [02] times", reason(data, placements))
+
+
+def test_cell_covered_twice():
+    data, placements = solved()
+    placements[1][1] = placements[0][1]
+    assert "is covered" in reason(data, placements)
+
+
+def test_broken_region():
+    data, placements = solved()
+    # Flipping the domino on cell 0 breaks its sum_eq 4 region
+    edges = problem(data)[2]
+    for p in placements:
+        if 0 in edges[p[1]]:
+            p[2] = 1 - p[2]
+    assert reason(data, placements).startswith("region ")
+
+
+def test_batch_keeps_verdicts_apart():
+    data, placements = solved()
+    broken = [list(p) for p in placements]
+    broken[0] = [99, 0, 0]
+    verdicts = pips_verify.verify_batch([data, data, data], [placements, broken, None])
+    assert [v["ok"] for v in verdicts] == [True, False, False]